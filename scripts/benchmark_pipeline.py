@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Time each stage of the anomaly pipeline on a synthetic trial.
+
+Stages are timed one after another, each on the output of the stage before
+it, and the best of --repeat runs is kept. Results are printed, or written to
+--output, as JSON, with throughput per message of the data topic and per MB of
+its CSV, so runs of different sizes can be compared.
+"""
+from birl_offline_data_handler_test.synthetic_data import write_synthetic_csvs
+import json
+import os
+import sys
+import shutil
+import tempfile
+import platform
+from timeit import default_timer
+
+
+def time_stage(func, repeat):
+    best = None
+    for i in range(repeat):
+        start = default_timer()
+        ret = func()
+        secs = default_timer()-start
+        if best is None or secs < best:
+            best = secs
+    return best, ret
+
+
+def run_benchmark(work_dir, options):
+    import numpy as np
+    import pandas as pd
+    from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import message_to_csv, message_type_to_csv
+    from birl_generic_data_handler.csv_handler import (
+        _parse_time,
+        get_anomaly_time_ranges,
+        get_resample_time_index,
+        resample_segments,
+    )
+    from birl_generic_data_handler.dtw_aligner import align_to_reference
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+
+    bag, data_csv_path, flag_csv_path = write_synthetic_csvs(
+        work_dir,
+        'synthetic',
+        duration_secs=options.duration,
+        rate_hz=options.rate,
+        n_fields=options.fields,
+        flag_density=options.flag_density,
+    )
+    if len(bag.anomaly_times) == 0:
+        raise Exception("no anomaly in the synthetic trial, raise --duration or --flag-density.")
+    n_messages = len(bag.data_time)
+    n_bytes = os.path.getsize(data_csv_path)
+    result = {}
+
+    def run_stage(name, func):
+        secs, ret = time_stage(func, options.repeat)
+        result[name] = {
+            'secs': secs,
+            'usecs_per_message': secs*1e6/n_messages,
+            'mb_per_sec': n_bytes/1e6/secs if secs > 0 else None,
+        }
+        return ret
+
+    list_of_message = run_stage(
+        'bag_read',
+        lambda: list(bag.read_messages(topics=bag.data_topic)),
+    )
+
+    def flatten():
+        from datetime import datetime
+        stream = StringIO()
+        stream.write("time")
+        message_type_to_csv(stream, list_of_message[0][1])
+        stream.write('\n')
+        for topic, msg, time in list_of_message:
+            stream.write(datetime.fromtimestamp(time.to_time()).strftime('%Y/%m/%d/%H:%M:%S.%f'))
+            message_to_csv(stream, msg, flatten=False)
+            stream.write('\n')
+        return stream.getvalue()
+    csv_text = run_stage('flatten', flatten)
+
+    def csv_write():
+        with open(os.path.join(work_dir, 'csv_write.csv'), 'w') as f:
+            f.write(csv_text)
+    run_stage('csv_write', csv_write)
+
+    data_df, flag_df = run_stage(
+        'csv_read',
+        lambda: (pd.read_csv(data_csv_path, sep=','), pd.read_csv(flag_csv_path, sep=',')),
+    )
+
+    data_time, flag_time = run_stage(
+        'time_parse',
+        lambda: (_parse_time(data_df['time']), _parse_time(flag_df['time'])),
+    )
+
+    list_of_anomaly_time_range = run_stage(
+        'onset_detection',
+        lambda: get_anomaly_time_ranges(
+            pd.DataFrame({'time': data_time, '.tag': data_df['.tag'].values}),
+            pd.DataFrame({'time': flag_time, '.event_flag': flag_df['.event_flag'].values}),
+        ),
+    )
+
+    def resample():
+        secs = (data_time-data_time[0])/np.timedelta64(1, 's')
+        mat = data_df[[i for i in data_df.columns if i.startswith('.values.')]].values
+        list_of_new_time = []
+        for start_time, end_time in list_of_anomaly_time_range:
+            t = (np.datetime64(start_time)-data_time[0])/np.timedelta64(1, 's')
+            list_of_new_time.append(get_resample_time_index(t-2, t+2, 10))
+        return list(resample_segments(
+            [secs]*len(list_of_new_time),
+            [mat]*len(list_of_new_time),
+            list_of_new_time,
+        ))
+    list_of_window = run_stage('resample', resample)
+
+    if len(list_of_window) >= 2:
+        run_stage(
+            'dtw',
+            lambda: align_to_reference(list_of_window[0], list_of_window[1:], processes=1),
+        )
+
+    return {
+        'config': {
+            'duration_secs': options.duration,
+            'rate_hz': options.rate,
+            'n_fields': options.fields,
+            'flag_density': options.flag_density,
+            'repeat': options.repeat,
+        },
+        'python': platform.python_version(),
+        'n_messages': n_messages,
+        'n_anomalies': len(list_of_anomaly_time_range),
+        'csv_bytes': n_bytes,
+        'stages': result,
+        'total_secs': sum(i['secs'] for i in result.values()),
+    }
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    usage = "usage: %prog [options]"
+    parser = OptionParser(usage=usage)
+
+    parser.add_option("--duration",
+        action="store", type="float", dest="duration",
+        default=60,
+        help="seconds of the synthetic trial. Default: 60.")
+
+    parser.add_option("--rate",
+        action="store", type="float", dest="rate",
+        default=100,
+        help="rate of the data topic in hz. Default: 100.")
+
+    parser.add_option("--fields",
+        action="store", type="int", dest="fields",
+        default=12,
+        help="values per data message. Default: 12.")
+
+    parser.add_option("--flag-density",
+        action="store", type="float", dest="flag_density",
+        default=0.002,
+        help="probability that an anomaly starts at a data message. Default: 0.002.")
+
+    parser.add_option("--repeat",
+        action="store", type="int", dest="repeat",
+        default=3,
+        help="runs of each stage, the best is kept. Default: 3.")
+
+    parser.add_option("-o", "--output",
+        action="store", type="string", dest="output",
+        default=None,
+        help="the JSON file to write results to, stdout by default.")
+
+    (options, args) = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='benchmark_pipeline_')
+    try:
+        result = run_benchmark(work_dir, options)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if options.output is None:
+        json.dump(result, sys.stdout, indent=4, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        with open(options.output, 'w') as f:
+            json.dump(result, f, indent=4, sort_keys=True)
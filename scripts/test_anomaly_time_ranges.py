@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.csv_handler import (
+    CsvHandler,
+    get_anomaly_time_ranges,
+)
+import traceback
+import numpy as np
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_dfs(time_conv):
+    # 20 s trial at 10 hz, recovery at [9, 9.5) and [15.2, 15.7)
+    tag_time = np.arange(200)*0.1
+    tag = np.full(200, 2)
+    tag[90:95] = 0
+    tag[152:157] = 0
+    # flags at 4 hz, anomalies flagged at 8.75, 12 (not recovered from in 3 s)
+    # and 14.5, the 1st and 3rd backtracked to the last positive flag
+    flag_time = np.arange(80)*0.25
+    flag = np.ones(80, dtype=int)
+    flag[33:35] = -1
+    flag[35] = 0
+    flag[48] = 0
+    flag[58] = 0
+    tag_df = pd.DataFrame({'time': time_conv(tag_time), '.tag': tag})
+    flag_df = pd.DataFrame({'time': time_conv(flag_time), '.event_flag': flag})
+    return tag_df, flag_df
+
+if __name__ == '__main__':
+    try:
+        logger.info("Test anomaly time ranges in seconds.")
+        tag_df, flag_df = get_dfs(lambda t: t)
+        ret = get_anomaly_time_ranges(tag_df, flag_df)
+        assert len(ret) == 2
+        assert np.allclose(ret[0], [8.0, 9.0])
+        assert np.allclose(ret[1], [14.25, 15.2])
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test anomaly time ranges in datetime.")
+        trial_start = pd.Timestamp('2017-01-01 12:00:00')
+        tag_df, flag_df = get_dfs(lambda t: trial_start+pd.to_timedelta(t, unit='s'))
+        ret = get_anomaly_time_ranges(tag_df, flag_df)
+        assert len(ret) == 2
+        assert ret[0][0] == trial_start+pd.Timedelta(seconds=8)
+        assert ret[1][1] == trial_start+pd.Timedelta(seconds=15.2)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test a trial without anomalies.")
+        tag_df, flag_df = get_dfs(lambda t: t)
+        flag_df['.event_flag'] = 1
+        assert get_anomaly_time_ranges(tag_df, flag_df) == []
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test anomaly time ranges without backtracking.")
+        tag_df, flag_df = get_dfs(lambda t: t)
+        ret = get_anomaly_time_ranges(tag_df, flag_df, backtrack='none')
+        assert np.allclose(ret, [[8.75, 9.0], [14.5, 15.2]])
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test confirmed anomaly extraction from rosbag CSVs.")
+        trial_start = pd.Timestamp('2017-01-01 12:00:00')
+        list_of_data_df = []
+        list_of_flag_df = []
+        for i in range(3):
+            tag_df, flag_df = get_dfs(
+                lambda t: (trial_start+pd.to_timedelta(t+i*100, unit='s')).strftime('%Y/%m/%d/%H:%M:%S.%f'))
+            tag_df['.wrench_stamped.wrench.force.x'] = np.arange(len(tag_df))
+            list_of_data_df.append(tag_df)
+            list_of_flag_df.append(flag_df)
+        copy_of_data_df = list_of_data_df[0].copy()
+        ret = CsvHandler().extract_confirmed_anomaly_data(list_of_data_df, list_of_flag_df)
+        assert len(ret) == 3
+        assert all(len(i) == 2 for i in ret)
+        anomaly_df = ret[2][0]
+        assert anomaly_df.index.name == 'time'
+        assert np.allclose(anomaly_df.index.values, np.arange(80, 91)*0.1)
+        assert (anomaly_df['.wrench_stamped.wrench.force.x'].values == np.arange(80, 91)).all()
+        assert list_of_data_df[0].equals(copy_of_data_df)
+
+        # A flag topic without ".event_flag", e.g. /anomaly_detection_signal
+        header_only_df = list_of_flag_df[0][['time']].copy()
+        header_only_df['.seq'] = np.arange(len(header_only_df))
+        for list_of_df in [
+            [[list_of_data_df[0]], [header_only_df]],
+            [[list_of_data_df[0].drop(columns='.tag')], [list_of_flag_df[0]]],
+        ]:
+            try:
+                CsvHandler().extract_confirmed_anomaly_data(*list_of_df)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("ValueError not raised for missing columns")
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
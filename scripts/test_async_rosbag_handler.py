@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+from birl_offline_data_handler.rosbag_handler import RosbagHandler
+from birl_offline_data_handler.async_rosbag_handler import (
+    AsyncRosbagHandler,
+    BagResultIterator,
+)
+import traceback
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def iterate(loop, iterator):
+    ret = []
+    while True:
+        try:
+            ret.append(loop.run_until_complete(iterator.__anext__()))
+        except StopAsyncIteration:
+            return ret
+        except ValueError as e:
+            ret.append(e)
+
+class BagResultIteratorWithEvents(BagResultIterator):
+    """Sets the event of a bag once it is done, i.e. its result is queued."""
+
+    def __init__(self, list_of_bag_paths, func, executor, event_by_bag_path):
+        BagResultIterator.__init__(self, list_of_bag_paths, func, executor)
+        self.event_by_bag_path = event_by_bag_path
+
+    def _on_bag_done(self, bag_path, future):
+        BagResultIterator._on_bag_done(self, bag_path, future)
+        if bag_path in self.event_by_bag_path:
+            self.event_by_bag_path[bag_path].set()
+
+class FakeRosbagHandler(RosbagHandler):
+    def _get_csv_of_a_topic_of_one_bag(self, bag_path, topic_name, columns=None):
+        return (os.path.basename(bag_path), topic_name, columns)
+
+if __name__ == '__main__':
+    if sys.version_info[0] < 3:
+        logger.info("skipped, asyncio is python 3 only.")
+        sys.exit(0)
+
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    try:
+        logger.info("Test bags are yielded as they finish.")
+        b_done = threading.Event()
+        def func(bag_path):
+            if bag_path == 'a':
+                # Set on the event loop once b is done, so a is done after
+                assert b_done.wait(5)
+            elif bag_path != 'b':
+                raise ValueError(bag_path)
+            return bag_path.upper()
+        executor = ThreadPoolExecutor(max_workers=2)
+        ret = iterate(loop, BagResultIteratorWithEvents(['a', 'b', 'c'], func, executor, {'b': b_done}))
+        assert ret[0] == ('b', 'B')
+        assert ('a', 'A') in ret
+        assert [str(i) for i in ret if isinstance(i, ValueError)] == ['c']
+        executor.shutdown()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test cancellation skips bags not started.")
+        release = threading.Event()
+        list_of_called = []
+        def func(bag_path):
+            list_of_called.append(bag_path)
+            release.wait(5)
+            return bag_path
+        executor = ThreadPoolExecutor(max_workers=1)
+        iterator = BagResultIterator(['a', 'b', 'c'], func, executor)
+        try:
+            loop.run_until_complete(asyncio.wait_for(iterator.__anext__(), 0.2))
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("a bag finished before the timeout.")
+        release.set()
+        executor.shutdown(wait=True)
+        assert list_of_called == ['a']
+        assert iterate(loop, iterator) == []
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    test_dir = tempfile.mkdtemp()
+    try:
+        logger.info("Test AsyncRosbagHandler gives what RosbagHandler gives.")
+        for name in ['s01.bag', 's02.bag', 's03.bag']:
+            open(os.path.join(test_dir, name), 'w').close()
+        handler = FakeRosbagHandler(test_dir)
+        o = AsyncRosbagHandler(handler)
+        ret = iterate(loop, o.get_csv_of_a_topic('/tag_multimodal', columns=['time']))
+        assert sorted(ret) == sorted(handler.get_csv_of_a_topic('/tag_multimodal', columns=['time']))
+        assert len(ret) == 3
+        o.shutdown()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(test_dir)
+        loop.close()
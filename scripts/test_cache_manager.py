@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+from birl_offline_data_handler.cache_manager import (
+    CacheManager,
+    parse_size,
+    INDEX_NAME,
+)
+import traceback
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def write_file(path, n_bytes):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write('0'*n_bytes)
+
+def hit_many_times(args):
+    cache_root, artifact_path, n_hits = args
+    cm = CacheManager(cache_root)
+    for i in range(n_hits):
+        cm.hit(artifact_path)
+
+def create_cache(cache_root):
+    for name in ['s01', 's02']:
+        write_file(os.path.join(cache_root, name+'.bag'), 10)
+        write_file(os.path.join(cache_root, name, name+'-tag_multimodal.csv'), 1000)
+        write_file(os.path.join(cache_root, name, 'extracted_anomalies', 'SUCCESS'), 0)
+        write_file(os.path.join(cache_root, name, 'extracted_anomalies', 'no_0.csv'), 300)
+
+if __name__ == '__main__':
+    cache_root = tempfile.mkdtemp()
+    create_cache(cache_root)
+
+    try:
+        logger.info("Test parsing sizes.")
+        assert parse_size('512') == 512
+        assert parse_size('2k') == 2048
+        assert parse_size('1.5G') == int(1.5*1024**3)
+        assert parse_size('3MB') == 3*1024**2
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test scanning and tracking artifacts.")
+        cm = CacheManager(cache_root)
+        cm.scan()
+        assert os.path.isfile(os.path.join(cache_root, INDEX_NAME))
+        assert sorted(i['path'] for i in cm.get_entries()) == [
+            os.path.join('s01', 'extracted_anomalies'),
+            os.path.join('s01', 's01-tag_multimodal.csv'),
+            os.path.join('s02', 'extracted_anomalies'),
+            os.path.join('s02', 's02-tag_multimodal.csv'),
+        ]
+        assert cm.get_total_size() == 2600
+        cm.hit(os.path.join(cache_root, 's01', 's01-tag_multimodal.csv'))
+        cm.hit(os.path.join(cache_root, 's01', 's01-tag_multimodal.csv'))
+        entry = cm.get_entries()[-1]
+        assert entry['path'] == os.path.join('s01', 's01-tag_multimodal.csv')
+        assert entry['hits'] == 2
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test storing an artifact evicts least recently used ones.")
+        cm = CacheManager(cache_root, budget_in_bytes=2500)
+        new_path = os.path.join(cache_root, 's02', 's02-anomaly_detection_signal.csv')
+        write_file(new_path, 100)
+        list_of_removed = cm.store(new_path)
+        assert len(list_of_removed) == 1
+        assert not os.path.exists(list_of_removed[0])
+        assert cm.get_total_size() <= 2500
+        assert cm.get_entries()[-1]['misses'] == 1
+        assert os.path.isfile(new_path)
+        assert os.path.isfile(os.path.join(cache_root, 's01', 's01-tag_multimodal.csv'))
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test the command line interface.")
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        command = [sys.executable, '-m', 'birl_offline_data_handler.cache_manager']
+        output = subprocess.check_output(command+['inspect', cache_root], env=env)
+        assert b's01-tag_multimodal.csv' in output
+        output = subprocess.check_output(command+['prune', cache_root, '--budget', '1000', '-n'], env=env)
+        assert b'would remove' in output
+        assert CacheManager(cache_root).get_total_size() > 1000
+        subprocess.check_output(command+['prune', cache_root, '--budget', '1000'], env=env)
+        assert CacheManager(cache_root).get_total_size() <= 1000
+        assert os.path.isfile(new_path)
+    except (AssertionError, subprocess.CalledProcessError) as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test no hit is lost when processes update the index at once.")
+        import multiprocessing
+        hits = CacheManager(cache_root).get_entries()[-1]['hits']
+        pool = multiprocessing.Pool(4)
+        pool.map(hit_many_times, [(cache_root, new_path, 25)]*4)
+        pool.close()
+        pool.join()
+        entry = CacheManager(cache_root).get_entries()[-1]
+        assert entry['path'] == os.path.join('s02', 's02-anomaly_detection_signal.csv')
+        assert entry['hits'] == hits+100
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    shutil.rmtree(cache_root)
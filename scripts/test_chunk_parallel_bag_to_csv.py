@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import (
+    bag_to_csv,
+    chunk_parallel_bag_to_csv,
+    get_chunk_time_ranges,
+)
+from birl_offline_data_handler_test.synthetic_data import SyntheticBag
+from birl_generic_data_handler.stage_profiler import StageProfiler
+import traceback
+import os
+import shutil
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def open_synthetic_bag(bag_path):
+    return SyntheticBag(
+        duration_secs=20,
+        n_fields=2,
+        flag_density=0.01,
+        record_latency_secs=0.01,
+        chunk_secs=1,
+        seed=1,
+    )
+
+def read_file(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def to_nsec(time):
+    return time.secs*1000000000+time.nsecs
+
+if __name__ == '__main__':
+    test_dir = tempfile.mkdtemp()
+    bag = open_synthetic_bag('synthetic.bag')
+
+    try:
+        logger.info("Test time ranges are contiguous and split at chunks.")
+        list_of_range = get_chunk_time_ranges(bag, 4)
+        assert len(list_of_range) == 4
+        assert list_of_range[0][0] is None and list_of_range[-1][1] is None
+        for (start_time, end_time), (next_start_time, next_end_time) in zip(list_of_range[:-1], list_of_range[1:]):
+            assert end_time is next_start_time
+        list_of_chunk_start = [to_nsec(i.start_time) for i in bag._chunks]
+        assert all(to_nsec(i[1]) in list_of_chunk_start for i in list_of_range[:-1])
+        assert len(get_chunk_time_ranges(bag, 100)) == len(bag._chunks)
+        assert get_chunk_time_ranges(bag, 1) == [(None, None)]
+        assert get_chunk_time_ranges(SyntheticBag(duration_secs=1), 4) == [(None, None)]
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test CSVs decoded in parallel equal the ones decoded at once.")
+        for topic_name in [bag.data_topic, bag.flag_topic]:
+            for stamp_source in ['record', 'both']:
+                csv_path = os.path.join(test_dir, 'serial.csv')
+                parallel_csv_path = os.path.join(test_dir, 'parallel.csv')
+                bag_to_csv(bag, csv_path, topic_name, stamp_source=stamp_source)
+                profiler = StageProfiler()
+                chunk_parallel_bag_to_csv(
+                    bag,
+                    'synthetic.bag',
+                    parallel_csv_path,
+                    topic_name,
+                    processes=3,
+                    profiler=profiler,
+                    stamp_source=stamp_source,
+                    open_bag=open_synthetic_bag,
+                )
+                assert read_file(parallel_csv_path) == read_file(csv_path)
+                decode = profiler.get_summary()['total']['decode']
+                assert decode['calls'] == 3
+                assert decode['messages'] == len(read_file(csv_path).splitlines())-1
+        assert sorted(os.listdir(test_dir)) == ['parallel.csv', 'serial.csv']
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(test_dir)
+
+    try:
+        logger.info("Test bags without a chunk index are decoded at once, with a warning.")
+        test_dir = tempfile.mkdtemp()
+        list_of_record = []
+        handler = logging.Handler()
+        handler.emit = list_of_record.append
+        logging.getLogger().addHandler(handler)
+        unchunked_bag = SyntheticBag(duration_secs=5, n_fields=2, seed=1)
+        csv_path = os.path.join(test_dir, 'serial.csv')
+        parallel_csv_path = os.path.join(test_dir, 'parallel.csv')
+        bag_to_csv(unchunked_bag, csv_path, unchunked_bag.data_topic)
+        profiler = StageProfiler()
+        chunk_parallel_bag_to_csv(
+            unchunked_bag,
+            'unchunked.bag',
+            parallel_csv_path,
+            unchunked_bag.data_topic,
+            processes=3,
+            profiler=profiler,
+        )
+        assert read_file(parallel_csv_path) == read_file(csv_path)
+        assert profiler.get_summary()['total']['decode']['calls'] == 1
+        list_of_warning = [i for i in list_of_record if i.levelno == logging.WARNING]
+        assert len(list_of_warning) == 1
+        assert 'unchunked.bag' in list_of_warning[0].getMessage()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        logging.getLogger().removeHandler(handler)
+        shutil.rmtree(test_dir)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+from birl_offline_data_handler.dataframe_cache import DataFrameLruCache
+from birl_offline_data_handler_test.synthetic_data import write_synthetic_csvs
+from birl_generic_data_handler.csv_handler import CsvHandler
+import traceback
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_df(n_rows):
+    return pd.DataFrame({'a': np.arange(n_rows, dtype=np.float64)})
+
+def get_df_with_strings(n_rows):
+    return pd.DataFrame({
+        'time': ['t%s'%i for i in range(n_rows)],
+        'a': np.arange(n_rows, dtype=np.float64),
+        'b': pd.Categorical(['x']*n_rows, categories=['x', 'y']),
+    }, columns=['time', 'a', 'b'])
+
+def try_to_write(write):
+    # Either refused, or made into a copy of the caller's own. Old pandas
+    # refuses to write into read-only object columns with AttributeError.
+    try:
+        write()
+    except (ValueError, AttributeError):
+        pass
+
+def get_n_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+if __name__ == '__main__':
+    n_bytes = get_n_bytes(get_df(100))
+
+    try:
+        logger.info("Test hits, misses and eviction by bytes.")
+        cache = DataFrameLruCache(max_bytes=2*n_bytes)
+        assert cache.get('s01') is None
+        df = get_df(100)
+        assert cache.put('s01', df).equals(df)
+        cache.put('s02', get_df(100))
+        assert cache.get('s01').equals(df)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.current_bytes == 2*n_bytes
+
+        # s02 is the least recently used
+        cache.put('s03', get_df(100))
+        assert 's02' not in cache
+        assert 's01' in cache and 's03' in cache
+        assert len(cache) == 2
+        assert cache.current_bytes == 2*n_bytes
+
+        # Too big to keep
+        df = get_df(1000)
+        assert cache.put('s04', df) is df
+        assert 's04' not in cache
+        assert len(cache) == 2
+
+        cache.put('s01', get_df(100))
+        assert cache.current_bytes == 2*n_bytes
+        cache.clear()
+        assert len(cache) == 0 and cache.current_bytes == 0
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test callers can't change kept frames.")
+        expected_df = get_df_with_strings(100)
+        cache = DataFrameLruCache(max_bytes=10*get_n_bytes(expected_df))
+        df = cache.put('s01', expected_df.copy())
+
+        def write_float():
+            df.loc[0, 'a'] = -1
+        def write_string():
+            df.iloc[0, 0] = 'z'
+        def write_category():
+            df.iloc[0, 2] = 'y'
+        def replace_column():
+            df['a'] = -1.0
+        for write in [write_float, write_string, write_category, replace_column]:
+            try_to_write(write)
+        df['c'] = 0
+        assert cache.get('s01').equals(expected_df)
+
+        df = cache.get('s01')
+        try_to_write(write_string)
+        try_to_write(write_category)
+        assert cache.get('s01').equals(expected_df)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        logger.info("Test CsvHandler leaves shared frames unchanged.")
+        bag, data_csv_path, flag_csv_path = write_synthetic_csvs(
+            work_dir,
+            's01',
+            duration_secs=20,
+            rate_hz=50,
+            n_fields=3,
+            flag_density=0.01,
+        )
+        cache = DataFrameLruCache(max_bytes=100*1024**2)
+        data_df = cache.put('data', pd.read_csv(data_csv_path, sep=','))
+        flag_df = cache.put('flag', pd.read_csv(flag_csv_path, sep=','))
+        expected_data_df = data_df.copy()
+        expected_flag_df = flag_df.copy()
+
+        list_of_anomaly_df = CsvHandler().extract_anomaly_data(data_df, flag_df, 4, 10)
+        assert len(list_of_anomaly_df) > 0
+        assert data_df.equals(expected_data_df)
+        assert flag_df.equals(expected_flag_df)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(work_dir)
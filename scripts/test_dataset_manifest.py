@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.dataset_manifest import (
+    write_manifest,
+    load_manifest,
+    iter_dataset,
+)
+import traceback
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    base_folder = tempfile.mkdtemp()
+    csv_dir = os.path.join(base_folder, 'resampled_anomalies_dir')
+    os.makedirs(csv_dir)
+    list_of_path = []
+    for idx in range(3):
+        path = os.path.join(csv_dir, 'no_%s.csv'%(idx,))
+        pd.DataFrame({'time': np.arange(5)*0.1, '.a': np.arange(5)+idx}).to_csv(path, index=False)
+        list_of_path.append(path)
+
+    try:
+        logger.info("Test reading a dataset through its manifest.")
+        manifest_path = os.path.join(base_folder, 'manifest.csv')
+        write_manifest(manifest_path, list_of_path, [0, 1, 0])
+        manifest_df = load_manifest(manifest_path)
+        assert list(manifest_df['path']) == list_of_path
+        assert list(manifest_df['label']) == [0, 1, 0]
+        assert not pd.read_csv(manifest_path)['path'][0].startswith(os.sep)
+        for idx, (path, label, df) in enumerate(iter_dataset(manifest_path, index_col='time')):
+            assert path == list_of_path[idx]
+            assert df['.a'].iloc[0] == idx
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test moving a dataset folder with its manifest.")
+        moved_folder = base_folder+'_moved'
+        shutil.move(base_folder, moved_folder)
+        manifest_df = load_manifest(os.path.join(moved_folder, 'manifest.csv'))
+        for path in manifest_df['path']:
+            assert os.path.isfile(path)
+        shutil.move(moved_folder, base_folder)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    shutil.rmtree(base_folder)
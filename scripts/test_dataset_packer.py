@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.dataset_packer import (
+    pack_csv_files,
+    PackedDataset,
+)
+import traceback
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_label(f):
+    return 1 if 'right' in f else 0
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+    csv_dir = tempfile.mkdtemp()
+    dataset_dir = os.path.join(tempfile.mkdtemp(), 'packed')
+
+    list_of_csv_path = []
+    list_of_df = []
+    for idx, keyword in enumerate(['left', 'right', 'left', 'right', 'right']):
+        df = pd.DataFrame(
+            rng.randn(40, 3),
+            columns=['.a', '.b', '.c'],
+            index=pd.Index(np.linspace(idx, idx+4, 40), name='time'),
+        )
+        path = os.path.join(csv_dir, 'resampled_10hz_no_%s_from_trial_%s.csv'%(idx, keyword))
+        df.to_csv(path)
+        list_of_csv_path.append(path)
+        list_of_df.append(df)
+
+    try:
+        logger.info("Test packing and loading windows.")
+        assert pack_csv_files(list_of_csv_path, dataset_dir, get_label) == 5
+        dataset = PackedDataset.load(dataset_dir)
+        assert len(dataset) == 5
+        assert isinstance(dataset.data, np.memmap)
+        assert dataset.data.shape == (5, 40, 3)
+        assert (dataset.labels == [0, 1, 0, 1, 1]).all()
+        assert dataset.columns == ['.a', '.b', '.c']
+        assert list(dataset.metadata['name']) == [os.path.basename(i) for i in list_of_csv_path]
+        for idx, df in enumerate(list_of_df):
+            assert np.allclose(dataset.data[idx], df.values)
+            assert np.allclose(dataset.get_df(idx).index.values, df.index.values)
+        x, y = dataset[dataset.labels == 1]
+        assert x.shape == (3, 40, 3) and (y == 1).all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test refusing windows of different shapes.")
+        list_of_df[2].iloc[:30].to_csv(list_of_csv_path[2])
+        try:
+            pack_csv_files(list_of_csv_path, dataset_dir, get_label)
+        except ValueError:
+            pass
+        else:
+            assert False, "ValueError not raised"
+        assert len(PackedDataset.load(dataset_dir)) == 5
+        assert not os.path.isdir(dataset_dir+'.tmp')
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    del dataset
+    shutil.rmtree(csv_dir)
+    shutil.rmtree(os.path.dirname(dataset_dir))
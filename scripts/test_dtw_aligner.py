@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.dtw_aligner import (
+    dtw,
+    align_to_reference,
+)
+from birl_generic_data_handler.dtw_barycenter import DtwBarycenter
+import traceback
+import numpy as np
+import os
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def naive_dtw(x, y):
+    n, m = len(x), len(y)
+    acc = np.full((n+1, m+1), np.inf)
+    acc[0, 0] = 0
+    for i in range(1, n+1):
+        for j in range(1, m+1):
+            acc[i, j] = np.linalg.norm(x[i-1]-y[j-1])\
+                +min(acc[i-1, j-1], acc[i-1, j], acc[i, j-1])
+    return acc[n, m]
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+
+    try:
+        logger.info("Test DTW against the textbook recursion.")
+        for i in range(20):
+            x = rng.rand(rng.randint(1, 30), 3)
+            y = rng.rand(rng.randint(1, 30), 3)
+            dist, path_x, path_y = dtw(x, y)
+            assert np.isclose(dist, naive_dtw(x, y))
+            assert np.isclose(dist, np.linalg.norm(x[path_x]-y[path_y], axis=1).sum())
+            assert (path_x[0], path_y[0]) == (0, 0)
+            assert (path_x[-1], path_y[-1]) == (len(x)-1, len(y)-1)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test Sakoe-Chiba band.")
+        x = rng.rand(40, 2)
+        y = rng.rand(50, 2)
+        dist, path_x, path_y = dtw(x, y, window=2)
+        assert (np.abs(path_x*49-path_y*39) <= 2*49).all()
+        assert dist >= dtw(x, y)[0]
+
+        # A band of 0 still holds a path when lengths differ
+        for n, m in [(5, 3), (3, 5), (40, 50), (4, 4)]:
+            dist, path_x, path_y = dtw(rng.rand(n, 2), rng.rand(m, 2), window=0)
+            assert np.isfinite(dist)
+            assert (path_x[0], path_y[0], path_x[-1], path_y[-1]) == (0, 0, n-1, m-1)
+            assert (np.diff(path_x) <= 1).all() and (np.diff(path_y) <= 1).all()
+        for x, window in [(x, -1), (np.full((40, 2), np.inf), None)]:
+            try:
+                dtw(x, y, window=window)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("ValueError not raised for window %s"%(window,))
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test aligning a batch to a reference.")
+        ref_mat = np.sin(np.linspace(0, 6, 50)).reshape(-1, 1)
+        list_of_mat = [
+            np.sin(np.linspace(0, 6, n)).reshape(-1, 1) for n in [60, 80, 100]
+        ]
+        ret = align_to_reference(ref_mat, list_of_mat, processes=2)
+        assert len(ret) == 3
+        for mat, (dist, aligned_index) in zip(list_of_mat, ret):
+            assert aligned_index.shape == (50,)
+            assert np.abs(mat[aligned_index]-ref_mat).max() < 0.2
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test reusing a saved DTW barycenter.")
+        list_of_mat = [
+            np.sin(np.linspace(0, 6, n)).reshape(-1, 1)+0.01*rng.rand(n, 1)\
+                for n in [40, 50, 60]
+        ]
+        barycenter = DtwBarycenter(window=30, processes=1, preprocessing='scaler_a')
+        ret = barycenter.align(list_of_mat)
+        assert len(ret) == 3
+        template_path = os.path.join(tempfile.mkdtemp(), 'label_0.npz')
+        barycenter.save(template_path)
+
+        # Same demonstrations, the saved alignments are taken as they are
+        barycenter = DtwBarycenter.load(template_path, processes=1)
+        assert barycenter.get_config() == (30, 'euclidean', 'scaler_a')
+        same_ret = barycenter.align(list_of_mat)
+        for (dist, aligned_index), (same_dist, same_aligned_index) in zip(ret, same_ret):
+            assert dist == same_dist
+            assert (aligned_index == same_aligned_index).all()
+
+        # A demonstration comes and one goes, only the new one is aligned to
+        # the saved template, which stays as it is while it barely drifts
+        template = barycenter.template.copy()
+        new_mat = np.sin(np.linspace(0, 6, 55)).reshape(-1, 1)
+        list_of_new_mat = list_of_mat[1:]+[new_mat]
+        new_ret = barycenter.align(list_of_new_mat)
+        assert len(new_ret) == 3
+        assert len(barycenter._alignments) == 3
+        assert len(barycenter._pairwise_dists) == 1
+        assert (barycenter.template == template).all()
+        assert barycenter.get_drift() <= barycenter.max_drift
+        for (dist, aligned_index), (new_dist, new_aligned_index) in zip(ret[1:], new_ret[:2]):
+            assert dist == new_dist
+            assert (aligned_index == new_aligned_index).all()
+        assert np.isclose(new_ret[2][0], dtw(template, new_mat, 30)[0])
+        assert new_ret[2][1].shape == (len(template),)
+        barycenter.save(template_path)
+        assert len(np.load(template_path)['alignment_keys']) == 3
+        assert len(np.load(template_path)['alignment_sums']) == 3
+
+        # A demonstration far from the template makes it drift, and then
+        # all alignments are made to the refined template
+        far_mat = 3*np.cos(np.linspace(0, 6, 45)).reshape(-1, 1)
+        list_of_far_mat = list_of_new_mat+[far_mat]
+        barycenter = DtwBarycenter.load(template_path, processes=1)
+        far_ret = barycenter.align(list_of_far_mat)
+        assert not (barycenter.template == template).all()
+        for mat, (dist, aligned_index) in zip(list_of_far_mat, far_ret):
+            assert np.isclose(dist, dtw(barycenter.template, mat, 30)[0])
+
+        # A refinement can be asked for whatever the drift
+        barycenter = DtwBarycenter.load(template_path, processes=1)
+        refined_ret = barycenter.align(list_of_new_mat, refine=True)
+        for mat, (dist, aligned_index) in zip(list_of_new_mat, refined_ret):
+            assert np.isclose(dist, dtw(barycenter.template, mat, 30)[0])
+        assert DtwBarycenter.load(template_path).get_config() != (30, 'euclidean', 'scaler_b')
+        os.remove(template_path)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.figure_renderer import (
+    FigureJob,
+    render_figures,
+)
+from birl_generic_data_handler.verification_plots import plot_series_grid
+import traceback
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_jobs(output_dir, amplitude):
+    list_of_job = []
+    for dim in ['a', 'b', 'c']:
+        series = pd.Series(amplitude*np.sin(np.linspace(0, 6, 100)), index=np.linspace(5, 15, 100))
+        list_of_job.append(FigureJob(
+            os.path.join(output_dir, dim, dim+'.png'),
+            plot_series_grid,
+            suptitle=dim,
+            list_of_row=[[('raw', series), ('raw_again', series)]],
+        ))
+    return list_of_job
+
+if __name__ == '__main__':
+    output_dir = tempfile.mkdtemp()
+
+    try:
+        logger.info("Test rendering figures in a process pool.")
+        list_of_path = render_figures(get_jobs(output_dir, 1), processes=2, preview=True)
+        assert len(list_of_path) == 3
+        for path in list_of_path:
+            assert os.path.isfile(path)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test skipping figures whose inputs haven't changed.")
+        assert render_figures(get_jobs(output_dir, 1), processes=2, preview=True) == []
+        assert len(render_figures(get_jobs(output_dir, 1), processes=1)) == 3
+        assert len(render_figures(get_jobs(output_dir, 2), processes=1, preview=True)) == 3
+        assert len(render_figures(get_jobs(output_dir, 2), processes=1, preview=True, force=True)) == 3
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test rendering figures again when their input files change.")
+        input_path = os.path.join(output_dir, 'input.csv')
+        with open(input_path, 'w') as f:
+            f.write('time,a\n')
+        list_of_job = get_jobs(output_dir, 3)
+        for job in list_of_job:
+            job.input_paths = [input_path]
+        assert len(render_figures(list_of_job, processes=1, preview=True)) == 3
+        assert render_figures(list_of_job, processes=1, preview=True) == []
+        with open(input_path, 'a') as f:
+            f.write('0,0\n')
+        assert len(render_figures(list_of_job, processes=1, preview=True)) == 3
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    shutil.rmtree(output_dir)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.min_max_scaler import StreamingMinMaxScaler
+import traceback
+import numpy as np
+import os
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+    list_of_mat = [rng.randn(n, 3)*[1, 10, 100]+[0, 5, -50] for n in [20, 1, 35]]
+
+    try:
+        logger.info("Test partial_fit over chunks equals fit.")
+        scaler = StreamingMinMaxScaler()
+        for mat in list_of_mat:
+            scaler.partial_fit(mat)
+        scaler.partial_fit(np.zeros((0, 3)))
+        fitted_scaler = StreamingMinMaxScaler().fit(list_of_mat)
+        all_mat = np.concatenate(list_of_mat)
+        assert (scaler.data_min == fitted_scaler.data_min).all()
+        assert (scaler.data_max == fitted_scaler.data_max).all()
+        assert (scaler.data_min == all_mat.min(axis=0)).all()
+        assert (scaler.data_max == all_mat.max(axis=0)).all()
+        assert scaler.n_samples_seen == fitted_scaler.n_samples_seen == len(all_mat)
+        assert (scaler.transform(all_mat) == fitted_scaler.transform(all_mat)).all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test inverse_transform undoes transform.")
+        scaler = StreamingMinMaxScaler(feature_range=(-1, 1)).fit(list_of_mat)
+        for mat in list_of_mat:
+            scaled = scaler.transform(mat)
+            assert scaled.min() >= -1-1e-12 and scaled.max() <= 1+1e-12
+            assert np.allclose(scaler.inverse_transform(scaled), mat)
+        all_scaled = scaler.transform(np.concatenate(list_of_mat))
+        assert np.allclose(all_scaled.min(axis=0), -1)
+        assert np.allclose(all_scaled.max(axis=0), 1)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test constant columns are mapped to the lower end of feature_range.")
+        mat = np.column_stack([np.full(10, 3.0), np.arange(10.0)])
+        scaler = StreamingMinMaxScaler(feature_range=(2, 5)).fit([mat])
+        scaled = scaler.transform(mat)
+        assert np.isfinite(scaled).all()
+        assert (scaled[:, 0] == 2).all()
+        assert np.allclose(scaled[:, 1], 2+np.arange(10.0)/3)
+        assert np.allclose(scaler.inverse_transform(scaled), mat)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test saving and loading a scaler.")
+        scaler = StreamingMinMaxScaler(
+            feature_range=(-1, 1),
+            columns=['a', 'b', 'c'],
+            data_key='key_of_lfds',
+        ).fit(list_of_mat)
+        scaler_path = os.path.join(tempfile.mkdtemp(), 'scaler.json')
+        scaler.save(scaler_path)
+        loaded_scaler = StreamingMinMaxScaler.load(scaler_path)
+        assert loaded_scaler.feature_range == (-1, 1)
+        assert loaded_scaler.columns == ['a', 'b', 'c']
+        assert loaded_scaler.data_key == 'key_of_lfds'
+        assert loaded_scaler.n_samples_seen == scaler.n_samples_seen
+        assert (loaded_scaler.data_min == scaler.data_min).all()
+        assert (loaded_scaler.data_max == scaler.data_max).all()
+        for mat in list_of_mat:
+            assert (loaded_scaler.transform(mat) == scaler.transform(mat)).all()
+
+        # An unfitted scaler is saved too, and refuses to transform
+        StreamingMinMaxScaler().save(scaler_path)
+        loaded_scaler = StreamingMinMaxScaler.load(scaler_path)
+        assert loaded_scaler.data_min is None and loaded_scaler.data_key is None
+        try:
+            loaded_scaler.transform(list_of_mat[0])
+        except ValueError:
+            pass
+        else:
+            assert False, "unfitted scaler transformed"
+        os.remove(scaler_path)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
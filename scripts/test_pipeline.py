@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.pipeline import (
+    Pipeline,
+    Stage,
+    StageNotFound,
+    CyclicStages,
+)
+import traceback
+import os
+import time
+import shutil
+import tempfile
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+list_of_call = []
+
+def write_file(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def read_file(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def double(results, input_path, output_path, suffix=''):
+    list_of_call.append('double')
+    text = read_file(input_path)*2+suffix
+    write_file(output_path, text)
+    return text
+
+def count(results, input_path, output_path):
+    list_of_call.append('count')
+    text = results['double']
+    write_file(output_path, str(len(text)))
+    return len(text)
+
+def load_double(input_path, output_path, suffix=''):
+    return read_file(output_path)
+
+def get_pipeline(test_dir, suffix=''):
+    pipeline = Pipeline(os.path.join(test_dir, 'stamp_dir'))
+    params = {
+        'input_path': os.path.join(test_dir, 'a.txt'),
+        'output_path': os.path.join(test_dir, 'b.txt'),
+    }
+    if suffix:
+        params['suffix'] = suffix
+    pipeline.add(Stage(
+        'double',
+        double,
+        input_paths=[params['input_path']],
+        output_paths=[params['output_path']],
+        load=load_double,
+        **params
+    ))
+    pipeline.add(Stage(
+        'count',
+        count,
+        input_paths=[os.path.join(test_dir, 'b.txt')],
+        output_paths=[os.path.join(test_dir, 'c.txt')],
+        after=['double'],
+        input_path=os.path.join(test_dir, 'b.txt'),
+        output_path=os.path.join(test_dir, 'c.txt'),
+    ))
+    return pipeline
+
+if __name__ == '__main__':
+    test_dir = tempfile.mkdtemp()
+    write_file(os.path.join(test_dir, 'a.txt'), 'abc')
+
+    try:
+        logger.info("Test stages run in order and pass results in memory.")
+        pipeline = get_pipeline(test_dir)
+        assert pipeline.get_order() == ['double', 'count']
+        assert pipeline.get_order(['count']) == ['double', 'count']
+        assert pipeline.run() == ['double', 'count']
+        assert pipeline.results == {'double': 'abcabc', 'count': 6}
+        assert read_file(os.path.join(test_dir, 'c.txt')) == '6'
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test stages with unchanged inputs are skipped.")
+        list_of_call[:] = []
+        assert get_pipeline(test_dir).run() == []
+        assert list_of_call == []
+
+        # A missing output makes its stage run, with the result of the
+        # stage before it loaded from disk
+        os.remove(os.path.join(test_dir, 'c.txt'))
+        pipeline = get_pipeline(test_dir)
+        assert pipeline.run() == ['count']
+        assert pipeline.results['count'] == 6
+
+        assert get_pipeline(test_dir).run(force=True) == ['double', 'count']
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test changed inputs and params make stages after them run.")
+        write_file(os.path.join(test_dir, 'a.txt'), 'abcd')
+        # Make sure mtime changes
+        os.utime(os.path.join(test_dir, 'a.txt'), (time.time()+10, time.time()+10))
+        pipeline = get_pipeline(test_dir)
+        assert pipeline.run() == ['double', 'count']
+        assert pipeline.results['count'] == 8
+
+        pipeline = get_pipeline(test_dir, suffix='!')
+        assert pipeline.run() == ['double', 'count']
+        assert pipeline.results['count'] == 9
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test unknown and cyclic stages are refused.")
+        pipeline = Pipeline(os.path.join(test_dir, 'stamp_dir'))
+        pipeline.add(Stage('a', double, after=['b']))
+        pipeline.add(Stage('b', double, after=['a']))
+        pipeline.add(Stage('c', double, after=['d']))
+        for targets, exception_type in [(['a'], CyclicStages), (['c'], StageNotFound)]:
+            try:
+                pipeline.get_order(targets)
+            except exception_type:
+                pass
+            else:
+                raise AssertionError("%s not raised for %s"%(exception_type.__name__, targets))
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(test_dir)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.plot_decimator import (
+    get_decimated_index,
+    decimate,
+    plot_decimated,
+)
+from birl_generic_data_handler.figure_renderer import new_figure
+import traceback
+import numpy as np
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+
+    try:
+        logger.info("Test keeping min and max of every bucket.")
+        for length, n_buckets in [(180000, 1600), (1001, 10), (7, 100), (3, 1)]:
+            y = rng.randn(length)
+            index = get_decimated_index(y, n_buckets)
+            assert len(index) <= max(2*n_buckets+2, length)
+            assert (np.diff(index) > 0).all()
+            assert index[0] == 0 and index[-1] == length-1
+            assert y[index].max() == y.max() and y[index].min() == y.min()
+        y = rng.randn(10000)
+        y[1234] = 100
+        x, decimated_y = decimate(np.arange(10000)*0.01, y, 50)
+        assert 100 in decimated_y
+        assert np.isclose(x[decimated_y == 100][0], 12.34)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test forced indices and NaN.")
+        y = rng.randn(10000)
+        y[:500] = np.nan
+        index = get_decimated_index(y, 20, keep_index=[4321, 4322])
+        assert 4321 in index and 4322 in index
+        assert np.nanmax(y[index]) == np.nanmax(y)
+        assert (index < 10000).all()
+        mat = rng.randn(5000, 3)
+        index = get_decimated_index(mat, 10)
+        assert (mat[index].max(axis=0) == mat.max(axis=0)).all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test plotting a decimated series.")
+        fig = new_figure()
+        fig.set_size_inches(4, 3)
+        ax = fig.add_subplot(111)
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), color='red')
+        assert len(lines[0].get_xdata()) <= 2*4*fig.dpi+2
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), dpi=4*fig.dpi)
+        assert len(lines[0].get_xdata()) > 2*4*fig.dpi+2
+        # A scatter keeps every point
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), marker='.', linestyle='None')
+        assert len(lines[0].get_xdata()) == 100000
+        # So does a line with markers
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), marker='o')
+        assert len(lines[0].get_xdata()) == 100000
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), 'k.-')
+        assert len(lines[0].get_xdata()) == 100000
+        # Format strings are passed on
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), 'r--')
+        assert len(lines[0].get_xdata()) <= 2*4*fig.dpi+2
+        assert lines[0].get_color() == 'r' and lines[0].get_linestyle() == '--'
+        assert lines[0].get_marker() in (None, 'None', '')
+        lines = plot_decimated(ax, np.arange(100000), rng.randn(100000), 'C1-.')
+        assert len(lines[0].get_xdata()) <= 2*4*fig.dpi+2
+        assert lines[0].get_linestyle() == '-.'
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
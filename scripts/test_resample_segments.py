@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.csv_handler import (
+    CsvHandler,
+    RaggedArray,
+    resample_segments,
+    get_resample_time_index,
+)
+import traceback
+import numpy as np
+import pandas
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    rng = np.random.RandomState(0)
+    list_of_time = []
+    list_of_data = []
+    list_of_new_time = []
+    for i in range(20):
+        n = rng.randint(2, 50)
+        t = np.sort(rng.rand(n)*10+100*i)
+        list_of_time.append(t)
+        list_of_data.append(rng.rand(n, 3))
+        list_of_new_time.append(get_resample_time_index(t[0], t[-1], 10))
+
+    try:
+        logger.info("Test batched resampling against per-segment numpy.interp.")
+        ret = resample_segments(list_of_time, list_of_data, list_of_new_time)
+        assert type(ret) == RaggedArray
+        assert len(ret) == len(list_of_time)
+        for t, data, new_t, resampled in zip(list_of_time, list_of_data, list_of_new_time, ret):
+            assert resampled.shape == (len(new_t), 3)
+            for col in range(3):
+                assert np.allclose(resampled[:, col], np.interp(new_t, t, data[:, col]))
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test segments with duplicated, unsorted or no samples.")
+        ret = resample_segments(
+            [[1, 0, 1, 2], []],
+            [[10, 0, 99, 20], []],
+            [[0.5, 1.5, 3], [0]],
+        )
+        assert np.allclose(ret[0][:, 0], [5, 15, 20])
+        assert np.isnan(ret[1]).all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test return value types of resample_df_segments.")
+        df = pandas.DataFrame({
+            'time': np.arange(10)*0.1,
+            'x': np.arange(10)*1.0,
+            'name': ['a']*10,
+        }).set_index('time')
+        ret = CsvHandler().resample_df_segments(
+            [df, df.iloc[2:5]],
+            [get_resample_time_index(0, 0.9, 20), [0.25]],
+        )
+        assert len(ret) == 2
+        assert type(ret[0]) == pandas.core.frame.DataFrame
+        assert list(ret[0].columns) == list(df.columns)
+        assert ret[0].index.name == 'time'
+        assert np.allclose(ret[1]['x'].values, [2.5])
+        assert ret[1]['name'].isnull().all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.sensor_ring_buffer import SensorRingBuffer
+from birl_generic_data_handler.csv_handler import resample_segments
+import traceback
+import numpy as np
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    time = np.arange(25)*0.5
+    data = np.column_stack([time*2, -time])
+
+    try:
+        logger.info("Test the buffer keeps the latest samples in order.")
+        buf = SensorRingBuffer(10, 2)
+        assert len(buf) == 0 and len(buf.times) == 0
+        for i in range(25):
+            buf.append(time[i], data[i])
+            n = min(i+1, 10)
+            assert len(buf) == n
+            assert (buf.times == time[i+1-n:i+1]).all()
+            assert (buf.data == data[i+1-n:i+1]).all()
+        assert buf.is_full()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test windows are views found by time.")
+        times, window = buf.window(9, 10.5)
+        assert (times == [9, 9.5, 10, 10.5]).all()
+        assert (window == data[18:22]).all()
+        assert np.shares_memory(window, buf._data)
+        times, window = buf.window(0, 1)
+        assert len(times) == 0
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test discard_before and reserve.")
+        buf.discard_before(10)
+        assert (buf.times == time[20:]).all()
+        buf.reserve(3)
+        assert buf.capacity == 3 and (buf.times == time[22:]).all()
+        buf.reserve(8)
+        assert (buf.data == data[22:]).all()
+        buf.append(12.5, [0, 0])
+        assert (buf.times == [11, 11.5, 12, 12.5]).all()
+        buf.clear()
+        assert len(buf) == 0
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test resampling a buffer.")
+        buf = SensorRingBuffer(10, 2)
+        for i in range(25):
+            buf.append(time[i], data[i])
+        new_time = np.linspace(8, 11, 7)
+        resampled = buf.resample(new_time, 7, 12)
+        assert np.allclose(resampled[:, 0], new_time*2)
+        assert np.allclose(resampled, resample_segments([time], [data], [new_time])[0])
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.stage_profiler import (
+    StageProfiler,
+    NULL_PROFILER,
+    FIELDS,
+)
+from birl_generic_data_handler.csv_handler import CsvHandler
+from birl_offline_data_handler_test.synthetic_data import write_synthetic_csvs
+import traceback
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+if __name__ == '__main__':
+    try:
+        logger.info("Test records are kept per bag and stage.")
+        profiler = StageProfiler()
+        for bag_path in ['a.bag', 'b.bag']:
+            with profiler.bag(bag_path):
+                with profiler.stage('decode') as record:
+                    record['messages'] += 10
+                profiler.add('decode', bytes_read=100)
+                profiler.cache('bag_to_csv', hit=bag_path == 'a.bag')
+        with profiler.stage('decode'):
+            pass
+        summary = profiler.get_summary()
+        assert sorted(summary['bags']) == ['', 'a.bag', 'b.bag']
+        record = summary['bags']['a.bag']['decode']
+        assert sorted(record) == sorted(FIELDS)
+        assert record['calls'] == 1 and record['messages'] == 10 and record['bytes_read'] == 100
+        assert record['wall_secs'] >= 0 and record['cpu_secs'] >= 0
+        assert summary['total']['decode']['calls'] == 3
+        assert summary['total']['bag_to_csv']['cache_hits'] == 1
+        assert summary['total']['bag_to_csv']['cache_misses'] == 1
+        assert 'a.bag' in profiler.format_summary()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test the null profiler records nothing.")
+        with NULL_PROFILER.bag('a.bag'):
+            with NULL_PROFILER.stage('decode') as record:
+                record['messages'] += 10
+            NULL_PROFILER.add('decode', bytes_read=100)
+        assert record['messages'] == 0
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    test_dir = tempfile.mkdtemp()
+    try:
+        logger.info("Test stages of CSV writing and anomaly extraction are recorded.")
+        profiler = StageProfiler()
+        with profiler.bag('synthetic.bag'):
+            bag, data_csv_path, flag_csv_path = write_synthetic_csvs(
+                test_dir, 'synthetic', duration_secs=30, profiler=profiler)
+            ch = CsvHandler(profiler=profiler)
+            ch.extract_anomaly_data(
+                pd.read_csv(data_csv_path, sep=','),
+                pd.read_csv(flag_csv_path, sep=','),
+                4,
+                10,
+            )
+            ch.extract_confirmed_anomaly_data(
+                [pd.read_csv(data_csv_path, sep=',')],
+                [pd.read_csv(flag_csv_path, sep=',')],
+            )
+        stages = profiler.get_summary()['bags']['synthetic.bag']
+        assert stages['decode']['messages'] == bag.n_messages
+        assert stages['format']['messages'] == bag.n_messages
+        assert stages['time_parse']['calls'] == 2
+        assert stages['onset_detection']['calls'] == 2
+        assert stages['resample']['calls'] == 1
+        assert stages['slice']['calls'] == 1
+        profiler.save(os.path.join(test_dir, 'profile.json'))
+        with open(os.path.join(test_dir, 'profile.json'), 'r') as f:
+            assert json.load(f)['total']['decode']['messages'] == bag.n_messages
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(test_dir)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import (
+    bag_to_csv,
+    chunk_parallel_bag_to_csv,
+)
+from birl_offline_data_handler.rosbag_handler import RosbagHandler
+from birl_offline_data_handler_test.synthetic_data import SyntheticBag, Time
+import traceback
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+class HeaderlessBag(object):
+    def read_messages(self, topics=None, start_time=None, end_time=None):
+        for i in range(3):
+            yield '/joint_states', Time(1500000000+i), Time(1500000000+i)
+
+def open_jittery_bag(bag_path):
+    return SyntheticBag(
+        duration_secs=5,
+        n_fields=2,
+        flag_density=0.05,
+        record_jitter_secs=0.05,
+        chunk_secs=1,
+        seed=3,
+    )
+
+def read_secs(csv_path, column):
+    time = pd.to_datetime(pd.read_csv(csv_path)[column], format='%Y/%m/%d/%H:%M:%S.%f')
+    return (time-time[0]).dt.total_seconds().values, time
+
+if __name__ == '__main__':
+    test_dir = tempfile.mkdtemp()
+    bag = SyntheticBag(duration_secs=5, n_fields=2, record_latency_secs=0.25)
+    expected_secs = bag.data_time-bag.data_time[0]
+
+    try:
+        logger.info("Test rows are stamped by record time, header stamp or both.")
+        csv_path_by_source = {}
+        for stamp_source in ['record', 'header', 'both']:
+            csv_path_by_source[stamp_source] = os.path.join(test_dir, stamp_source+'.csv')
+            bag_to_csv(bag, csv_path_by_source[stamp_source], '/tag_multimodal', stamp_source=stamp_source)
+
+        record_secs, record_time = read_secs(csv_path_by_source['record'], 'time')
+        header_secs, header_time = read_secs(csv_path_by_source['header'], 'time')
+        assert np.allclose(record_secs, expected_secs, atol=1e-5)
+        assert np.allclose(header_secs, expected_secs, atol=1e-5)
+        assert np.allclose((record_time-header_time).dt.total_seconds(), 0.25, atol=1e-5)
+
+        columns = list(pd.read_csv(csv_path_by_source['both']).columns)
+        assert columns[:2] == ['time', 'record_time']
+        assert columns[2:] == list(pd.read_csv(csv_path_by_source['header']).columns)[1:]
+        both_secs, both_time = read_secs(csv_path_by_source['both'], 'time')
+        both_record_secs, both_record_time = read_secs(csv_path_by_source['both'], 'record_time')
+        assert (both_time == header_time).all()
+        assert (both_record_time == record_time).all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test rows of header stamps out of order in the bag are sorted.")
+        jittery_bag = open_jittery_bag('jittery.bag')
+        list_of_header_stamp = [
+            msg.header.stamp.secs*1000000000+msg.header.stamp.nsecs
+            for topic, msg, time in jittery_bag.read_messages(topics='/tag_multimodal')
+        ]
+        assert np.any(np.diff(list_of_header_stamp) < 0)
+
+        for topic_name in [jittery_bag.data_topic, jittery_bag.flag_topic]:
+            record_csv_path = os.path.join(test_dir, 'jittery-record.csv')
+            bag_to_csv(jittery_bag, record_csv_path, topic_name, stamp_source='record')
+            record_df = pd.read_csv(record_csv_path)
+            for stamp_source in ['header', 'both']:
+                csv_path = os.path.join(test_dir, 'jittery-'+stamp_source+'.csv')
+                parallel_csv_path = os.path.join(test_dir, 'jittery-parallel.csv')
+                bag_to_csv(jittery_bag, csv_path, topic_name, stamp_source=stamp_source)
+                chunk_parallel_bag_to_csv(
+                    jittery_bag,
+                    'jittery.bag',
+                    parallel_csv_path,
+                    topic_name,
+                    processes=3,
+                    stamp_source=stamp_source,
+                    open_bag=open_jittery_bag,
+                )
+                secs, time = read_secs(csv_path, 'time')
+                assert time.is_monotonic_increasing
+                df = pd.read_csv(csv_path)
+                assert len(df) == len(record_df)
+                assert list(df['.header.seq']) == sorted(record_df['.header.seq'])
+                assert pd.read_csv(parallel_csv_path).equals(df)
+            # Record times stay as they were recorded
+            assert read_secs(record_csv_path, 'time')[1].is_monotonic_increasing
+            if topic_name == jittery_bag.data_topic:
+                assert list(record_df['.header.seq']) != sorted(record_df['.header.seq'])
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test topics without header and unknown sources are refused.")
+        csv_path = os.path.join(test_dir, 'joint_states.csv')
+        for stamp_source, kwargs in [
+            ('header', {'bag': HeaderlessBag()}),
+            ('bad', {'bag': bag}),
+            ('bad', {'path_to_rosbag': test_dir}),
+        ]:
+            try:
+                if 'bag' in kwargs:
+                    bag_to_csv(kwargs['bag'], csv_path, '/joint_states', stamp_source=stamp_source)
+                else:
+                    RosbagHandler(kwargs['path_to_rosbag'], stamp_source=stamp_source)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("ValueError not raised for %s"%(stamp_source,))
+        assert not os.path.exists(csv_path)
+        bag_to_csv(HeaderlessBag(), csv_path, '/joint_states')
+        assert len(pd.read_csv(csv_path)) == 3
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test CSVs of each stamp source are cached apart.")
+        list_of_csv_path = [
+            RosbagHandler(test_dir, stamp_source=stamp_source)._get_csv_path(
+                os.path.join(test_dir, 's01.bag'), '/tag_multimodal')
+            for stamp_source in ['record', 'header', 'both']
+        ]
+        assert list_of_csv_path[0] == os.path.join(test_dir, 's01', 's01-tag_multimodal.csv')
+        assert len(set(list_of_csv_path)) == 3
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+    finally:
+        shutil.rmtree(test_dir)
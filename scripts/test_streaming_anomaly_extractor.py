@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.streaming_anomaly_extractor import (
+    StreamingAnomalyExtractor
+)
+from birl_generic_data_handler.csv_handler import (
+    CsvHandler,
+)
+import traceback
+import numpy as np
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_trial():
+    # 30 s trial at about 100 hz, anomalies flagged at 2.1 s, 14.08 s and
+    # 24.5 s; (end-start)*hz of the first two windows rounds down to 39
+    rng = np.random.RandomState(0)
+    data_time = np.cumsum(rng.uniform(0.005, 0.015, 3000))
+    data_time -= data_time[0]
+    data = np.column_stack([np.sin(data_time), np.cos(3*data_time)])
+    flag_time = np.concatenate([
+        2.1+np.arange(10)*0.1,
+        14.08+np.arange(20)*0.1,
+        24.5+np.arange(5)*0.1,
+    ])
+    return data_time, data, flag_time
+
+def stream(sae, data_time, data, flag_time):
+    windows = []
+    flag_idx = 0
+    for t, values in zip(data_time, data):
+        while flag_idx < len(flag_time) and flag_time[flag_idx] <= t:
+            windows += sae.add_flag(flag_time[flag_idx])
+            flag_idx += 1
+        windows += sae.add_sample(t, values)
+    return windows, flag_idx
+
+if __name__ == '__main__':
+    columns = ['a', 'b']
+    data_time, data, flag_time = get_trial()
+
+    try:
+        logger.info("Test streamed windows are the offline windows.")
+        sae = StreamingAnomalyExtractor(4, 10, columns)
+        windows, flag_idx = stream(sae, data_time, data, flag_time)
+        windows += sae.flush()
+        assert [i[0] for i in windows] == [2.1, 14.08, 24.5]
+
+        trial_start = pd.Timestamp('2017-01-01 12:00:00')
+        to_str = lambda t: [str(trial_start+pd.Timedelta(seconds=i)) for i in t]
+        data_df = pd.DataFrame(data, columns=columns)
+        data_df.insert(0, 'time', to_str(data_time))
+        flag_df = pd.DataFrame({'time': to_str(flag_time)})
+        list_of_offline_df = CsvHandler().extract_anomaly_data(data_df, flag_df, 4, 10)
+        trial_df = pd.DataFrame(data, index=pd.Index(data_time, name='time'), columns=columns)
+        assert len(windows) == len(list_of_offline_df)
+        for (anomaly_t, df), offline_df in zip(windows, list_of_offline_df):
+            assert len(df) == len(offline_df) == 40
+            assert np.allclose(df.index.values, offline_df.index.values)
+            expected_df, = CsvHandler().resample_df_segments(
+                [trial_df], [np.linspace(anomaly_t-2, anomaly_t+2, 40)])
+            assert list(df.columns) == columns
+            assert np.allclose(df.values, expected_df.values)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test windows are emitted once their trailing half arrives.")
+        sae = StreamingAnomalyExtractor(4, 10, columns)
+        assert sae.add_flag(5) == []
+        stop = data_time.searchsorted(7)
+        for t, values in zip(data_time[:stop], data[:stop]):
+            assert sae.add_sample(t, values) == []
+        windows = sae.add_sample(7, data[stop])
+        assert len(windows) == 1 and windows[0][0] == 5
+        assert sae.flush() == []
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test the buffer grows only to hold window+1 s of samples.")
+        sae = StreamingAnomalyExtractor(4, 10, columns)
+        ref_windows, flag_idx = stream(sae, data_time, data, flag_time)
+        sae = StreamingAnomalyExtractor(4, 10, columns, capacity=16)
+        windows, flag_idx = stream(sae, data_time, data, flag_time)
+        # at most 1000 samples in 5 s
+        assert sae._buffer.capacity <= 1024
+        assert len(windows) == len(ref_windows)
+        for (t, df), (ref_t, ref_df) in zip(windows, ref_windows):
+            assert t == ref_t and df.equals(ref_df)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.topic_synchronizer import (
+    get_asof_index,
+    get_linear_weights,
+    join_topic,
+    synchronize_topics,
+)
+import traceback
+import numpy as np
+import pandas as pd
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+def get_time_strings(secs):
+    # secs after 1500000000 since epoch
+    return [
+        (pd.Timestamp(1500000000, unit='s')+pd.Timedelta(seconds=i)).strftime('%Y/%m/%d/%H:%M:%S.%f')
+        for i in secs
+    ]
+
+if __name__ == '__main__':
+    times = [1.0, 2.0, 3.0]
+
+    try:
+        logger.info("Test previous and nearest samples are found within tolerance.")
+        clock = [0.5, 1.0, 1.4, 1.6, 2.5, 3.0, 9.0]
+        assert list(get_asof_index(clock, times)) == [-1, 0, 0, 0, 1, 2, 2]
+        assert list(get_asof_index(clock, times, 'nearest')) == [0, 0, 0, 1, 1, 2, 2]
+        assert list(get_asof_index(clock, times, 'previous', 0.5)) == [-1, 0, 0, -1, 1, 2, -1]
+        assert list(get_asof_index(clock, times, 'nearest', 0.45)) == [-1, 0, 0, 1, -1, 2, -1]
+        assert list(get_asof_index(clock, [], 'nearest')) == [-1]*7
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test linear weights cover both ends and refuse outside ticks.")
+        before, after, weight, valid = get_linear_weights([0.5, 1.0, 1.25, 3.0, 3.5], times)
+        assert list(valid) == [False, True, True, True, False]
+        values = np.array([10.0, 20.0, 40.0])
+        assert np.allclose((values[before]*(1-weight)+values[after]*weight)[valid], [10.0, 12.5, 40.0])
+        before, after, weight, valid = get_linear_weights([1.25, 2.5], [1.0, 2.0, 4.0], tolerance=1.0)
+        assert list(valid) == [True, False]
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test a topic is joined per column, NaN where no sample is taken.")
+        df = pd.DataFrame({
+            'time': [3.0, 1.0, 2.0],
+            '.tag': [5, 0, 2],
+            '.f0': [40.0, 10.0, 20.0],
+            '.name': ['c', 'a', 'b'],
+        }, columns=['time', '.tag', '.f0', '.name'])
+        joined = join_topic([0.5, 1.25, 2.0], df, 'linear')
+        assert list(joined.columns) == ['.tag', '.f0', '.name']
+        assert np.isnan(joined['.f0'][0]) and np.isnan(joined['.tag'][0])
+        assert np.allclose(joined['.f0'][1:], [12.5, 20.0])
+        assert np.allclose(joined['.tag'][1:], [0.5, 2.0])
+        # Not numeric, so joined by nearest
+        assert list(joined['.name']) == ['a', 'a', 'b']
+
+        joined = join_topic([0.5, 1.25, 2.0], df, 'previous')
+        assert list(joined['.tag'][1:]) == [0, 2]
+        assert list(joined['.name'][1:]) == ['a', 'b']
+        assert joined.iloc[0].isnull().all()
+
+        joined = join_topic([1.25], df.iloc[:0], 'previous')
+        assert len(joined) == 1 and joined.isnull().all().all()
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test topics at different rates are joined onto one clock.")
+        data_secs = np.arange(0, 10, 0.01)
+        tag_df = pd.DataFrame({
+            'time': get_time_strings(data_secs),
+            '.tag': (data_secs >= 5).astype(int),
+            '.values.f0': data_secs*2,
+        }, columns=['time', '.tag', '.values.f0'])
+        wrench_secs = np.arange(0, 10, 0.005)+0.0025
+        wrench_df = pd.DataFrame({
+            'time': get_time_strings(wrench_secs),
+            '.force.x': wrench_secs*3,
+        })
+        flag_df = pd.DataFrame({
+            'time': get_time_strings([4.004]),
+            '.data': [1],
+        })
+        list_of_topic = [
+            ('/tag_multimodal', tag_df),
+            ('/wrench', wrench_df),
+            ('/anomaly_detection_signal', flag_df),
+        ]
+        df = synchronize_topics(
+            list_of_topic,
+            clock='/tag_multimodal',
+            method={
+                '/tag_multimodal': 'previous',
+                '/wrench': 'linear',
+                '/anomaly_detection_signal': 'previous',
+            },
+            tolerance={'/anomaly_detection_signal': 0.05},
+        )
+        assert list(df.columns) == [
+            'time',
+            '/tag_multimodal.tag',
+            '/tag_multimodal.values.f0',
+            '/wrench.force.x',
+            '/anomaly_detection_signal.data',
+        ]
+        assert len(df) == len(tag_df)
+        assert np.issubdtype(df['time'].dtype, np.datetime64)
+        assert (df['/tag_multimodal.tag'].values == tag_df['.tag'].values).all()
+        valid = df['/wrench.force.x'].notnull().values
+        assert valid.sum() == len(tag_df)-1
+        assert np.allclose(df['/wrench.force.x'].values[valid], data_secs[valid]*3, atol=1e-4)
+        flagged = df['/anomaly_detection_signal.data'].notnull().values
+        assert np.allclose(data_secs[flagged], np.arange(4.01, 4.055, 0.01))
+
+        # Ticks are given back to the nanosecond, not through float epoch
+        assert (df['time'].values == pd.to_datetime(tag_df['time'], format='%Y/%m/%d/%H:%M:%S.%f').values).all()
+
+        df = synchronize_topics(list_of_topic[:2], hz=10)
+        assert len(df) == 99
+        assert np.allclose(df['/tag_multimodal.values.f0'], np.linspace(0.0025, 9.99, 99)*2, atol=0.02)
+
+        for kwargs in [{}, {'clock': '/wrench', 'hz': 10}]:
+            try:
+                synchronize_topics(list_of_topic, **kwargs)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("ValueError not raised for %s"%(kwargs,))
+        try:
+            synchronize_topics([('', tag_df), ('', tag_df)], clock=data_secs)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("ValueError not raised for duplicated columns")
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test times keep sub-microsecond precision.")
+        value_df = pd.DataFrame({
+            'time': get_time_strings([0.0, 1.0, 2.0]),
+            '.data': [1.0, 2.0, 3.0],
+        }, columns=['time', '.data'])
+        clock_df = pd.DataFrame({'time': get_time_strings([0.6, 1.2, 1.8])})
+        df = synchronize_topics(
+            [('/clock', clock_df), ('/value', value_df)],
+            clock='/clock',
+            method='linear',
+        )
+        assert np.allclose(df['/value.data'], [1.6, 2.2, 2.8], rtol=0, atol=1e-9)
+
+        df = synchronize_topics([('/value', value_df)], hz=20, method='linear')
+        nsecs = df['time'].values.astype('datetime64[ns]').astype(np.int64)
+        step = np.diff(nsecs)
+        assert len(df) == 40
+        assert np.abs(step-2000000000.0/39).max() <= 1
+        assert np.abs(df['/value.data'].values-(1+(nsecs-nsecs[0])/1e9)).max() < 1e-9
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
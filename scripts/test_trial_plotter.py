@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+from birl_generic_data_handler.trial_plotter import TrialPlotter
+import traceback
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import tempfile
+import multiprocessing
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+COLUMNS = [
+    '.endpoint_state.pose.position.x',
+    '.endpoint_state.pose.position.y',
+    '.endpoint_state.pose.position.z',
+    '.endpoint_state.pose.orientation.x',
+    '.endpoint_state.pose.orientation.y',
+    '.endpoint_state.pose.orientation.z',
+    '.endpoint_state.pose.orientation.w',
+    '.wrench_stamped.wrench.force.x',
+    '.wrench_stamped.wrench.force.y',
+    '.wrench_stamped.wrench.force.z',
+    '.wrench_stamped.wrench.torque.x',
+    '.wrench_stamped.wrench.torque.y',
+    '.wrench_stamped.wrench.torque.z',
+]
+
+def get_trial_df(length, seed):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame(
+        rng.randn(length, len(COLUMNS)).cumsum(axis=0),
+        columns=COLUMNS,
+        index=np.arange(length)*0.01,
+    )
+
+def plot_in_worker(output_dir):
+    plotter = TrialPlotter(headless=True)
+    plotter.add_trial(get_trial_df(1000, 0), color='red', label='01')
+    plotter.plot_legend()
+    return plotter.save_figures(output_dir)
+
+if __name__ == '__main__':
+    try:
+        logger.info("Test adding and updating trials.")
+        plotter = TrialPlotter(headless=True)
+        plotter.add_trial(get_trial_df(1000, 0), color='red', label='01')
+        plotter.add_trial(get_trial_df(500, 1)[COLUMNS[7:]], color='blue', label='02')
+        assert plotter.labels == ['01', '02']
+        assert len(plotter.axes['pos'].lines) == 1
+        assert len(plotter.axes['fx'].lines) == 2
+
+        line = plotter.axes['fx'].lines[0]
+        df = get_trial_df(2000, 2)
+        plotter.add_trial(df, color='green', label='01')
+        assert len(plotter.axes['fx'].lines) == 2
+        assert plotter.axes['fx'].lines[0] is line
+        assert line.get_xdata()[-1] == df.index[-1]
+        assert plotter.axes['fx'].get_xlim()[1] >= df.index[-1]
+
+        plotter.remove_trial('02')
+        assert plotter.labels == ['01']
+        assert len(plotter.axes['fx'].lines) == 1
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
+
+    try:
+        logger.info("Test plotting in worker processes.")
+        list_of_output_dir = [tempfile.mkdtemp() for i in range(2)]
+        pool = multiprocessing.Pool(2)
+        list_of_paths = pool.map(plot_in_worker, list_of_output_dir)
+        pool.close()
+        pool.join()
+        for list_of_path in list_of_paths:
+            assert len(list_of_path) == 3
+            for path in list_of_path:
+                assert os.path.isfile(path)
+        for output_dir in list_of_output_dir:
+            shutil.rmtree(output_dir)
+    except AssertionError as e:
+        traceback.print_exc()
+        logger.error('failed.')
+    else:
+        logger.info("passed.")
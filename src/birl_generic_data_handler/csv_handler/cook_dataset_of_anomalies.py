@@ -1,5 +1,3 @@
-import pandas as pd
-import ipdb
 import os
 from shutil import copyfile
 
@@ -16,7 +14,7 @@ def get_label(f):
     raise Exception("cannot get label from \"%s\""%f)
 
 
-if __name__ == "__main__":
+def get_option_parser():
     from optparse import OptionParser
     usage = "usage: %prog -d base_folder_path"
     parser = OptionParser(usage=usage)
@@ -24,25 +22,93 @@ if __name__ == "__main__":
     parser.add_option("-d", "--base-folder",
         action="store", type="string", dest="base_folder",
         help="the folder contains anomaly csv.")
-    (options, args) = parser.parse_args()
 
-    if options.base_folder is None:
-        parser.error("no base_folder")
+    parser.add_option("--pack",
+        action="store_true", dest="pack",
+        default=False,
+        help="pack anomalies into one memory-mapped dataset in packed_dataset_of_resampled_anomalies_dir instead of copying csv.")
+
+    parser.add_option("--mode",
+        action="store", type="choice", dest="mode",
+        choices=["copy", "manifest", "hardlink", "symlink"], default=None,
+        help="how anomaly csv get into the dataset: copy, hardlink or symlink them into dataset_of_resampled_anomalies_dir, or only write their labels to manifest_of_resampled_anomalies.csv. copy by default. Can't be given with --pack.")
+    return parser
+
+def run(options):
+    """Put the resampled anomalies of base_folder into a labeled dataset.
+
+    Args:
+        options: Options parsed by get_option_parser.
+    """
     base_folder = options.base_folder
+    mode = "copy" if options.mode is None else options.mode
 
     resampled_anomalies_dir = os.path.join(base_folder, 'resampled_anomalies_dir')
 
+    files = os.listdir(resampled_anomalies_dir)
+    files.sort()
+
+    if options.pack:
+        from birl_generic_data_handler.dataset_packer import pack_csv_files
+        pack_csv_files(
+            [os.path.join(resampled_anomalies_dir, f) for f in files],
+            os.path.join(base_folder, 'packed_dataset_of_resampled_anomalies_dir'),
+            get_label,
+        )
+        return
+
+    if mode == "manifest":
+        from birl_generic_data_handler.dataset_manifest import write_manifest
+        write_manifest(
+            os.path.join(base_folder, 'manifest_of_resampled_anomalies.csv'),
+            [os.path.join(resampled_anomalies_dir, f) for f in files],
+            [get_label(f) for f in files],
+        )
+        return
+
     dataset_of_resampled_anomalies_dir = os.path.join(base_folder, 'dataset_of_resampled_anomalies_dir')
     if not os.path.isdir(dataset_of_resampled_anomalies_dir):
         os.makedirs(dataset_of_resampled_anomalies_dir)
 
-    files = os.listdir(resampled_anomalies_dir)
-    files.sort()
+    import re
+    import errno
+    existing_files = os.listdir(dataset_of_resampled_anomalies_dir)
     for f in files:
         label = get_label(f)
         file_name = "label_(%s)_from_(%s)"%(label, f)
-        copyfile(
-            src=os.path.join(resampled_anomalies_dir, f),     
-            dst=os.path.join(dataset_of_resampled_anomalies_dir, file_name+'.csv')
-        )
-    
+        src = os.path.join(resampled_anomalies_dir, f)
+        dst = os.path.join(dataset_of_resampled_anomalies_dir, file_name+'.csv')
+
+        # Drop files of f labeled differently before, and f itself, since
+        # links can't be overwritten
+        pattern = re.compile(r"^label_\(.*\)_from_\(%s\)\.csv$"%(re.escape(f),))
+        for existing_f in existing_files:
+            if pattern.match(existing_f):
+                os.remove(os.path.join(dataset_of_resampled_anomalies_dir, existing_f))
+
+        if mode == "symlink":
+            os.symlink(os.path.relpath(src, dataset_of_resampled_anomalies_dir), dst)
+        elif mode == "hardlink":
+            try:
+                os.link(src, dst)
+            except OSError as exc:
+                # Hard links can't cross file systems
+                if exc.errno != errno.EXDEV:
+                    raise
+                copyfile(src=src, dst=dst)
+        else:
+            copyfile(
+                src=src,
+                dst=dst,
+            )
+
+if __name__ == "__main__":
+    parser = get_option_parser()
+    (options, args) = parser.parse_args()
+
+    if options.base_folder is None:
+        parser.error("no base_folder")
+    if options.pack and options.mode is not None:
+        parser.error("--pack and --mode can't be given together")
+
+    run(options)
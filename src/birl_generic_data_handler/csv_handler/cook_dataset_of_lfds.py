@@ -1,14 +1,5 @@
-import pandas as pd
-import ipdb
 import os
-from shutil import copyfile
-import dtw
-import matplotlib.pyplot as plt
-import birl.robot_introspection_pkg.multi_modal_config as mmc
-import copy
-import numpy as np
 import shutil
-from sklearn.preprocessing import normalize, MinMaxScaler
 
 PLOT_VERIFICATION = True 
 
@@ -25,7 +16,7 @@ def get_label(f):
     raise Exception("cannot get label from \"%s\""%f)
 
 
-if __name__ == "__main__":
+def get_option_parser():
     from optparse import OptionParser
     usage = "usage: %prog -d base_folder_path"
     parser = OptionParser(usage=usage)
@@ -33,12 +24,73 @@ if __name__ == "__main__":
     parser.add_option("-d", "--base-folder",
         action="store", type="string", dest="base_folder",
         help="the folder contains lfd csv.")
-    (options, args) = parser.parse_args()
 
-    if options.base_folder is None:
-        parser.error("no base_folder")
+    parser.add_option("--dtw-window",
+        action="store", type="int", dest="dtw_window",
+        default=None,
+        help="half width of the Sakoe-Chiba band in timesteps, no band by default.")
+
+    parser.add_option("-p", "--processes",
+        action="store", type="int", dest="processes",
+        default=None,
+        help="amount of processes to run DTW and render figures in, the amount of CPUs by default.")
+
+    parser.add_option("--pack",
+        action="store_true", dest="pack",
+        default=False,
+        help="also pack DTWed LfDs of each label into one memory-mapped dataset in packed_dataset_of_resampled_DTWed_lfd_dir.")
+
+    parser.add_option("--preview",
+        action="store_true", dest="preview",
+        default=False,
+        help="render verification figures at a low resolution.")
+
+    parser.add_option("--align-mode",
+        action="store", type="choice", dest="align_mode",
+        choices=["shortest", "barycenter"], default="shortest",
+        help="align lfds of a label to the shortest one, or to their DTW barycenter. Default: shortest.")
+
+    parser.add_option("--template-dir",
+        action="store", type="string", dest="template_dir",
+        default=None,
+        help="the folder to keep DTW barycenters in, which can be shared by datasets. Default: base_folder/dtw_barycenter_dir.")
+
+    parser.add_option("--dba-iterations",
+        action="store", type="int", dest="dba_iterations",
+        default=10,
+        help="max amount of DBA iterations when building a new DTW barycenter. Default: 10.")
+
+    parser.add_option("--refine-barycenter",
+        action="store_true", dest="refine_barycenter",
+        default=False,
+        help="refine saved DTW barycenters over all lfds, instead of only aligning new lfds to them until they drift.")
+
+    parser.add_option("--scaler-scope",
+        action="store", type="choice", dest="scaler_scope",
+        choices=["label", "dataset"], default="label",
+        help="fit one min-max scaler per label, or one for the whole dataset. Default: label.")
+
+    parser.add_option("--refit-scaler",
+        action="store_true", dest="refit_scaler",
+        default=False,
+        help="refit min-max scalers even if ones saved in base_folder/min_max_scaler_dir were fitted on the same lfds.")
+    return parser
+
+def run(options):
+    """DTW the resampled LfDs of base_folder of each label into a dataset.
+
+    Args:
+        options: Options parsed by get_option_parser.
+    """
     base_folder = options.base_folder
 
+    # Imported here, so --help and bad options return at once
+    import hashlib
+    import json
+    import numpy as np
+    import pandas as pd
+    from birl_generic_data_handler.min_max_scaler import StreamingMinMaxScaler
+
     resampled_lfd_dir = os.path.join(base_folder, 'resampled_lfd_dir')
 
     dataset_of_resampled_DTWed_lfd_dir = os.path.join(base_folder, 'dataset_of_resampled_DTWed_lfd_dir')
@@ -48,6 +100,11 @@ if __name__ == "__main__":
         shutil.rmtree(dataset_of_resampled_DTWed_lfd_dir)
         os.makedirs(dataset_of_resampled_DTWed_lfd_dir)
          
+    template_dir = options.template_dir
+    if template_dir is None:
+        template_dir = os.path.join(base_folder, 'dtw_barycenter_dir')
+    if options.align_mode == "barycenter" and not os.path.isdir(template_dir):
+        os.makedirs(template_dir)
 
     df_group_by_label = {}
 
@@ -61,43 +118,109 @@ if __name__ == "__main__":
         lfd_df = pd.read_csv(os.path.join(resampled_lfd_dir, f), sep=',')
         df_group_by_label[label].append([f, lfd_df])
 
+    scaler_dir = os.path.join(base_folder, 'min_max_scaler_dir')
+    if not os.path.isdir(scaler_dir):
+        os.makedirs(scaler_dir)
+
+    def get_data_key(list_of_df):
+        # A hash of the lfds a scaler is fitted on, whatever their order
+        h = hashlib.sha1()
+        for f, df in sorted(list_of_df, key=lambda i: i[0]):
+            h.update(f.encode('utf-8'))
+            h.update(np.ascontiguousarray(df.values[:, 1:], dtype=np.float64).tobytes())
+        return h.hexdigest()
+
+    def get_scaler(scaler_name, list_of_df):
+        scaler_path = os.path.join(scaler_dir, scaler_name+".json")
+        columns = list(list_of_df[0][1].columns[1:])
+        data_key = get_data_key(list_of_df)
+        if not options.refit_scaler and os.path.isfile(scaler_path):
+            scaler = StreamingMinMaxScaler.load(scaler_path)
+            if scaler.columns != columns:
+                raise ValueError(
+                    "columns of scaler %s don't match the lfds, use --refit-scaler: %s != %s"\
+                    %(scaler_path, scaler.columns, columns))
+            # Lfds came or went since the scaler was saved
+            if scaler.data_key == data_key:
+                return scaler
+        scaler = StreamingMinMaxScaler(columns=columns, data_key=data_key)
+        for f, df in list_of_df:
+            scaler.partial_fit(df.values[:, 1:])
+        scaler.save(scaler_path)
+        return scaler
+
+    if options.scaler_scope == "dataset":
+        dataset_scaler = get_scaler(
+            "scaler_of_dataset",
+            sum(df_group_by_label.values(), []),
+        )
+
+    list_of_job = []
     for label in df_group_by_label:
         list_of_df = df_group_by_label[label]
 
+        if options.scaler_scope == "dataset":
+            scaler = dataset_scaler
+        else:
+            scaler = get_scaler("scaler_of_label_(%s)"%(label,), list_of_df)
 
         list_of_preprocessed_df = []
-        scaler = MinMaxScaler()
         for i in range(0, len(list_of_df)):
             f, df = list_of_df[i]
             preprosessed_df = df.copy()
             mat = preprosessed_df.values[:, 1:]
-            mat = scaler.fit_transform(mat)
+            mat = scaler.transform(mat)
             preprosessed_df[preprosessed_df.columns[1:]] = mat
             list_of_preprocessed_df.append([f, preprosessed_df]) 
 
-        ref_idx = np.argmin([len(i[1]) for i in list_of_preprocessed_df])
-        ref_f, ref_df = list_of_preprocessed_df[ref_idx]
-        ref_mat = ref_df.values[:, 1:]
+        list_of_preprocessed_mat = [preprocessed_df.values[:, 1:] for f, preprocessed_df in list_of_preprocessed_df]
+        if options.align_mode == "barycenter":
+            from birl_generic_data_handler.dtw_barycenter import DtwBarycenter
+            template_path = os.path.join(template_dir, "label_(%s).npz"%(label,))
+            barycenter = DtwBarycenter(
+                window=options.dtw_window,
+                processes=options.processes,
+                preprocessing=json.dumps([
+                    list(scaler.feature_range),
+                    scaler.data_min.tolist(),
+                    scaler.data_max.tolist(),
+                ]),
+            )
+            if os.path.isfile(template_path):
+                saved_barycenter = DtwBarycenter.load(template_path, processes=options.processes)
+                # A template of another window or scaling is built again
+                if saved_barycenter.get_config() == barycenter.get_config():
+                    barycenter = saved_barycenter
+            list_of_alignment = barycenter.align(
+                list_of_preprocessed_mat,
+                n_iter=options.dba_iterations,
+                refine=options.refine_barycenter,
+            )
+            barycenter.save(template_path)
+            dtwed_index = pd.RangeIndex(len(barycenter.template))
+        else:
+            from birl_generic_data_handler.dtw_aligner import align_to_reference
+            ref_idx = np.argmin([len(i[1]) for i in list_of_preprocessed_df])
+            ref_f, ref_df = list_of_preprocessed_df[ref_idx]
+            ref_mat = ref_df.values[:, 1:]
+
+            list_of_alignment = align_to_reference(
+                ref_mat,
+                list_of_preprocessed_mat,
+                window=options.dtw_window,
+                processes=options.processes,
+            )
+            dtwed_index = ref_df.index
 
         list_of_dtwed_df = []
         for i in range(0, len(list_of_preprocessed_df)):
             f, raw_df = list_of_df[i]
-            f, preprocessed_df = list_of_preprocessed_df[i]
-            preprocessed_mat = preprocessed_df.values[:, 1:]
-
-            dist, cost, acc, path = dtw.dtw(ref_mat, preprocessed_mat, dist=lambda x, y: np.linalg.norm(x - y, ord=2))
-            list_of_ref_t = path[0]
-            list_of_target_t = path[1]
-
-            dtwed_df = ref_df.copy()
-            tx = 0
-            for idx, t in enumerate(list_of_ref_t):
-                if t == tx:
-                    ty = list_of_target_t[idx]
-                    dtwed_df.values[tx] = raw_df.values[ty]
-                    tx += 1
-                else:
-                    continue
+            dist, idx_of_raw = list_of_alignment[i]
+            dtwed_df = pd.DataFrame(
+                raw_df.values[idx_of_raw],
+                index=dtwed_index,
+                columns=raw_df.columns,
+            )
             list_of_dtwed_df.append([f, dtwed_df])
 
         for i in range(len(list_of_dtwed_df)):
@@ -105,60 +228,62 @@ if __name__ == "__main__":
             file_name = "label_(%s)_from_(%s)"%(label, f)
             df.to_csv(os.path.join(dataset_of_resampled_DTWed_lfd_dir, file_name+".csv"))
 
+        if options.pack:
+            from birl_generic_data_handler.dataset_packer import pack_dataset
+            # LfDs of a label share the length of their reference
+            dtwed_df_by_name = dict(list_of_dtwed_df)
+            pack_dataset(
+                [f for f, df in list_of_dtwed_df],
+                lambda f: dtwed_df_by_name[f].set_index('time'),
+                os.path.join(base_folder, 'packed_dataset_of_resampled_DTWed_lfd_dir', "label_(%s)"%(label,)),
+                lambda f: label,
+            )
+
 
         if not PLOT_VERIFICATION:
             continue
+        import copy
+        import birl.robot_introspection_pkg.multi_modal_config as mmc
+        from birl_generic_data_handler.figure_renderer import FigureJob
+        from birl_generic_data_handler.verification_plots import plot_series_grid
         visualization_by_dimension_dir = os.path.join(base_folder, 'visualization_by_dimension_dir')
         DTWed_resampled_lfd_dir = os.path.join(visualization_by_dimension_dir, "DTWed_resampled_lfd_dir", "label_%s"%(label, )) 
-        if not os.path.isdir(DTWed_resampled_lfd_dir):
-            os.makedirs(DTWed_resampled_lfd_dir)
-        else:
-            shutil.rmtree(DTWed_resampled_lfd_dir)
-            os.makedirs(DTWed_resampled_lfd_dir)
 
         dimensions = copy.deepcopy(mmc.interested_data_fields)
         if '.tag' in dimensions:
             idx_to_del = dimensions.index('.tag')
             del dimensions[idx_to_del]
         for dim in dimensions:
-            lfd_amount = len(list_of_df)
-            dtwed_lfd_fig, dtwed_lfd_axs = plt.subplots(nrows=lfd_amount, ncols=3, sharex=True, sharey=True)
-            if lfd_amount == 1:
-                dtwed_lfd_axs = dtwed_lfd_axs.reshape((1, 3))
+            list_of_row = []
             for i in range(0, len(list_of_df)):
                 f, raw_df = list_of_df[i]
                 f, preprocessed_df = list_of_preprocessed_df[i]
                 f, dtwed_df = list_of_dtwed_df[i]
+                list_of_row.append([
+                    ('raw_df_from_%s'%(f,), raw_df[dim]),
+                    ('preprocessed_df', preprocessed_df[dim]),
+                    ('dtwed_df_from_%s'%(f,), dtwed_df[dim]),
+                ])
+            list_of_job.append(FigureJob(
+                os.path.join(DTWed_resampled_lfd_dir, 'label_'+str(label)+'_'+dim+'.png'),
+                plot_series_grid,
+                suptitle='label_'+str(label)+'_'+dim,
+                list_of_row=list_of_row,
+            ))
+
+    if len(list_of_job) != 0:
+        from birl_generic_data_handler.figure_renderer import render_figures
+        render_figures(
+            list_of_job,
+            processes=options.processes,
+            preview=options.preview,
+        )
 
-                ax = dtwed_lfd_axs[i, 0] 
-                time_x = raw_df.index-raw_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    raw_df[dim].tolist(), 
-                )
-                title = 'raw_df_from_%s'%(f,)
-                ax.set_title(title)
-
-                ax = dtwed_lfd_axs[i, 1] 
-                time_x = preprocessed_df.index-preprocessed_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    preprocessed_df[dim].tolist(), 
-                )
-                title = 'preprocessed_df'
-                ax.set_title(title)
-
-                ax = dtwed_lfd_axs[i, 2] 
-                time_x = dtwed_df.index-dtwed_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    dtwed_df[dim].tolist(), 
-                )
-                title = 'dtwed_df_from_%s'%(f,)
-                ax.set_title(title)
-
-            dtwed_lfd_fig.set_size_inches(16,4*lfd_amount)
-            dtwed_lfd_fig.suptitle('label_'+str(label)+'_'+dim)
-            dtwed_lfd_fig.savefig(os.path.join(DTWed_resampled_lfd_dir, 'label_'+str(label)+'_'+dim+'.png'))
-            plt.close(dtwed_lfd_fig)
+if __name__ == "__main__":
+    parser = get_option_parser()
+    (options, args) = parser.parse_args()
+
+    if options.base_folder is None:
+        parser.error("no base_folder")
 
+    run(options)
@@ -1,14 +1,4 @@
 import os
-import pandas as pd
-from datetime import datetime, timedelta
-from mpl_toolkits.mplot3d import Axes3D
-import load_data_folder
-import plot_data_in_panda_df
-import matplotlib.pyplot as plt
-import ipdb
-import matplotlib.dates as mdates 
-import numpy as np
-from matplotlib.pyplot import cm 
 
 def trim_non_trial_data(tag_multimodal_df, hmm_online_result_df):
     state_df = tag_multimodal_df[tag_multimodal_df['.tag'] != 0]
@@ -21,12 +11,19 @@ def trim_non_trial_data(tag_multimodal_df, hmm_online_result_df):
         hmm_online_result_df[(hmm_online_result_df['time']>=trial_start_time) & (hmm_online_result_df['time']<=trial_end_time)]
 
 def color_anomaly_pos(tag_multimodal_df, list_of_anomaly_time_range):
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from matplotlib.pyplot import cm 
+    from mpl_toolkits.mplot3d import Axes3D
+    from birl_generic_data_handler.plot_decimator import plot_decimated
+
     fig = plt.figure()
     pos_plot = fig.add_subplot(111, projection='3d')
-    pos_plot.plot(
-        tag_multimodal_df['.endpoint_state.pose.position.x'].tolist(), 
-        tag_multimodal_df['.endpoint_state.pose.position.y'].tolist(), 
-        tag_multimodal_df['.endpoint_state.pose.position.z'].tolist(), 
+    plot_decimated(
+        pos_plot,
+        tag_multimodal_df['.endpoint_state.pose.position.x'].values,
+        tag_multimodal_df['.endpoint_state.pose.position.y'].values,
+        tag_multimodal_df['.endpoint_state.pose.position.z'].values,
         color='gray',
     )
 
@@ -37,81 +34,14 @@ def color_anomaly_pos(tag_multimodal_df, list_of_anomaly_time_range):
         start_time = list_of_anomaly_time_range[i][0]
         end_time = list_of_anomaly_time_range[i][1]
         anomaly_df = tag_multimodal_df[(tag_multimodal_df['time']>=start_time) & (tag_multimodal_df['time']<=end_time)]
-        pos_plot.plot(
-            anomaly_df['.endpoint_state.pose.position.x'].tolist(), 
-            anomaly_df['.endpoint_state.pose.position.y'].tolist(), 
-            anomaly_df['.endpoint_state.pose.position.z'].tolist(), 
+        plot_decimated(
+            pos_plot,
+            anomaly_df['.endpoint_state.pose.position.x'].values,
+            anomaly_df['.endpoint_state.pose.position.y'].values,
+            anomaly_df['.endpoint_state.pose.position.z'].values,
             color=next(color),
         )
 
-def get_anomaly_range(tag_df, flag_df):
-    list_of_idx_range = []
-    list_of_anomaly_time_range = []
-    
-    flag_start_idx = 0
-    tag_start_idx = 0
-
-    flag_df_length = flag_df.shape[0]
-    tag_df_length = tag_df.shape[0]
-
-    anomaly_start_time = None
-    anomaly_backtracked_start_time = None
-    anomaly_end_time = flag_df['time'][0]
-    anomaly_detected = False
-    while True:
-        if not anomaly_detected:
-            print 'start new ano search...',
-            row = flag_df[flag_df['time']>anomaly_end_time].head(1)
-            if len(row) == 0:
-                raise Exception("flag_df failed to sync by anomaly_end_time")
-            flag_start_idx = row.index[0] 
-            for idx in range(flag_start_idx, flag_df_length):
-                if flag_df['.event_flag'][idx] == 0:
-                    backtracked_idx = idx 
-                    while flag_df['.event_flag'][backtracked_idx] <= flag_df['.event_flag'][idx]:
-                        backtracked_idx -= 1
-
-                    anomaly_detected = True
-                    anomaly_start_time = flag_df['time'][idx]
-                    anomaly_backtracked_start_time = flag_df['time'][backtracked_idx]
-                    print 'got one...',
-                    break
-            if not anomaly_detected:
-                break
-        else:
-            row = tag_df[tag_df['time']>anomaly_start_time].head(1)
-            if len(row) == 0:
-                raise Exception("tag_df failed to sync by anomaly_start_time")
-            tag_start_idx = row.index[0] 
-
-            search_secs = 3
-            search_end_time = row['time'].values[0]+np.timedelta64(search_secs, 's') 
-
-            row = tag_df[tag_df['time']>=search_end_time].head(1)
-            if len(row) == 0:
-                raise Exception("tag_df failed to sync by anomaly_start_time+%ss"%(search_secs,))
-            tag_end_idx = row.index[0]
-
-
-            for idx in range(tag_start_idx, tag_end_idx):
-                now_state = tag_df['.tag'][idx]
-                if now_state == 0:
-                    anomaly_detected = False 
-                    anomaly_end_time = tag_df['time'][idx]
-                    list_of_anomaly_time_range.append([
-                        anomaly_backtracked_start_time,
-                        anomaly_end_time,
-                    ])
-                    print 'ano added'
-                    break
-            if anomaly_detected:
-                anomaly_detected = False 
-                anomaly_end_time = anomaly_start_time
-                print 'smach did go into recov in %ss, we will skip this ano'%(search_secs,)
-
-    print 'done search'
-    return list_of_anomaly_time_range 
-
 if __name__ == "__main__":
     from optparse import OptionParser
     usage = "usage: %prog -d base_folder_path"
@@ -127,6 +57,17 @@ if __name__ == "__main__":
 
     base_folder = options.base_folder
 
+    # Imported after parsing options, so --help and bad options return at
+    # once
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates 
+    from matplotlib.pyplot import cm 
+    from mpl_toolkits.mplot3d import Axes3D
+    from birl_generic_data_handler.plot_decimator import plot_decimated
+    from birl_generic_data_handler.csv_handler import get_anomaly_time_ranges
+
     files = os.listdir(base_folder)
     for f in files:
         path = os.path.join(base_folder, f)
@@ -162,7 +103,7 @@ if __name__ == "__main__":
         print
         print '-'*20
         print f
-        list_of_anomaly_time_range = get_anomaly_range(
+        list_of_anomaly_time_range = get_anomaly_time_ranges(
             tag_multimodal_df,
             hmm_online_result_df,
         )
@@ -173,20 +114,23 @@ if __name__ == "__main__":
 
         fig = plt.figure()
         deri_of_diff = fig.add_subplot(111)
-        deri_of_diff.plot(
-            hmm_online_result_df['time'].tolist(),
-            hmm_online_result_df['.deri_of_diff_btw_curlog_n_thresh.data'].tolist(),
+        flagged = (hmm_online_result_df['.event_flag'] == 0).values
+        plot_decimated(
+            deri_of_diff,
+            hmm_online_result_df['time'].values,
+            hmm_online_result_df['.deri_of_diff_btw_curlog_n_thresh.data'].values,
+            keep_index=np.flatnonzero(flagged),
+            dpi=900,
             marker='o',
         )
     
-        for i in hmm_online_result_df[hmm_online_result_df['.event_flag'] == 0].index:
-            deri_of_diff.plot(
-                [hmm_online_result_df['time'][i]],
-                [hmm_online_result_df['.deri_of_diff_btw_curlog_n_thresh.data'][i]],
-                marker='o',
-                color = 'red',
-                linestyle='None',
-            )
+        deri_of_diff.plot(
+            hmm_online_result_df['time'].values[flagged],
+            hmm_online_result_df['.deri_of_diff_btw_curlog_n_thresh.data'].values[flagged],
+            marker='o',
+            color = 'red',
+            linestyle='None',
+        )
 
 
         for i in range(len(list_of_anomaly_time_range)):
@@ -205,18 +149,20 @@ if __name__ == "__main__":
         fig = plt.figure()
         bbox_extra_artists = []
         pos_plot = fig.add_subplot(111, projection='3d')
-        pos_plot.plot(
-            tag_multimodal_df['.endpoint_state.pose.position.x'].tolist(), 
-            tag_multimodal_df['.endpoint_state.pose.position.y'].tolist(), 
-            tag_multimodal_df['.endpoint_state.pose.position.z'].tolist(), 
+        plot_decimated(
+            pos_plot,
+            tag_multimodal_df['.endpoint_state.pose.position.x'].values,
+            tag_multimodal_df['.endpoint_state.pose.position.y'].values,
+            tag_multimodal_df['.endpoint_state.pose.position.z'].values,
+            dpi=900,
             color='gray',
         )
 
         recovery_df = tag_multimodal_df[tag_multimodal_df['.tag'] == 0]
         pos_plot.plot(
-            recovery_df['.endpoint_state.pose.position.x'].tolist(), 
-            recovery_df['.endpoint_state.pose.position.y'].tolist(), 
-            recovery_df['.endpoint_state.pose.position.z'].tolist(), 
+            recovery_df['.endpoint_state.pose.position.x'].values,
+            recovery_df['.endpoint_state.pose.position.y'].values,
+            recovery_df['.endpoint_state.pose.position.z'].values,
             marker='.',
             markersize=0.25,
             linestyle='None',
@@ -230,10 +176,12 @@ if __name__ == "__main__":
             start_time = list_of_anomaly_time_range[i][0]
             end_time = list_of_anomaly_time_range[i][1]
             anomaly_df = tag_multimodal_df[(tag_multimodal_df['time']>=start_time) & (tag_multimodal_df['time']<=end_time)]
-            pos_plot.plot(
-                anomaly_df['.endpoint_state.pose.position.x'].tolist(), 
-                anomaly_df['.endpoint_state.pose.position.y'].tolist(), 
-                anomaly_df['.endpoint_state.pose.position.z'].tolist(), 
+            plot_decimated(
+                pos_plot,
+                anomaly_df['.endpoint_state.pose.position.x'].values,
+                anomaly_df['.endpoint_state.pose.position.y'].values,
+                anomaly_df['.endpoint_state.pose.position.z'].values,
+                dpi=900,
                 color=next(color),
                 label='extracted_anomaly_%s'%i,
                 marker='.',
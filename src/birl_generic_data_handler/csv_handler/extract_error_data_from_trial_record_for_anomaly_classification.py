@@ -1,18 +1,6 @@
 import os
-import pandas as pd
-from datetime import datetime
-from mpl_toolkits.mplot3d import Axes3D
-import load_data_folder
-import plot_data_in_panda_df
-import matplotlib.pyplot as plt
-import ipdb
-import matplotlib.dates as mdates 
-import numpy as np
-from matplotlib.pyplot import cm 
-import copy
-import birl.robot_introspection_pkg.multi_modal_config as mmc
-from birl.robot_introspection_pkg.anomaly_sampling_config import anomaly_window_size_in_sec, anomaly_resample_hz
-from birl.robot_introspection_pkg.general_config import trial_resample_hz
+import json
+import hashlib
 
 PLOT_VERIFICATION = True 
 
@@ -26,37 +14,6 @@ def trim_non_trial_data(tag_multimodal_df, hmm_online_result_df):
     return tag_multimodal_df[(tag_multimodal_df['time']>=trial_start_time) & (tag_multimodal_df['time']<=trial_end_time)], \
         hmm_online_result_df[(hmm_online_result_df['time']>=trial_start_time) & (hmm_online_result_df['time']<=trial_end_time)]
 
-def color_bg_and_anomaly(
-    plot,
-    tag_df,
-    list_of_anomaly_start_time,
-):
-    tag_df_length = tag_df.shape[0]
-    start_t = 0
-    state_color = {0: "gray", 2: "green", 5: "green"}
-    color=iter(cm.rainbow(np.linspace(0, 1, 10)))
-    for t in range(1, tag_df_length):
-        if tag_df['.tag'][t-1] == tag_df['.tag'][t] and t < len(tag_df['.tag'])-1:
-            continue
-        skill = tag_df['.tag'][t-1]
-        end_t = t
-        if skill == -1:
-            color = 'red'
-        elif skill == -2:
-            color = 'black'
-        elif skill == -3:
-            color = 'yellow'
-        else:
-            color = state_color[skill]
-        plot.axvspan(tag_df['time'][start_t], tag_df['time'][end_t], facecolor=color, ymax=1, ymin=0.95)
-        start_t = t
-
-    for t in list_of_anomaly_start_time:
-        plot.axvline(t, color='red')
-        plot.axvspan(t-2, t+2, facecolor='pink', ymax=0.95, ymin=0)
-
-
-
 def get_anomaly_range(flag_df):
     list_of_anomaly_start_time = [flag_df['time'][0]]
     
@@ -70,30 +27,205 @@ def get_anomaly_range(flag_df):
     return list_of_anomaly_start_time
 
 def get_list_of_lfd_df(tag_df):
+    import numpy as np
+    from birl_generic_data_handler.run_length_encoder import get_runs_of_each_value
+
     list_of_lfd_df = []
     tag_df_length = tag_df.shape[0]
-    start_idx = None
-    end_idx = None
-    for idx in range(0, tag_df_length):
-        if tag_df['.tag'][idx] == -3:
-            if start_idx is None:
-                start_idx = idx
-            elif idx == tag_df_length-1:
-                end_idx = idx
-        else:
-            if start_idx is not None:
-                end_idx = idx
-
-        if end_idx is not None:
-            LfD_df = tag_df.loc[start_idx: end_idx]
-            LfD_df = LfD_df.drop('.tag', axis=1).set_index('time')
-            list_of_lfd_df.append(LfD_df)
-            start_idx = None
-            end_idx = None
+    runs_of_each_tag = get_runs_of_each_value(tag_df['.tag'].values)
+    if -3 not in runs_of_each_tag:
+        return list_of_lfd_df
+
+    run_starts, run_ends = runs_of_each_tag[-3]
+    # a LfD segment keeps the first timestep after its run
+    run_ends = np.minimum(run_ends, tag_df_length-1)
+    for start_idx, end_idx in zip(run_starts, run_ends):
+        if start_idx == end_idx:
+            continue
+        LfD_df = tag_df.iloc[start_idx: end_idx+1]
+        LfD_df = LfD_df.drop('.tag', axis=1).set_index('time')
+        list_of_lfd_df.append(LfD_df)
             
     return list_of_lfd_df
 
-if __name__ == "__main__":
+def get_trial_config_hash(interested_data_fields, list_of_input_path):
+    """Get the hash of everything the outputs of a trial depend on."""
+    from birl.robot_introspection_pkg.anomaly_sampling_config import anomaly_window_size_in_sec, anomaly_resample_hz
+    from birl.robot_introspection_pkg.general_config import trial_resample_hz
+
+    config = {
+        'anomaly_window_size_in_sec': anomaly_window_size_in_sec,
+        'anomaly_resample_hz': anomaly_resample_hz,
+        'trial_resample_hz': trial_resample_hz,
+        'interested_data_fields': interested_data_fields,
+        'inputs': [
+            [os.path.basename(path), os.path.getsize(path), os.path.getmtime(path)]\
+                for path in list_of_input_path
+        ],
+    }
+    return hashlib.md5(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+def remove_trial_outputs(extracted_anomalies_dir, marker):
+    for key in ['trial_csv', 'raw_anomaly_csvs', 'resampled_anomaly_csvs', 'raw_lfd_csvs', 'resampled_lfd_csvs']:
+        list_of_path = marker[key] if isinstance(marker[key], list) else [marker[key]]
+        for path in list_of_path:
+            path = os.path.join(extracted_anomalies_dir, path)
+            if os.path.isfile(path):
+                os.remove(path)
+
+def process_trial(f, tag_multimodal_csv_path, hmm_online_result_csv_path, interested_data_fields, extracted_anomalies_dir, ch, tag_multimodal_df=None, hmm_online_result_df=None):
+    """Extract anomalies and LfDs of a trial and write them to disk.
+
+    The CSVs of the trial are read from disk unless their Dataframes are
+    given, e.g. by RosbagHandler. Given Dataframes are left unchanged.
+
+    Returns:
+        A marker dict of anomaly start times and paths of the CSVs written,
+        relative to extracted_anomalies_dir.
+    """
+    import numpy as np
+    import pandas as pd
+    from birl.robot_introspection_pkg.anomaly_sampling_config import anomaly_window_size_in_sec, anomaly_resample_hz
+    from birl.robot_introspection_pkg.general_config import trial_resample_hz
+    from birl_generic_data_handler.csv_handler import get_resample_time_index
+
+    marker = {
+        'trial_csv': os.path.join('trimmed_trial_dir', f+'.csv'),
+        'anomaly_start_time': [],
+        'raw_anomaly_csvs': [],
+        'resampled_anomaly_csvs': [],
+        'raw_lfd_csvs': [],
+        'resampled_lfd_csvs': [],
+    }
+
+    # read
+    if tag_multimodal_df is None:
+        tag_multimodal_df = pd.read_csv(tag_multimodal_csv_path, sep=',')
+    tag_multimodal_df = tag_multimodal_df[interested_data_fields]
+    if hmm_online_result_df is None:
+        hmm_online_result_df = pd.read_csv(hmm_online_result_csv_path, sep=',')
+
+    # trim
+    tag_multimodal_df, hmm_online_result_df = trim_non_trial_data(tag_multimodal_df, hmm_online_result_df)
+    tag_multimodal_df.index = np.arange(len(tag_multimodal_df))
+    hmm_online_result_df.index = np.arange(len(hmm_online_result_df))
+
+    # process time
+    from dateutil import parser
+    tag_multimodal_df['time'] = tag_multimodal_df['time'].apply(lambda x: parser.parse(x))
+    trial_start_datetime = tag_multimodal_df['time'][0]
+    tag_multimodal_df['time'] -= trial_start_datetime
+    tag_multimodal_df['time'] = tag_multimodal_df['time'].apply(lambda x: x/np.timedelta64(1, 's'))
+    hmm_online_result_df['time'] = hmm_online_result_df['time'].apply(lambda x: parser.parse(x))
+    hmm_online_result_df['time'] -= trial_start_datetime
+    hmm_online_result_df['time'] = hmm_online_result_df['time'].apply(lambda x: x/np.timedelta64(1, 's'))
+
+    tag_multimodal_df.to_csv(os.path.join(extracted_anomalies_dir, marker['trial_csv']), index=False)
+
+    list_of_anomaly_start_time = get_anomaly_range(
+        hmm_online_result_df,
+    )
+    marker['anomaly_start_time'] = [float(t) for t in list_of_anomaly_start_time]
+    list_of_lfd_df = get_list_of_lfd_df(
+        tag_multimodal_df,
+    )
+    list_of_resampled_lfd_df = ch.resample_df_segments(
+        list_of_lfd_df,
+        [get_resample_time_index(lfd_df.index[0], lfd_df.index[-1], trial_resample_hz)\
+            for lfd_df in list_of_lfd_df],
+    )
+    for lfd_idx, lfd_df in enumerate(list_of_lfd_df):
+        lfd_name = 'no_%s_from_trial_%s'%(lfd_idx, f)
+        marker['raw_lfd_csvs'].append(os.path.join('raw_lfd_dir', lfd_name+'.csv'))
+        lfd_df.to_csv(os.path.join(extracted_anomalies_dir, marker['raw_lfd_csvs'][-1]))
+        resampled_lfd_df = list_of_resampled_lfd_df[lfd_idx]
+        lfd_name = 'resampled_%shz_no_%s_from_trial_%s'%(trial_resample_hz, lfd_idx, f)
+        marker['resampled_lfd_csvs'].append(os.path.join('resampled_lfd_dir', lfd_name+'.csv'))
+        resampled_lfd_df.to_csv(os.path.join(extracted_anomalies_dir, marker['resampled_lfd_csvs'][-1]))
+
+    trial_time = tag_multimodal_df['time'].values
+    list_of_search_df = []
+    list_of_new_time_index = []
+    for anomaly_idx, anomaly_t in enumerate(list_of_anomaly_start_time):
+        search_start = anomaly_t-anomaly_window_size_in_sec/2
+        search_end = anomaly_t+anomaly_window_size_in_sec/2
+        anomaly_df = tag_multimodal_df.iloc[\
+            trial_time.searchsorted(search_start, side='left'):\
+            trial_time.searchsorted(search_end, side='right')\
+        ]
+        anomaly_df = anomaly_df.drop('.tag', axis=1).set_index('time')
+        anomaly_name = 'no_%s_from_trial_%s'%(anomaly_idx, f)
+        marker['raw_anomaly_csvs'].append(os.path.join('raw_anomalies_dir', anomaly_name+'.csv'))
+        anomaly_df.to_csv(os.path.join(extracted_anomalies_dir, marker['raw_anomaly_csvs'][-1]))
+
+        # keep 1 more sec each side for interpolation
+        search_start = anomaly_t-anomaly_window_size_in_sec/2-1            
+        search_end = anomaly_t+anomaly_window_size_in_sec/2+1
+        search_df = tag_multimodal_df.iloc[\
+            trial_time.searchsorted(search_start, side='left'):\
+            trial_time.searchsorted(search_end, side='right')\
+        ]
+        search_df = search_df.drop('.tag', axis=1).set_index('time')
+        list_of_search_df.append(search_df)
+        list_of_new_time_index.append(np.linspace(
+            anomaly_t-anomaly_window_size_in_sec/2,
+            anomaly_t+anomaly_window_size_in_sec/2,
+            int(anomaly_window_size_in_sec*anomaly_resample_hz),
+        ))
+
+    list_of_resampled_anomaly_df = ch.resample_df_segments(
+        list_of_search_df,
+        list_of_new_time_index,
+    )
+    for anomaly_idx, resampled_anomaly_df in enumerate(list_of_resampled_anomaly_df):
+        anomaly_name = 'resampled_%shz_no_%s_from_trial_%s'%(anomaly_resample_hz, anomaly_idx, f)
+        marker['resampled_anomaly_csvs'].append(os.path.join('resampled_anomalies_dir', anomaly_name+'.csv'))
+        resampled_anomaly_df.to_csv(os.path.join(extracted_anomalies_dir, marker['resampled_anomaly_csvs'][-1]))
+
+    return marker
+
+def _process_trial_in_worker(args):
+    marker_path, config_hash, process_trial_args = args
+    marker = process_trial(*process_trial_args)
+    marker['config_hash'] = config_hash
+    # The marker is written last, so a trial interrupted halfway is redone
+    with open(marker_path+'.tmp', 'w') as marker_file:
+        json.dump(marker, marker_file, indent=4)
+    os.rename(marker_path+'.tmp', marker_path)
+    # Read it back, so that plot jobs get the same strings as when the
+    # trial is skipped and their hashes match in later runs
+    with open(marker_path, 'r') as marker_file:
+        return json.load(marker_file)
+
+def get_list_of_trial_csv_paths(anomalous_trial_folder, stamp_source='record'):
+    """Get (trial name, tag_multimodal CSV path, anomaly_detection_signal CSV
+    path) tuples of the trial folders in anomalous_trial_folder, of CSVs
+    RosbagHandler wrote with stamp_source."""
+    from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import STAMP_SUFFIXES
+    suffix = STAMP_SUFFIXES[stamp_source]
+    ret = []
+    files = os.listdir(anomalous_trial_folder)
+    files.sort()
+    for f in files:
+        path = os.path.join(anomalous_trial_folder, f)
+        if not os.path.isdir(path):
+            continue
+
+        if os.path.isfile(os.path.join(path, f+'-tag_multimodal'+suffix+'.csv')):
+            tag_multimodal_csv_path = os.path.join(path, f+'-tag_multimodal'+suffix+'.csv')
+        elif stamp_source == 'record' and os.path.isfile(os.path.join(path, 'tag_multimodal.csv')):
+            tag_multimodal_csv_path = os.path.join(path, 'tag_multimodal.csv')
+        else:
+            raise Exception("folder %s doesn't have tag_multimodal csv file."%(path,))
+
+        if os.path.isfile(os.path.join(path, f+'-anomaly_detection_signal'+suffix+'.csv')):
+            hmm_online_result_csv_path = os.path.join(path, f+'-anomaly_detection_signal'+suffix+'.csv')
+        else:
+            raise Exception("folder %s doesn't have hmm_online_result csv file."%(path,))
+        ret.append((f, tag_multimodal_csv_path, hmm_online_result_csv_path))
+    return ret
+
+def get_option_parser():
     from optparse import OptionParser
     usage = "usage: %prog -d base_folder_path"
     parser = OptionParser(usage=usage)
@@ -101,135 +233,127 @@ if __name__ == "__main__":
     parser.add_option("-d", "--base-folder",
         action="store", type="string", dest="base_folder",
         help="provide a base folder which will have this structure: ./01, ./01/*.csv, ./02, ./02/*.csv, ...")
-    (options, args) = parser.parse_args()
-
-    if options.base_folder is None:
-        parser.error("no base_folder")
 
+    parser.add_option("-o", "--output-dir",
+        action="store", type="string", dest="output_dir",
+        default=None,
+        help="folder to extract into. Trials already extracted there with the same config are skipped. A new folder named by the current time in base_folder/extracted_anomalies_dir by default.")
+
+    parser.add_option("-p", "--processes",
+        action="store", type="int", dest="processes",
+        default=None,
+        help="amount of processes to process trials and render figures in, the amount of CPUs by default.")
+
+    parser.add_option("--preview",
+        action="store_true", dest="preview",
+        default=False,
+        help="render verification figures at a low resolution.")
+
+    parser.add_option("--stamp-source",
+        action="store", type="choice", dest="stamp_source",
+        choices=["record", "header", "both"], default="record",
+        help="extract from the CSVs stamped by record time, by header stamps, or by both. Default: record.")
+    return parser
+
+def run(options, df_by_trial=None):
+    """Extract anomalies and LfDs of the trials in base_folder/anomalous_trial_rosbags.
+
+    Args:
+        options: Options parsed by get_option_parser.
+        df_by_trial (dict, optional): Default None. A dict of trial name to a
+            (tag_multimodal Dataframe, anomaly_detection_signal Dataframe)
+            tuple, used instead of reading the CSVs of the trial again.
+
+    Returns:
+        A (extracted_anomalies_dir, marker_by_trial) tuple.
+    """
     base_folder = options.base_folder
 
+    # Imported here, so --help and bad options return at once
+    import copy
+    import birl.robot_introspection_pkg.multi_modal_config as mmc
+    from birl_generic_data_handler.csv_handler import CsvHandler
+
     anomalous_trial_folder = os.path.join(base_folder, "anomalous_trial_rosbags")
     if not os.path.isdir(anomalous_trial_folder):
         raise Exception("anomalous trial folder not found")
 
-
-
-    import datetime
-    extracted_anomalies_dir = os.path.join(base_folder, "extracted_anomalies_dir", str(datetime.datetime.now()))
-    os.makedirs(extracted_anomalies_dir)
-    raw_anomalies_dir = os.path.join(extracted_anomalies_dir, 'raw_anomalies_dir')
-    os.makedirs(raw_anomalies_dir)
-    resampled_anomalies_dir = os.path.join(extracted_anomalies_dir, 'resampled_anomalies_dir')
-    os.makedirs(resampled_anomalies_dir)
-    raw_lfd_dir = os.path.join(extracted_anomalies_dir, 'raw_lfd_dir')
-    os.makedirs(raw_lfd_dir)
-    resampled_lfd_dir = os.path.join(extracted_anomalies_dir, 'resampled_lfd_dir')
-    os.makedirs(resampled_lfd_dir)
+    if options.output_dir is None:
+        import datetime
+        extracted_anomalies_dir = os.path.join(base_folder, "extracted_anomalies_dir", str(datetime.datetime.now()))
+    else:
+        extracted_anomalies_dir = options.output_dir
+    for folder_name in [
+        'trial_marker_dir',
+        'trimmed_trial_dir',
+        'raw_anomalies_dir',
+        'resampled_anomalies_dir',
+        'raw_lfd_dir',
+        'resampled_lfd_dir',
+    ]:
+        folder = os.path.join(extracted_anomalies_dir, folder_name)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+    trial_marker_dir = os.path.join(extracted_anomalies_dir, 'trial_marker_dir')
 
     interested_data_fields = copy.deepcopy(mmc.interested_data_fields)
     interested_data_fields.append('time')
 
-    to_plot = []
-    files = os.listdir(anomalous_trial_folder)
-    files.sort()
-    for f in files:
-        path = os.path.join(anomalous_trial_folder, f)
-        if not os.path.isdir(path):
-            continue
-        print 'processing', f
-
-        if os.path.isfile(os.path.join(path, f+'-tag_multimodal.csv')):
-            tag_multimodal_csv_path = os.path.join(path, f+'-tag_multimodal.csv')
-        elif os.path.isfile(os.path.join(path, 'tag_multimodal.csv')):
-            tag_multimodal_csv_path = os.path.join(path, 'tag_multimodal.csv')
-        else:
-            raise Exception("folder %s doesn't have tag_multimodal csv file."%(path,))
-
-        if os.path.isfile(os.path.join(path, f+'-anomaly_detection_signal.csv')):
-            hmm_online_result_csv_path = os.path.join(path, f+'-anomaly_detection_signal.csv')
-        else:
-            raise Exception("folder %s doesn't have hmm_online_result csv file."%(path,))
-
-        # read
-        tag_multimodal_df = pd.read_csv(tag_multimodal_csv_path, sep=',')
-        tag_multimodal_df = tag_multimodal_df[interested_data_fields]
-        hmm_online_result_df = pd.read_csv(hmm_online_result_csv_path, sep=',')
-
-        # trim
-        tag_multimodal_df, hmm_online_result_df = trim_non_trial_data(tag_multimodal_df, hmm_online_result_df)
-        tag_multimodal_df.index = np.arange(len(tag_multimodal_df))
-        hmm_online_result_df.index = np.arange(len(hmm_online_result_df))
-
-        # process time
-        from dateutil import parser
-        tag_multimodal_df['time'] = tag_multimodal_df['time'].apply(lambda x: parser.parse(x))
-        trial_start_datetime = tag_multimodal_df['time'][0]
-        tag_multimodal_df['time'] -= trial_start_datetime
-        tag_multimodal_df['time'] = tag_multimodal_df['time'].apply(lambda x: x/np.timedelta64(1, 's'))
-        hmm_online_result_df['time'] = hmm_online_result_df['time'].apply(lambda x: parser.parse(x))
-        hmm_online_result_df['time'] -= trial_start_datetime
-        hmm_online_result_df['time'] = hmm_online_result_df['time'].apply(lambda x: x/np.timedelta64(1, 's'))
-
-        list_of_anomaly_start_time = get_anomaly_range(
-            hmm_online_result_df,
+    ch = CsvHandler()
+    marker_by_trial = {}
+    list_of_trial_to_process = []
+    list_of_args = []
+    for f, tag_multimodal_csv_path, hmm_online_result_csv_path in get_list_of_trial_csv_paths(anomalous_trial_folder, options.stamp_source):
+        config_hash = get_trial_config_hash(
+            interested_data_fields,
+            [tag_multimodal_csv_path, hmm_online_result_csv_path],
         )
-        list_of_lfd_df = get_list_of_lfd_df(
-            tag_multimodal_df,
-        )
-        list_of_resampled_lfd_df = []
-        for lfd_idx, lfd_df in enumerate(list_of_lfd_df):
-            lfd_name = 'no_%s_from_trial_%s'%(lfd_idx, f)
-            lfd_df.to_csv(os.path.join(raw_lfd_dir, lfd_name+'.csv'))
-            lfd_start = lfd_df.index[0]
-            lfd_end = lfd_df.index[-1]
-            new_time_index = np.linspace(lfd_start, lfd_end, (lfd_end-lfd_start)*trial_resample_hz)
-            old_time_index = lfd_df.index
-            resampled_lfd_df = lfd_df.reindex(old_time_index.union(new_time_index)).interpolate(method='linear', axis=0).ix[new_time_index]
-            lfd_name = 'resampled_%shz_no_%s_from_trial_%s'%(trial_resample_hz, lfd_idx, f)
-            resampled_lfd_df.to_csv(os.path.join(resampled_lfd_dir, lfd_name+'.csv'))
-            list_of_resampled_lfd_df.append(resampled_lfd_df)
-
-        list_of_anomaly_df = []
-        list_of_resampled_anomaly_df = []
-        for anomaly_idx, anomaly_t in enumerate(list_of_anomaly_start_time):
-            search_start = anomaly_t-anomaly_window_size_in_sec/2
-            search_end = anomaly_t+anomaly_window_size_in_sec/2
-            anomaly_df = tag_multimodal_df[\
-                (tag_multimodal_df['time'] >= search_start) &\
-                (tag_multimodal_df['time'] <= search_end)\
-            ]
-            anomaly_df = anomaly_df.drop('.tag', axis=1).set_index('time')
-            anomaly_name = 'no_%s_from_trial_%s'%(anomaly_idx, f)
-            anomaly_df.to_csv(os.path.join(raw_anomalies_dir, anomaly_name+'.csv'))
-            list_of_anomaly_df.append(anomaly_df)
-
-            search_start = anomaly_t-anomaly_window_size_in_sec/2-1            
-            search_end = anomaly_t+anomaly_window_size_in_sec/2+1
-            search_df = tag_multimodal_df[\
-                (tag_multimodal_df['time'] >= search_start) &\
-                (tag_multimodal_df['time'] <= search_end)\
-            ]
-            search_df = search_df.drop('.tag', axis=1).set_index('time')
-            new_time_index = np.linspace(anomaly_t-anomaly_window_size_in_sec/2, anomaly_t+anomaly_window_size_in_sec/2, anomaly_window_size_in_sec*anomaly_resample_hz)
-            old_time_index = search_df.index
-            resampled_anomaly_df = search_df.reindex(old_time_index.union(new_time_index)).interpolate(method='linear', axis=0).ix[new_time_index]
-            anomaly_name = 'resampled_%shz_no_%s_from_trial_%s'%(anomaly_resample_hz, anomaly_idx, f)
-            resampled_anomaly_df.to_csv(os.path.join(resampled_anomalies_dir, anomaly_name+'.csv'))
-            list_of_resampled_anomaly_df.append(resampled_anomaly_df)
-
-        to_plot.append([
+        marker_path = os.path.join(trial_marker_dir, f+'.json')
+        if os.path.isfile(marker_path):
+            with open(marker_path, 'r') as marker_file:
+                marker = json.load(marker_file)
+            if marker['config_hash'] == config_hash:
+                print 'skipping', f
+                marker_by_trial[f] = marker
+                continue
+            remove_trial_outputs(extracted_anomalies_dir, marker)
+            os.remove(marker_path)
+
+        print 'processing', f
+        tag_multimodal_df, hmm_online_result_df = (None, None) if df_by_trial is None else df_by_trial[f]
+        list_of_trial_to_process.append(f)
+        list_of_args.append((marker_path, config_hash, (
             f,
+            tag_multimodal_csv_path,
+            hmm_online_result_csv_path,
+            interested_data_fields,
+            extracted_anomalies_dir,
+            ch,
             tag_multimodal_df,
-            list_of_anomaly_start_time,
-            list_of_anomaly_df,
-            list_of_resampled_anomaly_df,
-            list_of_lfd_df,
-            list_of_resampled_lfd_df,
-        ])
+            hmm_online_result_df,
+        )))
+
+    # Trials are independent, so they are processed in a process pool
+    from birl_generic_data_handler.process_pool import pool_map
+    list_of_marker = pool_map(_process_trial_in_worker, list_of_args, processes=options.processes)
+    marker_by_trial.update(zip(list_of_trial_to_process, list_of_marker))
+
+    # Outputs of trials no longer in anomalous_trial_folder
+    for marker_name in os.listdir(trial_marker_dir):
+        f, ext = os.path.splitext(marker_name)
+        if ext != '.json' or f in marker_by_trial:
+            continue
+        marker_path = os.path.join(trial_marker_dir, marker_name)
+        with open(marker_path, 'r') as marker_file:
+            remove_trial_outputs(extracted_anomalies_dir, json.load(marker_file))
+        os.remove(marker_path)
 
     if not PLOT_VERIFICATION:
-        import sys
-        sys.exit(0)
+        return extracted_anomalies_dir, marker_by_trial
+    from birl.robot_introspection_pkg.anomaly_sampling_config import anomaly_resample_hz
+    from birl.robot_introspection_pkg.general_config import trial_resample_hz
+    from birl_generic_data_handler.figure_renderer import FigureJob, render_figures
+    from birl_generic_data_handler.verification_plots import plot_colored_trials_from_csv, plot_series_grid_from_csv
         
 
     dimensions = copy.deepcopy(mmc.interested_data_fields)
@@ -238,124 +362,94 @@ if __name__ == "__main__":
         del dimensions[idx_to_del]
 
     visualization_by_dimension_dir = os.path.join(extracted_anomalies_dir, 'visualization_by_dimension_dir')
-    os.makedirs(visualization_by_dimension_dir)
     colored_trial_dir = os.path.join(visualization_by_dimension_dir, "colored_trial_dir")
-    os.makedirs(colored_trial_dir)
     anomaly_by_trial_dir = os.path.join(visualization_by_dimension_dir, "anomaly_by_trial_dir")
-    os.makedirs(anomaly_by_trial_dir)
     lfd_by_trial_dir = os.path.join(visualization_by_dimension_dir, "lfd_by_trial_dir")
-    os.makedirs(lfd_by_trial_dir)
 
-    for dim in dimensions:
-        trial_amount = len(to_plot)
-        colored_trial_fig, colored_trial_axs = plt.subplots(nrows=trial_amount, ncols=1, sharex=True, sharey=True)
-        if trial_amount == 1:
-            colored_trial_axs = [colored_trial_axs]
-
-        for idx, tmp in enumerate(to_plot):
-            f, \
-            tag_multimodal_df, \
-            list_of_anomaly_start_time, \
-            list_of_anomaly_df, \
-            list_of_resampled_anomaly_df, \
-            list_of_lfd_df, \
-            list_of_resampled_lfd_df = tmp
-
-            ax = colored_trial_axs[idx]
-            ax.plot(
-                tag_multimodal_df['time'].tolist(),
-                tag_multimodal_df[dim].tolist(), 
-            )
-            ax.set_title('trial: '+f+'.bag')
-            color_bg_and_anomaly(
-                ax,
-                tag_multimodal_df,
-                list_of_anomaly_start_time,
-            )
-            for anomaly_df in list_of_anomaly_df:
-                ax.plot(
-                    anomaly_df.index.tolist(),
-                    anomaly_df[dim].tolist(),
-                    color='red',
-                )
-            for LfD_df in list_of_lfd_df:
-                ax.plot(
-                    LfD_df.index.tolist(),
-                    LfD_df[dim].tolist(),
-                    color='yellow',
-                )
+    def get_path(relative_path):
+        return os.path.join(extracted_anomalies_dir, relative_path)
 
-            
+    list_of_job = []
+    for dim in dimensions:
+        list_of_trial = []
+        list_of_trial_input_path = []
+        for f in sorted(marker_by_trial):
+            marker = marker_by_trial[f]
+            list_of_trial.append((
+                'trial: '+f+'.bag',
+                get_path(marker['trial_csv']),
+                marker['anomaly_start_time'],
+                [get_path(i) for i in marker['raw_anomaly_csvs']],
+                [get_path(i) for i in marker['raw_lfd_csvs']],
+            ))
+            list_of_trial_input_path += [list_of_trial[-1][1]]+list_of_trial[-1][3]+list_of_trial[-1][4]
+
+            if len(marker['raw_anomaly_csvs']) != 0:
+                list_of_row = []
+                for anomaly_idx in range(len(marker['raw_anomaly_csvs'])):
+                    list_of_row.append([
+                        (
+                            'no_%s_anomaly_from_trial_%s'%(anomaly_idx, f),
+                            get_path(marker['raw_anomaly_csvs'][anomaly_idx]),
+                        ),
+                        (
+                            'resampled_%shz_no_%s_anomaly_from_trial_%s'%(anomaly_resample_hz, anomaly_idx, f),
+                            get_path(marker['resampled_anomaly_csvs'][anomaly_idx]),
+                        ),
+                    ])
+                list_of_job.append(FigureJob(
+                    os.path.join(anomaly_by_trial_dir, f, 'trial_'+f+'_'+dim+'.png'),
+                    plot_series_grid_from_csv,
+                    input_paths=sum([[i[1] for i in row] for row in list_of_row], []),
+                    suptitle='trial_'+f+'_'+dim,
+                    dim=dim,
+                    list_of_row=list_of_row,
+                ))
+
+            if len(marker['raw_lfd_csvs']) != 0:
+                list_of_row = []
+                for lfd_idx in range(len(marker['raw_lfd_csvs'])):
+                    list_of_row.append([
+                        (
+                            'no_%s_lfd_from_trial_%s'%(lfd_idx, f),
+                            get_path(marker['raw_lfd_csvs'][lfd_idx]),
+                        ),
+                        (
+                            'resampled_%shz_no_%s_lfd_from_trial_%s'%(trial_resample_hz, lfd_idx, f),
+                            get_path(marker['resampled_lfd_csvs'][lfd_idx]),
+                        ),
+                    ])
+                list_of_job.append(FigureJob(
+                    os.path.join(lfd_by_trial_dir, f, 'trial_'+f+'_'+dim+'.png'),
+                    plot_series_grid_from_csv,
+                    input_paths=sum([[i[1] for i in row] for row in list_of_row], []),
+                    suptitle='trial_'+f+'_'+dim,
+                    dim=dim,
+                    list_of_row=list_of_row,
+                ))
+
+        list_of_job.append(FigureJob(
+            os.path.join(colored_trial_dir, 'dim'+dim+'.png'),
+            plot_colored_trials_from_csv,
+            input_paths=list_of_trial_input_path,
+            suptitle=dim,
+            dim=dim,
+            list_of_trial=list_of_trial,
+        ))
+
+    render_figures(
+        list_of_job,
+        processes=options.processes,
+        preview=options.preview,
+    )
+
+    return extracted_anomalies_dir, marker_by_trial
 
-            trial_dir = os.path.join(anomaly_by_trial_dir, f)
-            if not os.path.isdir(trial_dir):
-                os.makedirs(trial_dir)
-            anomaly_amount = len(list_of_anomaly_df)
-            anomaly_by_trial_fig, anomaly_by_trial_axs = plt.subplots(nrows=anomaly_amount, ncols=2, sharex=True, sharey=True)
-            if anomaly_amount == 1:
-                anomaly_by_trial_axs = anomaly_by_trial_axs.reshape((1, 2))
-            for anomaly_idx in range(len(list_of_anomaly_df)):
-                anomaly_df = list_of_anomaly_df[anomaly_idx]
-                ax = anomaly_by_trial_axs[anomaly_idx, 0] 
-                time_x = anomaly_df.index-anomaly_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    anomaly_df[dim].tolist(), 
-                )
-                anomaly_name = 'no_%s_anomaly_from_trial_%s'%(anomaly_idx, f)
-                ax.set_title(anomaly_name)
-
-                resampled_anomaly_df = list_of_resampled_anomaly_df[anomaly_idx]
-                ax = anomaly_by_trial_axs[anomaly_idx, 1] 
-                time_x = resampled_anomaly_df.index-resampled_anomaly_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    resampled_anomaly_df[dim].tolist(), 
-                )
-                anomaly_name = 'resampled_%shz_no_%s_anomaly_from_trial_%s'%(anomaly_resample_hz, anomaly_idx, f)
-                ax.set_title(anomaly_name)
-            anomaly_by_trial_fig.set_size_inches(16,4*anomaly_amount)
-            anomaly_by_trial_fig.suptitle('trial_'+f+'_'+dim)
-            anomaly_by_trial_fig.savefig(os.path.join(trial_dir, 'trial_'+f+'_'+dim+'.png'))
-            plt.close(anomaly_by_trial_fig)
-
-
-
-            trial_dir = os.path.join(lfd_by_trial_dir, f)
-            if not os.path.isdir(trial_dir):
-                os.makedirs(trial_dir)
-            lfd_amount = len(list_of_lfd_df)
-            lfd_by_trial_fig, lfd_by_trial_axs = plt.subplots(nrows=lfd_amount, ncols=2, sharex=True, sharey=True)
-            if lfd_amount == 1:
-                lfd_by_trial_axs = lfd_by_trial_axs.reshape((1, 2))
-            for lfd_idx in range(len(list_of_lfd_df)):
-                lfd_df = list_of_lfd_df[lfd_idx]
-                ax = lfd_by_trial_axs[lfd_idx, 0] 
-                time_x = lfd_df.index-lfd_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    lfd_df[dim].tolist(), 
-                )
-                lfd_name = 'no_%s_lfd_from_trial_%s'%(lfd_idx, f)
-                ax.set_title(lfd_name)
-
-                resampled_lfd_df = list_of_resampled_lfd_df[lfd_idx]
-                ax = lfd_by_trial_axs[lfd_idx, 1] 
-                time_x = resampled_lfd_df.index-resampled_lfd_df.index[0]
-                ax.plot(
-                    time_x.tolist(),
-                    resampled_lfd_df[dim].tolist(), 
-                )
-                lfd_name = 'resampled_%shz_no_%s_lfd_from_trial_%s'%(trial_resample_hz, lfd_idx, f)
-                ax.set_title(lfd_name)
-            lfd_by_trial_fig.set_size_inches(16,4*lfd_amount)
-            lfd_by_trial_fig.suptitle('trial_'+f+'_'+dim)
-            lfd_by_trial_fig.savefig(os.path.join(trial_dir, 'trial_'+f+'_'+dim+'.png'))
-            plt.close(lfd_by_trial_fig)
-
-        colored_trial_fig.set_size_inches(16,4*trial_amount)
-        colored_trial_fig.suptitle(dim)
-        colored_trial_fig.savefig(os.path.join(colored_trial_dir, 'dim'+dim+'.png'))
-        plt.close(colored_trial_fig)
+if __name__ == "__main__":
+    parser = get_option_parser()
+    (options, args) = parser.parse_args()
 
+    if options.base_folder is None:
+        parser.error("no base_folder")
 
+    run(options)
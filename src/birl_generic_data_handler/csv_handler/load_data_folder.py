@@ -1,8 +1,8 @@
 import os
-import pandas as pd
-import ipdb
 
 def load_data_of_ben_struct(base_folder):
+    import pandas as pd
+
     files = os.listdir(base_folder)
     pandadf_group_by_foldername = {}
     for f in files:
@@ -23,6 +23,8 @@ def load_data_of_ben_struct(base_folder):
     return pandadf_group_by_foldername
 
 def load_data_of_rcbht_struct(base_folder):
+    import pandas as pd
+
     files = os.listdir(base_folder)
     pandadf_group_by_foldername = {}
     for f in files:
@@ -0,0 +1,239 @@
+"""Run the anomaly workflow as one pipeline, skipping stages whose inputs are unchanged.
+
+Stages, in order:
+    bag_to_csv: CSVs of the data and flag topics of the rosbags in
+        base_folder/anomalous_trial_rosbags, if there are rosbags there,
+        stamped by --stamp-source.
+    extract: extract_error_data_from_trial_record_for_anomaly_classification,
+        with trials processed in a process pool.
+    cook_anomalies: cook_dataset_of_anomalies.
+    cook_lfds: cook_dataset_of_lfds.
+
+Trial Dataframes read by bag_to_csv are passed to extract in memory. Stamps
+are kept in output_dir/pipeline_stamp_dir. Give stage names to run only them
+and the stages they run after.
+"""
+import os
+import logging
+import extract_error_data_from_trial_record_for_anomaly_classification as extract_script
+import cook_dataset_of_anomalies
+import cook_dataset_of_lfds
+
+DATA_TOPIC_NAME = '/tag_multimodal'
+FLAG_TOPIC_NAME = '/anomaly_detection_signal'
+
+
+def load_markers(trial_marker_dir):
+    import json
+    marker_by_trial = {}
+    for marker_name in sorted(os.listdir(trial_marker_dir)):
+        f, ext = os.path.splitext(marker_name)
+        if ext != '.json':
+            continue
+        with open(os.path.join(trial_marker_dir, marker_name), 'r') as marker_file:
+            marker_by_trial[f] = json.load(marker_file)
+    return marker_by_trial
+
+
+def get_pipeline(options):
+    from birl_generic_data_handler.pipeline import Pipeline, Stage
+    import birl.robot_introspection_pkg.multi_modal_config as mmc
+    from birl.robot_introspection_pkg.anomaly_sampling_config import anomaly_window_size_in_sec, anomaly_resample_hz
+    from birl.robot_introspection_pkg.general_config import trial_resample_hz
+
+    base_folder = options.base_folder
+    anomalous_trial_folder = os.path.join(base_folder, "anomalous_trial_rosbags")
+    extracted_anomalies_dir = options.output_dir
+    if extracted_anomalies_dir is None:
+        extracted_anomalies_dir = os.path.join(base_folder, "extracted_anomalies_dir", "pipeline")
+    processes_args = [] if options.processes is None else ['-p', str(options.processes)]
+    preview_args = ['--preview'] if options.preview else []
+    stamp_source_args = ['--stamp-source', options.stamp_source]
+
+    pipeline = Pipeline(os.path.join(extracted_anomalies_dir, 'pipeline_stamp_dir'))
+
+    list_of_bag_path = sorted(
+        os.path.join(anomalous_trial_folder, i)
+        for i in os.listdir(anomalous_trial_folder) if i.endswith('.bag')
+    )
+    if len(list_of_bag_path) != 0:
+        from birl_offline_data_handler.rosbag_handler import RosbagHandler
+        handler = RosbagHandler(
+            anomalous_trial_folder,
+            stamp_source=options.stamp_source,
+            decode_processes=options.decode_processes,
+        )
+
+        def bag_to_csv(results, stamp_source):
+            list_of_tag = handler.get_csv_of_a_topic(DATA_TOPIC_NAME)
+            list_of_flag = handler.get_csv_of_a_topic(FLAG_TOPIC_NAME)
+            df_by_trial = {}
+            for (bag_path, tag_df), (flag_bag_path, flag_df) in zip(list_of_tag, list_of_flag):
+                df_by_trial[os.path.basename(bag_path)[:-4]] = (tag_df, flag_df)
+            return df_by_trial
+
+        list_of_trial_csv_path = [
+            handler._get_csv_path(bag_path, topic_name)
+            for bag_path in list_of_bag_path
+            for topic_name in [DATA_TOPIC_NAME, FLAG_TOPIC_NAME]
+        ]
+        pipeline.add(Stage(
+            'bag_to_csv',
+            bag_to_csv,
+            input_paths=list_of_bag_path,
+            output_paths=list_of_trial_csv_path,
+            # CSVs are cached by handler, so they are only read again
+            load=lambda **config: bag_to_csv({}, **config),
+            stamp_source=options.stamp_source,
+        ))
+        after_bag_to_csv = ['bag_to_csv']
+    else:
+        list_of_trial_csv_path = sum([
+            [tag_path, flag_path] for f, tag_path, flag_path in
+            extract_script.get_list_of_trial_csv_paths(anomalous_trial_folder, options.stamp_source)
+        ], [])
+        after_bag_to_csv = []
+
+    trial_marker_dir = os.path.join(extracted_anomalies_dir, 'trial_marker_dir')
+
+    def extract(results, **config):
+        extract_options, args = extract_script.get_option_parser().parse_args(
+            ['-d', base_folder, '-o', extracted_anomalies_dir]+processes_args+preview_args+stamp_source_args
+        )
+        extracted_dir, marker_by_trial = extract_script.run(
+            extract_options,
+            df_by_trial=results.get('bag_to_csv'),
+        )
+        return marker_by_trial
+
+    pipeline.add(Stage(
+        'extract',
+        extract,
+        input_paths=list_of_trial_csv_path,
+        output_paths=[trial_marker_dir],
+        after=after_bag_to_csv,
+        load=lambda **config: load_markers(trial_marker_dir),
+        interested_data_fields=mmc.interested_data_fields,
+        anomaly_window_size_in_sec=anomaly_window_size_in_sec,
+        anomaly_resample_hz=anomaly_resample_hz,
+        trial_resample_hz=trial_resample_hz,
+    ))
+
+    def cook_anomalies(results, mode, pack):
+        cook_options, args = cook_dataset_of_anomalies.get_option_parser().parse_args(
+            ['-d', extracted_anomalies_dir]+(['--pack'] if pack else ['--mode', mode])
+        )
+        cook_dataset_of_anomalies.run(cook_options)
+
+    mode = 'copy' if options.mode is None else options.mode
+    if options.pack:
+        anomaly_dataset_path = os.path.join(extracted_anomalies_dir, 'packed_dataset_of_resampled_anomalies_dir')
+    elif mode == 'manifest':
+        anomaly_dataset_path = os.path.join(extracted_anomalies_dir, 'manifest_of_resampled_anomalies.csv')
+    else:
+        anomaly_dataset_path = os.path.join(extracted_anomalies_dir, 'dataset_of_resampled_anomalies_dir')
+    pipeline.add(Stage(
+        'cook_anomalies',
+        cook_anomalies,
+        input_paths=[os.path.join(extracted_anomalies_dir, 'resampled_anomalies_dir')],
+        output_paths=[anomaly_dataset_path],
+        after=['extract'],
+        mode=mode,
+        pack=options.pack,
+    ))
+
+    def cook_lfds(results, align_mode, dtw_window, pack):
+        args = ['-d', extracted_anomalies_dir, '--align-mode', align_mode]+processes_args+preview_args
+        if dtw_window is not None:
+            args += ['--dtw-window', str(dtw_window)]
+        if pack:
+            args += ['--pack']
+        cook_options, args = cook_dataset_of_lfds.get_option_parser().parse_args(args)
+        cook_dataset_of_lfds.run(cook_options)
+
+    pipeline.add(Stage(
+        'cook_lfds',
+        cook_lfds,
+        input_paths=[os.path.join(extracted_anomalies_dir, 'resampled_lfd_dir')],
+        output_paths=[os.path.join(extracted_anomalies_dir, 'dataset_of_resampled_DTWed_lfd_dir')],
+        after=['extract'],
+        align_mode=options.align_mode,
+        dtw_window=options.dtw_window,
+        pack=options.pack,
+    ))
+    return pipeline
+
+
+if __name__ == "__main__":
+    from optparse import OptionParser
+    usage = "usage: %prog -d base_folder_path [stage_name ...]"
+    parser = OptionParser(usage=usage)
+
+    parser.add_option("-d", "--base-folder",
+        action="store", type="string", dest="base_folder",
+        help="the folder that has anomalous_trial_rosbags in it.")
+
+    parser.add_option("-o", "--output-dir",
+        action="store", type="string", dest="output_dir",
+        default=None,
+        help="folder to extract and cook into. base_folder/extracted_anomalies_dir/pipeline by default.")
+
+    parser.add_option("-p", "--processes",
+        action="store", type="int", dest="processes",
+        default=None,
+        help="amount of processes to process trials, run DTW and render figures in, the amount of CPUs by default.")
+
+    parser.add_option("--preview",
+        action="store_true", dest="preview",
+        default=False,
+        help="render verification figures at a low resolution.")
+
+    parser.add_option("--mode",
+        action="store", type="choice", dest="mode",
+        choices=["copy", "manifest", "hardlink", "symlink"], default=None,
+        help="how anomaly csv get into the dataset, see cook_dataset_of_anomalies. copy by default. Can't be given with --pack.")
+
+    parser.add_option("--align-mode",
+        action="store", type="choice", dest="align_mode",
+        choices=["shortest", "barycenter"], default="shortest",
+        help="align lfds of a label to the shortest one, or to their DTW barycenter. Default: shortest.")
+
+    parser.add_option("--dtw-window",
+        action="store", type="int", dest="dtw_window",
+        default=None,
+        help="half width of the Sakoe-Chiba band in timesteps, no band by default.")
+
+    parser.add_option("--pack",
+        action="store_true", dest="pack",
+        default=False,
+        help="pack anomalies and DTWed LfDs into memory-mapped datasets.")
+
+    parser.add_option("--stamp-source",
+        action="store", type="choice", dest="stamp_source",
+        choices=["record", "header", "both"], default="record",
+        help="stamp rows of rosbags by the time they were recorded, by their header stamps, or by both. Default: record.")
+
+    parser.add_option("--decode-processes",
+        action="store", type="int", dest="decode_processes",
+        default=1,
+        help="amount of processes to decode chunks of a rosbag in. Default: 1.")
+
+    parser.add_option("-f", "--force",
+        action="store_true", dest="force",
+        default=False,
+        help="run stages even if their inputs haven't changed.")
+    (options, args) = parser.parse_args()
+
+    if options.base_folder is None:
+        parser.error("no base_folder")
+    if options.pack and options.mode is not None:
+        parser.error("--pack and --mode can't be given together")
+
+    logging.basicConfig(level=logging.INFO)
+    pipeline = get_pipeline(options)
+    list_of_run = pipeline.run(
+        targets=args if len(args) != 0 else None,
+        force=options.force,
+        logger=logging.getLogger(),
+    )
+    print("ran %s stages: %s"%(len(list_of_run), ', '.join(list_of_run)))
@@ -1,8 +1,5 @@
 import os
-import pandas as pd
 import load_data_folder
-import numpy as np
-import ipdb
 
 if __name__ == "__main__":
     from optparse import OptionParser
@@ -20,6 +17,8 @@ if __name__ == "__main__":
     else:
         base_folder = options.base_folder
 
+    import numpy as np
+
     files = os.listdir(base_folder)
     df_group_by_foldername = load_data_folder.run(base_folder)
 
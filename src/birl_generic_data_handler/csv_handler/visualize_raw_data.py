@@ -1,8 +1,5 @@
 import os
-import pandas as pd
-from datetime import datetime
 import load_data_folder
-import plot_data_in_panda_df
 
 
 
@@ -25,16 +22,17 @@ if __name__ == "__main__":
 
     from matplotlib.pyplot import cm 
     import numpy as np
+    from birl_generic_data_handler.trial_plotter import TrialPlotter
     color=iter(cm.rainbow(np.linspace(0, 1, len(files))))
     df_group_by_foldername = load_data_folder.run(options.base_folder)
 
-    plot_data_in_panda_df.init_plots()
+    plotter = TrialPlotter()
     for f, df in df_group_by_foldername.iteritems():
         df = df.loc[df['.tag'] != 0]
         df.index = np.arange(1, len(df)+1)
         c=next(color)
-        plot_data_in_panda_df.plot_one_df(df, color=c, label=f)
+        plotter.add_trial(df, color=c, label=f)
     
-    plot_data_in_panda_df.plot_legend()
-    plot_data_in_panda_df.show_plots()
+    plotter.plot_legend()
+    plotter.show()
 
@@ -1,9 +1,4 @@
-import os
-import pandas as pd
-from datetime import datetime
-import numpy as np
 import load_data_folder
-import plot_data_in_panda_df
 
 
 if __name__ == "__main__":
@@ -19,6 +14,9 @@ if __name__ == "__main__":
     if options.base_folder is None:
         parser.error("no base_folder")
 
+    import numpy as np
+    from birl_generic_data_handler.trial_plotter import TrialPlotter
+
     df_group_by_foldername = load_data_folder.run(options.base_folder)
     
     f, df = df_group_by_foldername.iteritems().next()
@@ -30,11 +28,11 @@ if __name__ == "__main__":
     from matplotlib.pyplot import cm 
     color=iter(cm.rainbow(np.linspace(0, 1, state_amount)))
 
-    plot_data_in_panda_df.init_plots()
+    plotter = TrialPlotter()
     for state_no in df['.tag'].unique():
         c=next(color)
         state_df = df.loc[df['.tag'] == state_no]
-        plot_data_in_panda_df.plot_one_df(state_df, color=c, label=state_no)
-    plot_data_in_panda_df.plot_legend()
-    plot_data_in_panda_df.show_plots()
+        plotter.add_trial(state_df, color=c, label=state_no)
+    plotter.plot_legend()
+    plotter.show()
 
@@ -1,5 +1,4 @@
 import os
-import ipdb
 
 def get_model_score(files_in_model_id_folder):
     import re
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""This is a module that labels dataset files through a manifest
+
+A manifest is a CSV of two columns, \"path\" and \"label\", one row per file of
+a dataset. Paths are kept relative to the folder of the manifest, so a dataset
+folder can be moved as a whole. Files are labeled without being copied or
+renamed, and relabeling a dataset only rewrites its manifest.
+
+"""
+import os
+
+
+def write_manifest(manifest_path, list_of_path, list_of_label):
+    """Write a manifest.
+
+    Args:
+        manifest_path (str): Path of the manifest CSV.
+        list_of_path (list of str): Paths of dataset files.
+        list_of_label (list): Labels of the files.
+    """
+    import pandas as pd
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    pd.DataFrame({
+        'path': [os.path.relpath(os.path.abspath(path), manifest_dir) for path in list_of_path],
+        'label': list(list_of_label),
+    }, columns=['path', 'label']).to_csv(manifest_path, index=False)
+
+
+def load_manifest(manifest_path):
+    """Load a manifest.
+
+    Returns:
+        A pandas.Dataframe of \"path\" and \"label\" columns, paths made
+        absolute.
+    """
+    import pandas as pd
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    manifest_df = pd.read_csv(manifest_path, sep=',')
+    manifest_df['path'] = [os.path.join(manifest_dir, path) for path in manifest_df['path']]
+    return manifest_df
+
+
+def iter_dataset(manifest_path, **kwargs):
+    """Read the files of a dataset one at a time through its manifest.
+
+    Args:
+        manifest_path (str): Path of the manifest CSV.
+        **kwargs: Keyword arguments of pandas.read_csv.
+
+    Yields:
+        (path, label, df) tuples, in the order of the manifest.
+    """
+    import pandas as pd
+
+    manifest_df = load_manifest(manifest_path)
+    for path, label in zip(manifest_df['path'], manifest_df['label']):
+        yield path, label, pd.read_csv(path, sep=',', **kwargs)
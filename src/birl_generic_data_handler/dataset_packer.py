@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""This is a module that packs resampled windows into one memory-mapped dataset
+
+Resampled anomaly windows, or DTW-aligned LfDs of one label, all have the same
+amount of timesteps and columns. Instead of one CSV per window, they are packed
+into a folder of:
+
+    data.npy: Array of shape (n_windows, n_timesteps, n_columns).
+    time.npy: Array of shape (n_windows, n_timesteps), times of the timesteps.
+    labels.npy: Array of shape (n_windows,), labels given at pack time.
+    metadata.csv: One row per window, its name, label, start and end time.
+    columns.json: Names of the columns of data.npy.
+
+data.npy is written one window at a time through a memory map, so packing
+doesn't hold the dataset in memory. A dataset is packed in a temporary folder
+that replaces the dataset folder once packing succeeds. PackedDataset opens
+the arrays with mmap_mode='r', so loading costs the same however large the
+dataset is, and slicing them doesn't copy.
+
+"""
+import os
+import json
+import numpy as np
+
+
+def pack_dataset(list_of_name, load_df, output_dir, get_label):
+    """Pack windows into a dataset folder.
+
+    Args:
+        list_of_name (list of str): Names of windows, e.g. CSV file names.
+        load_df: load_df(name) returns the window as a pandas.Dataframe
+            indexed by time.
+        output_dir (str): The dataset folder, replaced if existing.
+        get_label: get_label(name) returns the label of a window.
+
+    Returns:
+        The amount of windows packed.
+
+    Raises:
+        ValueError: If windows differ in shape or columns.
+    """
+    import shutil
+
+    n_windows = len(list_of_name)
+    if n_windows == 0:
+        raise ValueError("no window to pack")
+    tmp_dir = output_dir.rstrip(os.sep)+'.tmp'
+    if os.path.isdir(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    try:
+        _pack_to(list_of_name, load_df, tmp_dir, get_label)
+    except Exception:
+        shutil.rmtree(tmp_dir)
+        raise
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.rename(tmp_dir, output_dir)
+    return n_windows
+
+
+def _pack_to(list_of_name, load_df, output_dir, get_label):
+    import pandas as pd
+
+    n_windows = len(list_of_name)
+
+    labels = np.array([get_label(name) for name in list_of_name])
+    first_df = load_df(list_of_name[0])
+    columns = [str(i) for i in first_df.columns]
+    shape = (n_windows,)+first_df.shape
+
+    data = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'data.npy'),
+        mode='w+',
+        dtype=np.float64,
+        shape=shape,
+    )
+    time = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'time.npy'),
+        mode='w+',
+        dtype=np.float64,
+        shape=shape[:2],
+    )
+    list_of_metadata = []
+    for idx, name in enumerate(list_of_name):
+        df = first_df if idx == 0 else load_df(name)
+        if df.shape != shape[1:] or [str(i) for i in df.columns] != columns:
+            raise ValueError("window %s has shape %s and columns %s, expected %s and %s"%(
+                name, df.shape, list(df.columns), shape[1:], columns))
+        data[idx] = df.values
+        time[idx] = df.index.values
+        list_of_metadata.append([name, labels[idx], df.index[0], df.index[-1]])
+    data.flush()
+    time.flush()
+    del data, time
+
+    np.save(os.path.join(output_dir, 'labels.npy'), labels)
+    pd.DataFrame(
+        list_of_metadata,
+        columns=['name', 'label', 'start_time', 'end_time'],
+    ).to_csv(os.path.join(output_dir, 'metadata.csv'), index_label='index')
+    with open(os.path.join(output_dir, 'columns.json'), 'w') as f:
+        json.dump(columns, f, indent=4)
+
+
+def pack_csv_files(list_of_csv_path, output_dir, get_label):
+    """Pack window CSVs, indexed by their first column, into a dataset folder.
+
+    Windows are named, and labeled, by their file names.
+    """
+    import pandas as pd
+
+    path_by_name = dict((os.path.basename(path), path) for path in list_of_csv_path)
+    return pack_dataset(
+        [os.path.basename(path) for path in list_of_csv_path],
+        lambda name: pd.read_csv(path_by_name[name], sep=',', index_col=0),
+        output_dir,
+        get_label,
+    )
+
+
+class PackedDataset(object):
+    """A dataset packed by pack_dataset, opened as memory maps.
+
+    Attributes:
+        data (numpy.memmap): Shape (n_windows, n_timesteps, n_columns).
+        time (numpy.memmap): Shape (n_windows, n_timesteps).
+        labels (numpy.ndarray): Shape (n_windows,).
+        metadata (pandas.Dataframe): One row per window.
+        columns (list of str): Names of the columns of data.
+
+    Examples:
+        >>> dataset = PackedDataset.load("packed_dataset_of_resampled_anomalies_dir")
+        >>> x, y = dataset.data[dataset.labels == 1], dataset.labels[dataset.labels == 1]
+        >>> dataset.data[:32]
+        memmap
+
+    """
+
+    def __init__(self, data, time, labels, metadata, columns):
+        self.data = data
+        self.time = time
+        self.labels = labels
+        self.metadata = metadata
+        self.columns = columns
+
+    @classmethod
+    def load(cls, dataset_dir):
+        """Open a dataset folder without reading its data."""
+        import pandas as pd
+
+        with open(os.path.join(dataset_dir, 'columns.json'), 'r') as f:
+            columns = [str(i) for i in json.load(f)]
+        return cls(
+            data=np.load(os.path.join(dataset_dir, 'data.npy'), mmap_mode='r'),
+            time=np.load(os.path.join(dataset_dir, 'time.npy'), mmap_mode='r'),
+            labels=np.load(os.path.join(dataset_dir, 'labels.npy')),
+            metadata=pd.read_csv(os.path.join(dataset_dir, 'metadata.csv'), sep=',', index_col='index'),
+            columns=columns,
+        )
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, idx):
+        return self.data[idx], self.labels[idx]
+
+    def get_df(self, idx):
+        """Get a window as a pandas.Dataframe indexed by time."""
+        import pandas as pd
+        return pd.DataFrame(
+            self.data[idx],
+            index=pd.Index(self.time[idx], name='time'),
+            columns=self.columns,
+        )
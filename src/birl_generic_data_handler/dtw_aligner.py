@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""This is a module that aligns time series by dynamic time warping (DTW)
+
+The cost between every pair of timesteps is computed at once by
+scipy.spatial.distance.cdist. The accumulated cost is then filled one
+anti-diagonal at a time, since cells on an anti-diagonal only depend on the two
+anti-diagonals before it, which turns the O(n*m) recursion into O(n+m) numpy
+operations. An optional Sakoe-Chiba band limits the search to cells near the
+diagonal.
+
+To align a batch of demonstrations to one reference, use align_to_reference,
+which distributes the alignments over a process pool and returns, for each
+demonstration, the index of the timestep matched to every reference timestep.
+The aligned demonstration is then simply mat[aligned_index].
+
+"""
+import numpy as np
+from birl_generic_data_handler.process_pool import pool_map
+
+
+def get_cost_matrix(x, y, metric='euclidean'):
+    """Get the pairwise cost between timesteps of two time series.
+
+    Args:
+        x (numpy.ndarray): Time series of shape (n, n_features).
+        y (numpy.ndarray): Time series of shape (m, n_features).
+        metric (str, optional): Default 'euclidean'. Any metric accepted
+            by scipy.spatial.distance.cdist.
+
+    Returns:
+        A numpy array of shape (n, m).
+    """
+    from scipy.spatial.distance import cdist
+    x = np.asarray(x, dtype=np.float64).reshape(len(x), -1)
+    y = np.asarray(y, dtype=np.float64).reshape(len(y), -1)
+    return cdist(x, y, metric=metric)
+
+
+def get_sakoe_chiba_band(n, m, window):
+    """Get the mask of cells within a Sakoe-Chiba band.
+
+    The band follows the line from (0, 0) to (n-1, m-1), so it also works
+    for time series of different lengths. A band narrower than half a
+    timestep, e.g. window 0, misses cells of the line where it runs between
+    timesteps, i.e. if n != m, and leaves no warping path, so it is widened
+    to half a timestep, which always holds a path along the line.
+
+    Args:
+        n (int): Length of the first time series.
+        m (int): Length of the second time series.
+        window (int): Half width of the band in timesteps.
+
+    Returns:
+        A boolean numpy array of shape (n, m).
+
+    Raises:
+        ValueError: If window is negative.
+    """
+    if window < 0:
+        raise ValueError("window should not be negative, got %s"%(window,))
+    window = max(window, 0.5)
+    i = np.arange(n).reshape(-1, 1)
+    j = np.arange(m).reshape(1, -1)
+    scale = max(n-1, m-1, 1)
+    return np.abs(i*(m-1)-j*(n-1)) <= window*scale
+
+
+def get_accumulated_cost_matrix(cost, window=None):
+    """Accumulate a cost matrix along anti-diagonals.
+
+    Args:
+        cost (numpy.ndarray): Cost matrix of shape (n, m).
+        window (int, optional): Default None. Half width of the Sakoe-Chiba
+            band, None means no band.
+
+    Returns:
+        A numpy array of shape (n, m). Cells outside the band are inf.
+    """
+    n, m = cost.shape
+    if window is not None:
+        cost = np.where(get_sakoe_chiba_band(n, m, window), cost, np.inf)
+
+    # Pad with one row and one column of inf so that the first row and
+    # column need no special case.
+    acc = np.full((n+1, m+1), np.inf)
+    acc[0, 0] = 0
+    for k in range(2, n+m+1):
+        i = np.arange(max(1, k-m), min(n, k-1)+1)
+        j = k-i
+        acc[i, j] = cost[i-1, j-1]+np.minimum(
+            np.minimum(acc[i-1, j-1], acc[i-1, j]),
+            acc[i, j-1],
+        )
+    return acc[1:, 1:]
+
+
+def get_warping_path(acc):
+    """Backtrack the optimal warping path of an accumulated cost matrix.
+
+    Args:
+        acc (numpy.ndarray): Accumulated cost matrix of shape (n, m).
+
+    Returns:
+        A (path_x, path_y) tuple of numpy arrays, both non-decreasing,
+        which starts at (0, 0) and ends at (n-1, m-1).
+    """
+    i, j = acc.shape[0]-1, acc.shape[1]-1
+    path_x = [i]
+    path_y = [j]
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            step = np.argmin((acc[i-1, j-1], acc[i-1, j], acc[i, j-1]))
+            if step == 0:
+                i -= 1
+                j -= 1
+            elif step == 1:
+                i -= 1
+            else:
+                j -= 1
+        path_x.append(i)
+        path_y.append(j)
+    return np.array(path_x[::-1]), np.array(path_y[::-1])
+
+
+def get_aligned_index(path_x, path_y, length_of_x):
+    """Get the timestep of y matched to every timestep of x.
+
+    When a timestep of x is matched to several timesteps of y, the first
+    one is taken.
+
+    Args:
+        path_x (numpy.ndarray): Warping path on x, see get_warping_path.
+        path_y (numpy.ndarray): Warping path on y, see get_warping_path.
+        length_of_x (int): Length of x.
+
+    Returns:
+        A numpy array of shape (length_of_x,), y[aligned_index] is y
+        aligned to x.
+    """
+    first_match = np.searchsorted(path_x, np.arange(length_of_x), side='left')
+    return path_y[first_match]
+
+
+def dtw(x, y, window=None, metric='euclidean'):
+    """Align two time series by DTW.
+
+    Args:
+        x (numpy.ndarray): Time series of shape (n, n_features).
+        y (numpy.ndarray): Time series of shape (m, n_features).
+        window (int, optional): Default None. Half width of the Sakoe-Chiba
+            band, None means no band.
+        metric (str, optional): Default 'euclidean'. Any metric accepted
+            by scipy.spatial.distance.cdist.
+
+    Returns:
+        A (dist, path_x, path_y) tuple, where dist is the accumulated cost
+        of the optimal warping path (path_x, path_y).
+
+    Raises:
+        ValueError: If no warping path is of finite cost, e.g. x or y
+            holds inf.
+
+    Examples:
+        >>> dist, path_x, path_y = dtw([[0], [1], [2]], [[0], [0], [1], [2]])
+        >>> dist, path_x, path_y
+        (0.0, array([0, 0, 1, 2]), array([0, 1, 2, 3]))
+    """
+    acc = get_accumulated_cost_matrix(get_cost_matrix(x, y, metric), window)
+    if np.isinf(acc[-1, -1]):
+        raise ValueError("no warping path of finite cost")
+    path_x, path_y = get_warping_path(acc)
+    return acc[-1, -1], path_x, path_y
+
+
+def _dtw_one(args):
+    return dtw(*args)
+
+
+def get_warping_paths(ref_mat, list_of_mat, window=None, metric='euclidean', processes=None):
+    """Get warping paths of a batch of time series to one reference.
+
+    Args:
+        ref_mat (numpy.ndarray): The reference of shape (n, n_features).
+        list_of_mat (list of numpy.ndarray): Time series to be aligned,
+            each of shape (m_i, n_features).
+        window (int, optional): Default None. Half width of the Sakoe-Chiba
+            band, None means no band.
+        metric (str, optional): Default 'euclidean'. Any metric accepted
+            by scipy.spatial.distance.cdist.
+        processes (int, optional): Default None. See process_pool.pool_map.
+
+    Returns:
+        A list of (dist, path_ref, path_mat) tuples as returned by dtw,
+        one for each time series.
+    """
+    return pool_map(
+        _dtw_one,
+        [(ref_mat, mat, window, metric) for mat in list_of_mat],
+        processes,
+    )
+
+
+def align_to_reference(ref_mat, list_of_mat, window=None, metric='euclidean', processes=None):
+    """Align a batch of time series to one reference by DTW.
+
+    Args:
+        ref_mat (numpy.ndarray): The reference of shape (n, n_features).
+        list_of_mat (list of numpy.ndarray): Time series to be aligned,
+            each of shape (m_i, n_features).
+        window (int, optional): Default None. Half width of the Sakoe-Chiba
+            band, None means no band.
+        metric (str, optional): Default 'euclidean'. Any metric accepted
+            by scipy.spatial.distance.cdist.
+        processes (int, optional): Default None. Size of the process pool,
+            None means the amount of CPUs. With 1 process, alignments are
+            done in the current process.
+
+    Returns:
+        A list of (dist, aligned_index) tuples, one for each time series,
+        where list_of_mat[k][aligned_index] is aligned to ref_mat.
+    """
+    ret = []
+    for dist, path_ref, path_mat in get_warping_paths(
+        ref_mat, list_of_mat, window, metric, processes
+    ):
+        ret.append((dist, get_aligned_index(path_ref, path_mat, len(ref_mat))))
+    return ret
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""This is a module that builds DTW barycenters of demonstrations
+
+Instead of aligning every demonstration of a label to one arbitrary
+demonstration, e.g. the shortest one, demonstrations can be aligned to their
+DTW barycenter, a template computed by DTW Barycenter Averaging (DBA). The
+template is initialized with the medoid of the demonstrations, i.e. the one with
+the least sum of DTW distances to the others, and then refined by DBA
+iterations.
+
+The template, the alignments of known demonstrations and the pairwise DTW
+distances are kept by DtwBarycenter and can be saved to and loaded from disk,
+so that a template is reused across runs. Demonstrations are identified by the
+hash of their content. If the same demonstrations come again, their saved
+alignments are reused without any DTW. If some come or go, only the new ones
+are aligned to the saved template, and the timesteps matched by each
+demonstration are kept so that the average of the current demonstrations is
+updated without aligning known ones again. DBA only goes on over all
+demonstrations when asked to, or when that average drifts too far from the
+template, which then converges in fewer iterations than from the medoid.
+Alignments always point into the template that is kept. A template is only
+valid for the window, metric and preprocessing, e.g. scaling, it was built
+with, see get_config.
+
+"""
+import hashlib
+import numpy as np
+from birl_generic_data_handler.dtw_aligner import (
+    dtw,
+    get_aligned_index,
+    get_warping_paths,
+)
+from birl_generic_data_handler.process_pool import pool_map
+
+
+def get_key_of_mat(mat):
+    """Get a key identifying a demonstration by its content."""
+    mat = np.ascontiguousarray(mat, dtype=np.float64)
+    h = hashlib.sha1(str(mat.shape).encode('ascii'))
+    h.update(mat.tobytes())
+    return h.hexdigest()
+
+
+def _to_str(value):
+    # Strings saved by python 2 are loaded as bytes by python 3
+    if isinstance(value, np.ndarray):
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+    return str(value)
+
+
+def _dtw_dist(args):
+    return dtw(*args)[0]
+
+
+class DtwBarycenter(object):
+    """To align demonstrations of a label to their DTW barycenter.
+
+    Args:
+        window (int, optional): Default None. Half width of the Sakoe-Chiba
+            band, None means no band.
+        metric (str, optional): Default 'euclidean'. Any metric accepted
+            by scipy.spatial.distance.cdist.
+        processes (int, optional): Default None. Size of the process pool
+            DTW runs in, None means the amount of CPUs.
+        preprocessing (str, optional): Default ''. Identifies how
+            demonstrations were preprocessed, e.g. the parameters of their
+            scaler. Saved, so that a template of other preprocessing isn't
+            reused.
+        max_drift (float, optional): Default 0.05. When demonstrations come
+            or go, the template is refined over all of them if the average
+            of their aligned timesteps is farther than this from the
+            template, relative to the norm of the template.
+
+    Examples:
+        >>> barycenter = DtwBarycenter()
+        >>> barycenter.align(list_of_mat)
+        [(dist, aligned_index), ..., (dist, aligned_index)]
+        >>> barycenter.save("label_0.npz")
+
+        In a later run, only new demonstrations are aligned to the saved
+        template, unless it was built with another config.
+
+        >>> barycenter = DtwBarycenter.load("label_0.npz")
+        >>> if barycenter.get_config() != (window, 'euclidean', preprocessing):
+        ...     barycenter = DtwBarycenter(window, preprocessing=preprocessing)
+        >>> barycenter.align(list_of_mat+[new_mat])
+        [(dist, aligned_index), ..., (dist, aligned_index)]
+
+    """
+
+    def __init__(
+        self,
+        window=None,
+        metric='euclidean',
+        processes=None,
+        preprocessing='',
+        max_drift=0.05,
+    ):
+        self.window = window
+        self.metric = metric
+        self.processes = processes
+        self.preprocessing = preprocessing
+        self.max_drift = max_drift
+        self.template = None
+        self._alignments = {}
+        # key -> (sums, counts) of the demonstration's timesteps matched to
+        # each timestep of the template
+        self._contributions = {}
+        self._pairwise_dists = {}
+
+    def get_config(self):
+        """Get what alignments depend on besides demonstrations, a
+        (window, metric, preprocessing) tuple. A saved DtwBarycenter of
+        another config should be built again."""
+        return (self.window, self.metric, self.preprocessing)
+
+    def align(self, list_of_mat, n_iter=10, refine=False):
+        """Align demonstrations to the template.
+
+        The template is built from list_of_mat if there is none yet. If
+        demonstrations are not the ones known, known demonstrations not in
+        list_of_mat are forgotten, and only new ones are aligned to the
+        template. The template is then refined by DBA over list_of_mat if
+        it drifted more than max_drift from the average of the current
+        demonstrations.
+
+        Args:
+            list_of_mat (list of numpy.ndarray): Demonstrations, each of
+                shape (m_i, n_features).
+            n_iter (int, optional): Default 10. Max amount of DBA
+                iterations.
+            refine (bool, optional): Default False. Refine the template by
+                DBA over list_of_mat whatever its drift.
+
+        Returns:
+            A list of (dist, aligned_index) tuples, one for each
+            demonstration, where list_of_mat[k][aligned_index] is aligned
+            to the template.
+        """
+        list_of_mat = [np.asarray(mat, dtype=np.float64) for mat in list_of_mat]
+        list_of_key = [get_key_of_mat(mat) for mat in list_of_mat]
+        if self.template is None:
+            self.fit(list_of_mat, n_iter)
+        elif refine:
+            self._refine(list_of_key, list_of_mat, n_iter)
+        elif set(list_of_key) != set(self._alignments):
+            self._fold(list_of_key, list_of_mat, n_iter)
+        self._prune_pairwise_dists(list_of_key)
+        return [self._alignments[key] for key in list_of_key]
+
+    def fit(self, list_of_mat, n_iter=10):
+        """Build the template from scratch by DBA.
+
+        Args:
+            list_of_mat (list of numpy.ndarray): Demonstrations, each of
+                shape (m_i, n_features).
+            n_iter (int, optional): Default 10. Max amount of DBA
+                iterations, stopping early once the template converges.
+        """
+        list_of_mat = [np.asarray(mat, dtype=np.float64) for mat in list_of_mat]
+        list_of_key = [get_key_of_mat(mat) for mat in list_of_mat]
+        medoid_idx = self._get_medoid_idx(list_of_key, list_of_mat)
+
+        self.template = list_of_mat[medoid_idx].copy()
+        self._refine(list_of_key, list_of_mat, n_iter)
+
+    def _refine(self, list_of_key, list_of_mat, n_iter):
+        # DBA iterations from the current template. The template of the
+        # last iteration is the one alignments were made to, so that they
+        # never point into a template updated after them.
+        for i in range(max(n_iter, 1)):
+            self._alignments, self._contributions = self._align_to_template(
+                list_of_key,
+                list_of_mat,
+            )
+            new_template = self._get_average()
+            if i == max(n_iter, 1)-1 or np.allclose(self.template, new_template):
+                break
+            self.template = new_template
+
+    def _fold(self, list_of_key, list_of_mat, n_iter):
+        # Forget demonstrations gone and align new ones to the template,
+        # keeping alignments of known ones as they are.
+        set_of_key = set(list_of_key)
+        for key in list(self._alignments):
+            if key not in set_of_key:
+                del self._alignments[key]
+                self._contributions.pop(key, None)
+        new_mats = {}
+        for key, mat in zip(list_of_key, list_of_mat):
+            if key not in self._alignments:
+                new_mats[key] = mat
+        list_of_new_key = list(new_mats)
+        alignments, contributions = self._align_to_template(
+            list_of_new_key,
+            [new_mats[key] for key in list_of_new_key],
+        )
+        self._alignments.update(alignments)
+        self._contributions.update(contributions)
+
+        # Templates saved without contributions can't tell their drift
+        if len(self._contributions) != len(self._alignments)\
+            or self.get_drift() > self.max_drift:
+            self._refine(list_of_key, list_of_mat, n_iter)
+
+    def get_drift(self):
+        """Get how far the average of the aligned timesteps of known
+        demonstrations is from the template, relative to the norm of the
+        template."""
+        return np.linalg.norm(self._get_average()-self.template)\
+            /(np.linalg.norm(self.template) or 1.0)
+
+    def _get_average(self):
+        # The template of every timestep moved to the mean of all timesteps
+        # matched to it
+        sums = np.zeros(self.template.shape)
+        counts = np.zeros(self.template.shape[0])
+        for key_sums, key_counts in self._contributions.values():
+            sums += key_sums
+            counts += key_counts
+        return sums/counts.reshape(-1, 1)
+
+    def _prune_pairwise_dists(self, list_of_key):
+        set_of_key = set(list_of_key)
+        for pair in list(self._pairwise_dists):
+            if pair[0] not in set_of_key or pair[1] not in set_of_key:
+                del self._pairwise_dists[pair]
+
+    def _get_medoid_idx(self, list_of_key, list_of_mat):
+        list_of_pair = []
+        for a in range(len(list_of_key)):
+            for b in range(a+1, len(list_of_key)):
+                pair = tuple(sorted((list_of_key[a], list_of_key[b])))
+                if pair not in self._pairwise_dists:
+                    list_of_pair.append((a, b, pair))
+        list_of_dist = pool_map(
+            _dtw_dist,
+            [(list_of_mat[a], list_of_mat[b], self.window, self.metric)\
+                for a, b, pair in list_of_pair],
+            self.processes,
+        )
+        for (a, b, pair), dist in zip(list_of_pair, list_of_dist):
+            self._pairwise_dists[pair] = dist
+
+        sum_of_dist = np.zeros(len(list_of_key))
+        for a in range(len(list_of_key)):
+            for b in range(a+1, len(list_of_key)):
+                dist = self._pairwise_dists[tuple(sorted((list_of_key[a], list_of_key[b])))]
+                sum_of_dist[a] += dist
+                sum_of_dist[b] += dist
+        return int(np.argmin(sum_of_dist))
+
+    def _align_to_template(self, list_of_key, list_of_mat):
+        # Align demonstrations to the current template, and get the sums and
+        # counts of their timesteps matched to each timestep of it.
+        if len(list_of_key) == 0:
+            return {}, {}
+        list_of_path = get_warping_paths(
+            self.template,
+            list_of_mat,
+            self.window,
+            self.metric,
+            self.processes,
+        )
+        length = self.template.shape[0]
+        alignments = {}
+        contributions = {}
+        for key, mat, (dist, path_template, path_mat) in \
+            zip(list_of_key, list_of_mat, list_of_path):
+            sums = np.zeros(self.template.shape)
+            np.add.at(sums, path_template, mat[path_mat])
+            contributions[key] = (
+                sums,
+                np.bincount(path_template, minlength=length).astype(np.float64),
+            )
+            alignments[key] = (
+                dist,
+                get_aligned_index(path_template, path_mat, length),
+            )
+        return alignments, contributions
+
+    def save(self, path):
+        """Save the config, template, alignments, their contributions to the
+        template and pairwise distances to a .npz file."""
+        list_of_key = sorted(self._alignments)
+        # Contributions are kept only if every alignment has one
+        list_of_contribution_key = list_of_key\
+            if len(self._contributions) == len(list_of_key) else []
+        list_of_pair = sorted(self._pairwise_dists)
+        np.savez(
+            path,
+            window=np.array(-1 if self.window is None else self.window),
+            metric=np.array(self.metric),
+            preprocessing=np.array(self.preprocessing),
+            template=self.template,
+            alignment_keys=np.array(list_of_key),
+            alignment_dists=np.array([self._alignments[key][0] for key in list_of_key]),
+            alignment_index=np.array([self._alignments[key][1] for key in list_of_key]),
+            alignment_sums=np.array(
+                [self._contributions[key][0] for key in list_of_contribution_key]
+            ).reshape((-1,)+self.template.shape),
+            alignment_counts=np.array(
+                [self._contributions[key][1] for key in list_of_contribution_key]
+            ).reshape(-1, self.template.shape[0]),
+            pairwise_keys=np.array(list_of_pair).reshape(-1, 2),
+            pairwise_dists=np.array([self._pairwise_dists[pair] for pair in list_of_pair]),
+        )
+
+    @classmethod
+    def load(cls, path, processes=None, max_drift=0.05):
+        """Load a DtwBarycenter saved by save."""
+        with np.load(path) as npz:
+            window = int(npz['window'])
+            barycenter = cls(
+                window=None if window == -1 else window,
+                metric=_to_str(npz['metric']),
+                processes=processes,
+                preprocessing=_to_str(npz['preprocessing']) if 'preprocessing' in npz.files else '',
+                max_drift=max_drift,
+            )
+            barycenter.template = npz['template']
+            for key, dist, aligned_index in zip(
+                npz['alignment_keys'],
+                npz['alignment_dists'],
+                npz['alignment_index'],
+            ):
+                barycenter._alignments[_to_str(key)] = (dist, aligned_index)
+            if 'alignment_sums' in npz.files and len(npz['alignment_sums']):
+                for key, sums, counts in zip(
+                    npz['alignment_keys'],
+                    npz['alignment_sums'],
+                    npz['alignment_counts'],
+                ):
+                    barycenter._contributions[_to_str(key)] = (sums, counts)
+            for (key_a, key_b), dist in zip(npz['pairwise_keys'], npz['pairwise_dists']):
+                barycenter._pairwise_dists[(_to_str(key_a), _to_str(key_b))] = dist
+        return barycenter
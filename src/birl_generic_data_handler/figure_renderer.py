@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""This is a module that renders figures headlessly in a process pool
+
+A figure to render is described by a FigureJob: the path of the PNG, a
+module-level plot function and the keyword arguments of that function. The plot
+function draws on a matplotlib Figure that is backed by the Agg canvas, so no
+display and no pyplot state is involved, and jobs can be rendered in worker
+processes.
+
+The hash of a job's inputs is kept next to its PNG. A job whose hash hasn't
+changed since its PNG was rendered is skipped. In preview mode, figures are
+rendered at a low dpi, which is much faster for large figures.
+
+"""
+import os
+import hashlib
+import pickle
+
+
+class FigureJob(object):
+    """A figure to be rendered by render_figures.
+
+    Args:
+        output_path (str): Path of the PNG.
+        plot_func: A module-level function, plot_func(fig, **kwargs), which
+            draws on fig, a matplotlib.figure.Figure.
+        dpi (int, optional): Default None, which means matplotlib's default.
+        input_paths (list, optional): Default None. Files plot_func reads,
+            whose sizes and modification times are part of the input hash.
+        **kwargs: Keyword arguments of plot_func, which should be picklable.
+
+    Examples:
+        >>> job = FigureJob("/tmp/fx.png", plot_one_dim, df=df, dim="fx")
+        >>> render_figures([job], processes=4)
+        ["/tmp/fx.png"]
+
+    """
+
+    def __init__(self, output_path, plot_func, dpi=None, input_paths=None, **kwargs):
+        self.output_path = output_path
+        self.plot_func = plot_func
+        self.dpi = dpi
+        self.input_paths = [] if input_paths is None else list(input_paths)
+        self.kwargs = kwargs
+
+    def get_input_hash(self, dpi):
+        """Get the hash of everything the PNG depends on."""
+        h = hashlib.md5()
+        h.update(('%s.%s'%(self.plot_func.__module__, self.plot_func.__name__)).encode('utf-8'))
+        h.update(str(dpi).encode('utf-8'))
+        for key in sorted(self.kwargs):
+            h.update(key.encode('utf-8'))
+            h.update(pickle.dumps(self.kwargs[key], 2))
+        for path in self.input_paths:
+            stat = os.stat(path)
+            h.update(('%s:%s:%s'%(path, stat.st_size, stat.st_mtime)).encode('utf-8'))
+        return h.hexdigest()
+
+
+def _get_hash_path(output_path):
+    return os.path.join(
+        os.path.dirname(output_path),
+        '.'+os.path.basename(output_path)+'.hash',
+    )
+
+
+def new_figure():
+    """Get a matplotlib Figure backed by the Agg canvas."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def add_subplot_grid(fig, nrows, ncols, sharex=False, sharey=False):
+    """Add a grid of subplots to fig, like pyplot.subplots.
+
+    Returns:
+        A numpy array of axes of shape (nrows, ncols).
+    """
+    import numpy as np
+    axs = np.empty((nrows, ncols), dtype=object)
+    for i in range(nrows):
+        for j in range(ncols):
+            first_ax = axs[0, 0] if i+j > 0 else None
+            axs[i, j] = fig.add_subplot(
+                nrows, ncols, i*ncols+j+1,
+                sharex=first_ax if sharex else None,
+                sharey=first_ax if sharey else None,
+            )
+    return axs
+
+
+def _render_one(args):
+    job, dpi, hash_value = args
+    fig = new_figure()
+    job.plot_func(fig, **job.kwargs)
+    output_dir = os.path.dirname(job.output_path)
+    if output_dir != '' and not os.path.isdir(output_dir):
+        try:
+            os.makedirs(output_dir)
+        except OSError as exc: # Guard against race condition
+            import errno
+            if exc.errno != errno.EEXIST:
+                raise
+    fig.savefig(job.output_path, dpi=dpi)
+    with open(_get_hash_path(job.output_path), 'w') as f:
+        f.write(hash_value)
+    return job.output_path
+
+
+def render_figures(list_of_job, processes=None, preview=False, preview_dpi=30, force=False):
+    """Render figures, skipping those whose inputs haven't changed.
+
+    Args:
+        list_of_job (list of FigureJob): Figures to be rendered.
+        processes (int, optional): Default None. Size of the process pool,
+            None means the amount of CPUs. With 1 process, figures are
+            rendered in the current process.
+        preview (bool, optional): Default false. If true, figures are
+            rendered at preview_dpi.
+        preview_dpi (int, optional): Default 30.
+        force (bool, optional): Default false. If true, figures are rendered
+            even if their inputs haven't changed.
+
+    Returns:
+        A list of paths of the rendered PNGs.
+    """
+    list_of_args = []
+    for job in list_of_job:
+        dpi = preview_dpi if preview else job.dpi
+        hash_value = job.get_input_hash(dpi)
+        hash_path = _get_hash_path(job.output_path)
+        if not force\
+            and os.path.isfile(job.output_path)\
+            and os.path.isfile(hash_path):
+            with open(hash_path, 'r') as f:
+                if f.read() == hash_value:
+                    continue
+        list_of_args.append((job, dpi, hash_value))
+
+    if processes == 1 or len(list_of_args) <= 1:
+        return [_render_one(args) for args in list_of_args]
+
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_render_one, list_of_args, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""This is a module that min-max normalizes data of many demonstrations
+
+Min and max of every column are gathered over all demonstrations of a label or
+a dataset, one demonstration at a time, so that all demonstrations are scaled
+by the same parameters. The parameters can be saved as JSON and loaded back,
+e.g. by online inference, to normalize new data the same way without refitting.
+A key of the data fitted on can be saved along, to tell when a saved scaler is
+stale.
+
+"""
+import json
+import numpy as np
+
+
+class StreamingMinMaxScaler(object):
+    """To scale columns to a range by min and max gathered over many matrices.
+
+    Args:
+        feature_range (tuple, optional): Default (0, 1). Range of the scaled
+            data.
+        columns (list, optional): Default None. Names of the columns, only
+            kept for reference when saved.
+        data_key (str, optional): Default None. Identifies the data the
+            scaler is fitted on, e.g. a hash of it, only kept for reference
+            when saved.
+
+    Examples:
+        >>> scaler = StreamingMinMaxScaler()
+        >>> for mat in list_of_mat:
+        ...     scaler.partial_fit(mat)
+        >>> scaler.save("scaler.json")
+        >>> StreamingMinMaxScaler.load("scaler.json").transform(mat)
+        numpy.ndarray
+
+    """
+
+    def __init__(self, feature_range=(0, 1), columns=None, data_key=None):
+        self.feature_range = tuple(feature_range)
+        self.columns = None if columns is None else list(columns)
+        self.data_key = data_key
+        self.data_min = None
+        self.data_max = None
+        self.n_samples_seen = 0
+
+    def partial_fit(self, mat):
+        """Update min and max of every column with one matrix.
+
+        NaN is ignored.
+
+        Args:
+            mat (numpy.ndarray): Data of shape (n_samples, n_columns).
+
+        Returns:
+            The scaler itself.
+        """
+        mat = np.asarray(mat, dtype=np.float64)
+        if mat.shape[0] == 0:
+            return self
+        mat_min = np.nanmin(mat, axis=0)
+        mat_max = np.nanmax(mat, axis=0)
+        if self.data_min is None:
+            self.data_min = mat_min
+            self.data_max = mat_max
+        else:
+            self.data_min = np.fmin(self.data_min, mat_min)
+            self.data_max = np.fmax(self.data_max, mat_max)
+        self.n_samples_seen += mat.shape[0]
+        return self
+
+    def fit(self, list_of_mat):
+        """Reset, then gather min and max over a list of matrices."""
+        self.data_min = None
+        self.data_max = None
+        self.n_samples_seen = 0
+        for mat in list_of_mat:
+            self.partial_fit(mat)
+        return self
+
+    def _get_scale_and_offset(self):
+        if self.data_min is None:
+            raise ValueError("scaler is not fitted yet")
+        data_range = self.data_max-self.data_min
+        # Constant columns are mapped to the lower end of feature_range
+        data_range[data_range == 0] = 1
+        scale = (self.feature_range[1]-self.feature_range[0])/data_range
+        offset = self.feature_range[0]-self.data_min*scale
+        return scale, offset
+
+    def transform(self, mat):
+        """Scale a matrix.
+
+        Args:
+            mat (numpy.ndarray): Data of shape (n_samples, n_columns).
+
+        Returns:
+            A numpy array of the same shape.
+        """
+        scale, offset = self._get_scale_and_offset()
+        return np.asarray(mat, dtype=np.float64)*scale+offset
+
+    def inverse_transform(self, mat):
+        """Undo transform."""
+        scale, offset = self._get_scale_and_offset()
+        return (np.asarray(mat, dtype=np.float64)-offset)/scale
+
+    def save(self, path):
+        """Save parameters of the scaler as JSON."""
+        with open(path, 'w') as f:
+            json.dump({
+                'feature_range': list(self.feature_range),
+                'columns': self.columns,
+                'data_key': self.data_key,
+                'data_min': None if self.data_min is None else self.data_min.tolist(),
+                'data_max': None if self.data_max is None else self.data_max.tolist(),
+                'n_samples_seen': self.n_samples_seen,
+            }, f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        """Load a scaler saved by save."""
+        with open(path, 'r') as f:
+            params = json.load(f)
+        scaler = cls(
+            params['feature_range'],
+            params['columns'],
+            params.get('data_key'),
+        )
+        if params['data_min'] is not None:
+            scaler.data_min = np.array(params['data_min'], dtype=np.float64)
+            scaler.data_max = np.array(params['data_max'], dtype=np.float64)
+        scaler.n_samples_seen = params['n_samples_seen']
+        return scaler
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""This is a module that runs steps of a workflow make-style
+
+A workflow is a Pipeline of Stages. A Stage declares the files and folders it
+reads and writes, its parameters and the stages it runs after. When the
+pipeline runs, a stage is skipped if its outputs exist and the hash of its
+inputs, i.e. the sizes and modification times of its input files, its
+parameters and the hashes of the stages before it, is the one kept in its
+stamp file since it last finished.
+
+Stages run in one process, one after another, and each gets the results of
+the stages before it in memory, so a stage doesn't have to parse again what
+the stage before it has just written. If a stage before it was skipped, its
+result is got from its outputs by its load function, or is None.
+
+"""
+import os
+import json
+import time
+import hashlib
+import pickle
+
+
+class StageNotFound(Exception): pass
+class CyclicStages(Exception): pass
+
+
+def _walk_files(path):
+    if not os.path.isdir(path):
+        return [path]
+    list_of_path = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            list_of_path.append(os.path.join(dirpath, filename))
+    return list_of_path
+
+
+class Stage(object):
+    """A step of a Pipeline.
+
+    Args:
+        name (str): Name of the stage, also the name of its stamp file.
+        func: func(results, **params), where results is a dict of stage
+            name to result of the stages in after. What it returns is the
+            result of this stage.
+        input_paths (list, optional): Default None. Files and folders func
+            reads. Files in folders are walked.
+        output_paths (list, optional): Default None. Files and folders func
+            writes. The stage is run if any of them is missing.
+        after (list of str, optional): Default None. Names of the stages to
+            run before this one.
+        load (optional): Default None. load(**params), to get the result
+            from output_paths when the stage is skipped.
+        **params: Keyword arguments of func, which should be picklable.
+
+    Examples:
+        >>> Stage(
+        ...     'cook_anomalies',
+        ...     cook_anomalies,
+        ...     input_paths=[resampled_anomalies_dir],
+        ...     output_paths=[dataset_dir],
+        ...     after=['extract'],
+        ...     mode='hardlink',
+        ... )
+
+    """
+
+    def __init__(
+        self,
+        name,
+        func,
+        input_paths=None,
+        output_paths=None,
+        after=None,
+        load=None,
+        **params
+    ):
+        self.name = name
+        self.func = func
+        self.input_paths = [] if input_paths is None else list(input_paths)
+        self.output_paths = [] if output_paths is None else list(output_paths)
+        self.after = [] if after is None else list(after)
+        self.load = load
+        self.params = params
+
+    def get_input_hash(self, list_of_upstream_hash):
+        """Get the hash of everything the outputs depend on."""
+        h = hashlib.md5()
+        h.update(('%s.%s'%(self.func.__module__, self.func.__name__)).encode('utf-8'))
+        for key in sorted(self.params):
+            h.update(key.encode('utf-8'))
+            h.update(pickle.dumps(self.params[key], 2))
+        for upstream_hash in list_of_upstream_hash:
+            h.update(upstream_hash.encode('utf-8'))
+        for input_path in self.input_paths:
+            if not os.path.exists(input_path):
+                h.update(('%s:missing'%(input_path,)).encode('utf-8'))
+                continue
+            for path in _walk_files(input_path):
+                stat = os.stat(path)
+                h.update(('%s:%s:%s'%(path, stat.st_size, stat.st_mtime)).encode('utf-8'))
+        return h.hexdigest()
+
+
+class Pipeline(object):
+    """To run stages in order, skipping the ones whose inputs are unchanged.
+
+    Args:
+        stamp_dir (str): The folder to keep a stamp file per stage in.
+
+    Examples:
+        >>> pipeline = Pipeline("/path_to_data_set/pipeline_stamp_dir")
+        >>> pipeline.add(Stage('extract', extract, input_paths=[...], output_paths=[...]))
+        >>> pipeline.add(Stage('cook_anomalies', cook_anomalies, after=['extract'], ...))
+        >>> pipeline.run()
+        ['extract', 'cook_anomalies']
+        >>> pipeline.run()  # Nothing changed
+        []
+
+    """
+
+    def __init__(self, stamp_dir):
+        self.stamp_dir = stamp_dir
+        self.stages = {}
+        self.results = {}
+        self._list_of_name = []
+
+    def add(self, stage):
+        """Add a stage, and return it."""
+        self.stages[stage.name] = stage
+        self._list_of_name.append(stage.name)
+        return stage
+
+    def get_order(self, targets=None):
+        """Get names of stages to run for targets, each after the stages
+        it runs after.
+
+        Args:
+            targets (list of str, optional): Default None, all stages.
+
+        Raises:
+            StageNotFound
+            CyclicStages
+        """
+        if targets is None:
+            targets = self._list_of_name
+        order = []
+        state = {}
+
+        def visit(name):
+            if name not in self.stages:
+                raise StageNotFound("stage name: %s"%name)
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise CyclicStages("stage name: %s"%name)
+            state[name] = 'visiting'
+            for upstream_name in self.stages[name].after:
+                visit(upstream_name)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in targets:
+            visit(name)
+        return order
+
+    def _get_stamp_path(self, name):
+        return os.path.join(self.stamp_dir, name+'.json')
+
+    def _read_stamp(self, name):
+        stamp_path = self._get_stamp_path(name)
+        if not os.path.isfile(stamp_path):
+            return None
+        with open(stamp_path, 'r') as f:
+            return json.load(f)
+
+    def _write_stamp(self, name, input_hash, secs):
+        stamp_path = self._get_stamp_path(name)
+        with open(stamp_path+'.tmp', 'w') as f:
+            json.dump({
+                'input_hash': input_hash,
+                'finished': time.time(),
+                'secs': secs,
+            }, f, indent=4, sort_keys=True)
+        os.rename(stamp_path+'.tmp', stamp_path)
+
+    def is_up_to_date(self, name, input_hash):
+        """Tell if a stage has finished with these inputs and its outputs
+        are still there."""
+        stamp = self._read_stamp(name)
+        if stamp is None or stamp['input_hash'] != input_hash:
+            return False
+        return all(os.path.exists(path) for path in self.stages[name].output_paths)
+
+    def _get_result(self, name):
+        if name not in self.results:
+            stage = self.stages[name]
+            self.results[name] = None if stage.load is None else stage.load(**stage.params)
+        return self.results[name]
+
+    def run(self, targets=None, force=False, logger=None):
+        """Run stages of targets whose inputs have changed.
+
+        Args:
+            targets (list of str, optional): Default None, all stages.
+            force (bool, optional): Default false. If true, stages are run
+                even if their inputs haven't changed.
+            logger (logging.Logger, optional): Default None. If given, tells
+                which stages are run or skipped.
+
+        Returns:
+            A list of names of the stages run.
+        """
+        from timeit import default_timer
+
+        if not os.path.isdir(self.stamp_dir):
+            os.makedirs(self.stamp_dir)
+
+        hash_by_name = {}
+        list_of_run = []
+        for name in self.get_order(targets):
+            stage = self.stages[name]
+            input_hash = stage.get_input_hash(
+                [hash_by_name[upstream_name] for upstream_name in stage.after]
+            )
+            hash_by_name[name] = input_hash
+            if not force and self.is_up_to_date(name, input_hash):
+                if logger is not None:
+                    logger.info("skipping stage %s, inputs unchanged."%(name,))
+                continue
+
+            if logger is not None:
+                logger.info("running stage %s."%(name,))
+            results = dict(
+                (upstream_name, self._get_result(upstream_name))
+                for upstream_name in stage.after
+            )
+            start = default_timer()
+            self.results[name] = stage.func(results, **stage.params)
+            # Outputs of this stage are inputs of the stages after it, so
+            # their hashes are taken after it has run
+            self._write_stamp(name, input_hash, default_timer()-start)
+            list_of_run.append(name)
+        return list_of_run
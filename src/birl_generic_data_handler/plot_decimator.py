@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""This is a module that decimates series before they are plotted
+
+A plotted line can't show more detail than the pixels it is drawn on, so a long
+trial is reduced to a few points per pixel column before it reaches matplotlib.
+The series is split into buckets, about one per pixel column, and the min and
+max of every bucket are kept, so spikes, e.g. those of anomalies, stay visible
+however long the trial is. Indices that must not be dropped, e.g. anomalous
+moments, can be forced in. Only lines without markers are decimated this way,
+as every marker is drawn on its own.
+
+Arrays are passed to matplotlib as they are, without going through python
+lists.
+
+"""
+import re
+import numpy as np
+
+# Marker characters of matplotlib format strings, e.g. 'ro' or 'k.-'
+FMT_MARKERS = '.,ov^<>1234sp*hH+xDd|_P8X'
+
+
+def get_pixel_width(ax, dpi=None):
+    """Get the width of an axes in pixels, at the current size of its figure.
+
+    Args:
+        ax: A matplotlib axes.
+        dpi (int, optional): Default None, which means the dpi of the figure.
+            Pass the dpi given to savefig if it differs.
+    """
+    width = ax.get_window_extent().width
+    if dpi is not None:
+        width *= float(dpi)/ax.figure.dpi
+    return max(int(width), 1)
+
+
+def get_decimated_index(values, n_buckets, keep_index=None):
+    """Get indices of the min and max of every bucket of a series.
+
+    NaN is ignored. The first and last indices are always kept.
+
+    Args:
+        values (numpy.ndarray): A series of shape (n,), or series of shape
+            (n, k) whose kept indices are merged.
+        n_buckets (int): Amount of buckets. A series with no more than
+            2*n_buckets samples is kept as it is.
+        keep_index (array-like, optional): Default None. Indices that are
+            always kept.
+
+    Returns:
+        A sorted numpy array of indices.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    length = values.shape[0]
+    n_buckets = max(int(n_buckets), 1)
+    if length <= 2*n_buckets:
+        return np.arange(length)
+
+    bucket_size = -(-length//n_buckets)
+    n_buckets = -(-length//bucket_size)
+    padded = np.full((n_buckets*bucket_size, values.shape[1]), np.nan)
+    padded[:length] = values
+    padded = padded.reshape(n_buckets, bucket_size, values.shape[1])
+    nan_mask = np.isnan(padded)
+    offsets = (np.arange(n_buckets)*bucket_size).reshape(-1, 1)
+    argmin = np.where(nan_mask, np.inf, padded).argmin(axis=1)+offsets
+    argmax = np.where(nan_mask, -np.inf, padded).argmax(axis=1)+offsets
+
+    list_of_index = [argmin.ravel(), argmax.ravel(), [0, length-1]]
+    if keep_index is not None:
+        list_of_index.append(np.asarray(keep_index, dtype=np.int64).ravel())
+    index = np.unique(np.concatenate(list_of_index).astype(np.int64))
+    # All-NaN buckets of the padding point past the end
+    return index[(index >= 0) & (index < length)]
+
+
+def decimate(x, y, n_buckets, keep_index=None):
+    """Decimate a series by the min and max of y in every bucket.
+
+    Args:
+        x (array-like): Shape (n,), e.g. time.
+        y (array-like): Shape (n,) or (n, k).
+        n_buckets (int): Amount of buckets, about the pixel width of the plot.
+        keep_index (array-like, optional): Default None. Indices that are
+            always kept.
+
+    Returns:
+        Decimated x and y, as numpy arrays.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    index = get_decimated_index(y, n_buckets, keep_index)
+    return x[index], y[index]
+
+
+def _is_fmt(arg):
+    return isinstance(arg, (str, type(u'')))
+
+
+def _has_marker(list_of_fmt, kwargs):
+    if kwargs.get('marker') not in (None, '', ' ', 'None', 'none'):
+        return True
+    for fmt in list_of_fmt:
+        # Drop colors of the cycle, e.g. 'C1', and line styles with dots
+        # first, as their characters are markers otherwise
+        if any(c in FMT_MARKERS for c in re.sub(r'C[0-9]|--|-\.', '', fmt)):
+            return True
+    return False
+
+
+def plot_decimated(ax, *args, **kwargs):
+    """Plot decimated series on an axes, like ax.plot(x, y) or ax.plot(x, y, z).
+
+    For a 2-D plot, buckets are decimated by y. For a 3-D plot, they are
+    decimated by all of x, y and z. Lines with markers, set by marker or by
+    a format string like 'o-', and markers without line, i.e. linestyle
+    'None', are plotted as they are, since decimating them would drop
+    points that are drawn.
+
+    Args:
+        ax: A matplotlib axes.
+        *args: Arrays of the same length, e.g. pandas.Series, and optionally
+            a format string like 'r-', passed on as it is.
+        n_buckets (int, optional): Default None, which means the pixel width
+            of ax.
+        dpi (int, optional): Default None. The dpi the figure is saved at, to
+            get the pixel width of ax with.
+        keep_index (array-like, optional): Default None. Indices that are
+            always kept.
+        **kwargs: Other keyword arguments of ax.plot.
+
+    Returns:
+        What ax.plot returns.
+    """
+    n_buckets = kwargs.pop('n_buckets', None)
+    keep_index = kwargs.pop('keep_index', None)
+    dpi = kwargs.pop('dpi', None)
+    if n_buckets is None:
+        n_buckets = get_pixel_width(ax, dpi)
+    args = [arg if _is_fmt(arg) else np.asarray(arg) for arg in args]
+    list_of_fmt = [arg for arg in args if _is_fmt(arg)]
+    list_of_arr = [arg for arg in args if not _is_fmt(arg)]
+    if _has_marker(list_of_fmt, kwargs)\
+        or kwargs.get('linestyle', kwargs.get('ls')) in ('None', 'none', ' ', ''):
+        return ax.plot(*args, **kwargs)
+    if len(list_of_arr) == 2:
+        values = list_of_arr[1]
+    else:
+        values = np.column_stack(list_of_arr)
+    index = get_decimated_index(values, n_buckets, keep_index)
+    return ax.plot(*[arg if _is_fmt(arg) else arg[index] for arg in args], **kwargs)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""This is a module that maps functions over process pools
+
+DTW, trial processing and rosbag decoding all spread independent calls over a
+pool of processes the same way, by pool_map, which falls back to the current
+process when a pool can't help, e.g. with 1 process or a single call.
+
+"""
+
+
+def pool_map(func, list_of_args, processes=None):
+    """Map func over list_of_args in a process pool.
+
+    Args:
+        func: A module-level function, so that it can be pickled.
+        list_of_args (list): Arguments, one call each.
+        processes (int, optional): Default None. Size of the process pool,
+            None means the amount of CPUs. With 1 process, or a single
+            call, func runs in the current process.
+
+    Returns:
+        A list of results in the order of list_of_args.
+    """
+    if processes == 1 or len(list_of_args) <= 1:
+        return [func(args) for args in list_of_args]
+
+    import multiprocessing
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(func, list_of_args)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""This is a module that run-length encodes a column of CSV
+
+A column like \".tag\" of a trial CSV holds long runs of the same value, e.g.
+the state of the state machine at each timestep. Many procedures only care
+about where each run starts and ends, e.g. slicing out LfD segments or coloring
+the background of a plot by state. This module finds all runs at once with
+numpy instead of walking the column row by row.
+
+"""
+import numpy as np
+
+
+def run_length_encode(values):
+    """Find contiguous runs of equal values.
+
+    Args:
+        values (array-like): A 1-d sequence, e.g. tag_df['.tag'].values.
+
+    Returns:
+        A (run_values, run_starts, run_ends) tuple of numpy arrays. The i-th run
+        has value run_values[i] and covers positions run_starts[i] up to but
+        not including run_ends[i].
+
+    Examples:
+        >>> run_length_encode([1, 1, -3, -3, -3, 0])
+        (array([ 1, -3,  0]), array([0, 2, 5]), array([2, 5, 6]))
+    """
+    values = np.asarray(values)
+    if values.shape[0] == 0:
+        empty = np.array([], dtype=np.intp)
+        return values[:0], empty, empty
+
+    change_mask = values[1:] != values[:-1]
+    run_ends = np.append(np.flatnonzero(change_mask)+1, values.shape[0])
+    run_starts = np.append(0, run_ends[:-1])
+    return values[run_starts], run_starts, run_ends
+
+
+def get_runs_of_each_value(values):
+    """Group contiguous runs by their value.
+
+    Args:
+        values (array-like): A 1-d sequence, e.g. tag_df['.tag'].values.
+
+    Returns:
+        A dict mapping every value found to a (run_starts, run_ends) tuple of
+        numpy arrays, with the same meaning as in run_length_encode.
+
+    Examples:
+        >>> get_runs_of_each_value([1, 1, -3, -3, 1])
+        {1: (array([0, 4]), array([2, 5])), -3: (array([2]), array([4]))}
+    """
+    run_values, run_starts, run_ends = run_length_encode(values)
+    ret = {}
+    for value in np.unique(run_values):
+        mask = run_values == value
+        ret[value.item()] = (run_starts[mask], run_ends[mask])
+    return ret
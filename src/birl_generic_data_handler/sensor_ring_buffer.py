@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""This is a module that keeps the latest samples of a sensor in a ring buffer
+
+Appending messages to a pandas.Dataframe copies it every time, which is too
+slow at sensor rates. SensorRingBuffer keeps a fixed amount of the latest
+timestamped samples in preallocated numpy arrays instead, and appending a
+sample costs O(1).
+
+Every sample is written twice, at its slot and at its slot+capacity, into
+arrays of 2*capacity rows. The latest samples are then always contiguous, so
+the whole buffer or any time range of it is returned as a view without
+copying, and found by numpy.searchsorted on the times.
+
+"""
+import numpy as np
+
+
+class SensorRingBuffer(object):
+    """A fixed-capacity ring buffer of timestamped multichannel samples.
+
+    Samples must be appended in time order. Once the buffer is full,
+    appending a sample drops the oldest one.
+
+    Views returned by times, data and window are not copies, and may be
+    overwritten by later appends. Copy them to keep them.
+
+    Args:
+        capacity (int): Max amount of samples kept.
+        n_channels (int): Amount of values of a sample.
+
+    Examples:
+        >>> buf = SensorRingBuffer(1000, 6)
+        >>> for t, msg in stream:
+        ...     buf.append(t, wrench_of(msg))
+        >>> time_view, data_view = buf.window(t-4, t)
+        >>> buf.resample(get_resample_time_index(t-4, t, 10))
+        array of shape (40, 6)
+
+    """
+
+    __slots__ = ('capacity', 'n_channels', '_time', '_data', '_end', '_size')
+
+    def __init__(self, capacity, n_channels):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.n_channels = int(n_channels)
+        self._time = np.empty(2*self.capacity, dtype=np.float64)
+        self._data = np.empty((2*self.capacity, self.n_channels), dtype=np.float64)
+        # Slot the next sample is written at, and amount of samples kept
+        self._end = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def is_full(self):
+        return self._size == self.capacity
+
+    def append(self, time, values):
+        """Append a sample.
+
+        Args:
+            time (float): Time of the sample, no earlier than the last one.
+            values (array-like): n_channels values.
+        """
+        end = self._end
+        self._time[end] = self._time[end+self.capacity] = time
+        self._data[end] = self._data[end+self.capacity] = values
+        self._end = end+1 if end+1 != self.capacity else 0
+        if self._size != self.capacity:
+            self._size += 1
+
+    @property
+    def times(self):
+        """Times of the samples kept, oldest first, as a view."""
+        stop = self._end+self.capacity
+        return self._time[stop-self._size:stop]
+
+    @property
+    def data(self):
+        """Samples kept, oldest first, as a view of shape (len, n_channels)."""
+        stop = self._end+self.capacity
+        return self._data[stop-self._size:stop]
+
+    def window(self, start_time, end_time):
+        """Get samples within [start_time, end_time].
+
+        Returns:
+            A (times, data) tuple of views.
+        """
+        start = self._end+self.capacity-self._size
+        times = self.times
+        stop = start+times.searchsorted(end_time, side='right')
+        start += times.searchsorted(start_time, side='left')
+        return self._time[start:stop], self._data[start:stop]
+
+    def discard_before(self, time):
+        """Drop samples earlier than time."""
+        self._size -= self.times.searchsorted(time, side='left')
+
+    def clear(self):
+        """Drop all samples."""
+        self._size = 0
+
+    def reserve(self, capacity):
+        """Change the capacity, keeping the latest samples that fit."""
+        times = self.times[-capacity:].copy()
+        data = self.data[-capacity:].copy()
+        self.__init__(capacity, self.n_channels)
+        n = len(times)
+        self._time[:n] = self._time[self.capacity:self.capacity+n] = times
+        self._data[:n] = self._data[self.capacity:self.capacity+n] = data
+        self._end = n if n != self.capacity else 0
+        self._size = n
+
+    def resample(self, new_time, start_time=None, end_time=None):
+        """Resample samples within [start_time, end_time] by resample_segments.
+
+        Args:
+            new_time (array-like): Timestamps to resample at.
+            start_time (float, optional): Default None, the oldest sample.
+            end_time (float, optional): Default None, the latest sample.
+
+        Returns:
+            A numpy array of shape (len(new_time), n_channels).
+        """
+        from birl_generic_data_handler.csv_handler import resample_segments
+
+        if start_time is None and end_time is None:
+            times, data = self.times, self.data
+        else:
+            times, data = self.window(
+                -np.inf if start_time is None else start_time,
+                np.inf if end_time is None else end_time,
+            )
+        return resample_segments([times], [data], [new_time])[0]
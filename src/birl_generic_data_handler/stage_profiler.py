@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""This is a module that records where the time of a batch run goes
+
+RosbagHandler, RosbagAnomalyExtractor and CsvHandler take an optional
+profiler. Given a StageProfiler, they record, for every bag and every stage,
+e.g. bag indexing, message decoding, CSV writing, time parsing or
+resampling, the wall and CPU time spent, the bytes read and written, the
+messages processed and the cache hits and misses.
+
+Stages are timed, not sampled, and only a few timer calls are made per stage,
+so a StageProfiler is cheap enough to leave on in batch runs. Without a
+profiler, the handlers record into NULL_PROFILER, which does nothing.
+
+"""
+from contextlib import contextmanager
+from timeit import default_timer
+import time as _time
+
+try:
+    _cpu_timer = _time.process_time
+except AttributeError:
+    _cpu_timer = _time.clock
+
+FIELDS = (
+    'calls',
+    'wall_secs',
+    'cpu_secs',
+    'messages',
+    'bytes_read',
+    'bytes_written',
+    'cache_hits',
+    'cache_misses',
+)
+
+# Bag of stages recorded outside of StageProfiler.bag
+NO_BAG = ''
+
+
+class StageProfiler(object):
+    """To record per-bag, per-stage costs of a batch run.
+
+    Examples:
+        >>> profiler = StageProfiler()
+        >>> rae = RosbagAnomalyExtractor("/path_to_data_set", profiler=profiler)
+        >>> rae.get_anomaly_csv("/tag_multimodal", "/anomaly_detection_signal", 4, 10)
+        >>> print(profiler.format_summary())
+        bag        stage      calls  wall_secs  cpu_secs ...
+        s01.bag    bag_index      2      0.013     0.012 ...
+        ...
+
+        Recording a stage of your own:
+
+        >>> with profiler.bag(bag_path):
+        ...     with profiler.stage('classify') as record:
+        ...         classify(list_of_df)
+        ...         record['messages'] += len(list_of_df)
+
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._bag = NO_BAG
+
+    @contextmanager
+    def bag(self, bag_path):
+        """Attribute stages recorded in this context to bag_path."""
+        last_bag = self._bag
+        self._bag = bag_path
+        try:
+            yield
+        finally:
+            self._bag = last_bag
+
+    def get_record(self, stage_name):
+        """Get the record of a stage of the current bag, a dict of FIELDS."""
+        key = (self._bag, stage_name)
+        record = self._records.get(key)
+        if record is None:
+            record = dict.fromkeys(FIELDS, 0)
+            self._records[key] = record
+        return record
+
+    @contextmanager
+    def stage(self, stage_name):
+        """Time a stage, and yield its record to add counts to."""
+        record = self.get_record(stage_name)
+        wall_start = default_timer()
+        cpu_start = _cpu_timer()
+        try:
+            yield record
+        finally:
+            record['wall_secs'] += default_timer()-wall_start
+            record['cpu_secs'] += _cpu_timer()-cpu_start
+            record['calls'] += 1
+
+    def add(self, stage_name, **kwargs):
+        """Add to fields of a stage, e.g. add('csv_read', bytes_read=1024)."""
+        record = self.get_record(stage_name)
+        for key, value in kwargs.items():
+            record[key] += value
+
+    def cache(self, stage_name, hit):
+        """Count a cache hit, or a cache miss, of a stage."""
+        self.add(stage_name, **{'cache_hits' if hit else 'cache_misses': 1})
+
+    def get_summary(self):
+        """Get the records.
+
+        Returns:
+            A dict with \"bags\", a dict of bag path to a dict of stage name
+            to record, and \"total\", a dict of stage name to the record
+            summed over bags.
+        """
+        summary = {'bags': {}, 'total': {}}
+        for (bag_path, stage_name), record in sorted(self._records.items()):
+            summary['bags'].setdefault(bag_path, {})[stage_name] = dict(record)
+            total = summary['total'].setdefault(stage_name, dict.fromkeys(FIELDS, 0))
+            for key in FIELDS:
+                total[key] += record[key]
+        return summary
+
+    def format_summary(self):
+        """Format the records as a table, one row per bag and stage."""
+        rows = [['bag', 'stage']+list(FIELDS)]
+        summary = self.get_summary()
+        list_of_bag_and_stages = [
+            (bag_path, summary['bags'][bag_path]) for bag_path in sorted(summary['bags'])
+        ]+[('total', summary['total'])]
+        for bag_path, stages in list_of_bag_and_stages:
+            for stage_name in sorted(stages):
+                record = stages[stage_name]
+                rows.append([bag_path, stage_name]+[
+                    '%.3f'%record[key] if key.endswith('_secs') else str(record[key])
+                    for key in FIELDS
+                ])
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return '\n'.join(
+            '  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+            for row in rows
+        )
+
+    def save(self, json_path):
+        """Write the summary as JSON."""
+        import json
+        with open(json_path, 'w') as f:
+            json.dump(self.get_summary(), f, indent=4, sort_keys=True)
+
+
+class _NullRecord(object):
+    def __getitem__(self, key):
+        return 0
+
+    def __setitem__(self, key, value):
+        pass
+
+
+class NullProfiler(object):
+    """A profiler that records nothing, used when no profiler is given."""
+
+    _record = _NullRecord()
+
+    @contextmanager
+    def bag(self, bag_path):
+        yield
+
+    def get_record(self, stage_name):
+        return self._record
+
+    @contextmanager
+    def stage(self, stage_name):
+        yield self._record
+
+    def add(self, stage_name, **kwargs):
+        pass
+
+    def cache(self, stage_name, hit):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def get_profiler(profiler):
+    """Get profiler, or NULL_PROFILER if it is None."""
+    return NULL_PROFILER if profiler is None else profiler
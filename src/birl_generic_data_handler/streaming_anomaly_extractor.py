@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""This is a module that extracts anomaly windows from live sensor streams
+
+CsvHandler.extract_anomaly_data needs the whole trial before it can extract
+anything. StreamingAnomalyExtractor consumes samples and flags one at a time,
+as they arrive, and emits each anomaly window as soon as its trailing half has
+arrived, resampled the same way as offline windows.
+
+Anomalies are found by the rule of the offline pipeline: the first flag starts
+an anomaly, and so does every flag that comes more than 2 seconds after the
+flag before it. Samples are buffered in a SensorRingBuffer, which only grows
+to hold the last window+1 seconds of them, so memory stays bounded however long
+the stream is, and adding a sample or a flag costs amortized O(1), except when
+a window is emitted. Windows are resampled from views of the buffer, without copying it.
+
+"""
+from collections import deque
+from birl_generic_data_handler.sensor_ring_buffer import SensorRingBuffer
+
+# A flag this long after the last one starts a new anomaly
+ANOMALY_GAP_IN_SEC = 2
+
+
+class StreamingAnomalyExtractor(object):
+    """To extract anomaly windows from a stream of samples and flags.
+
+    Times are in seconds, on the same clock for samples and flags, and
+    samples must come in time order. A flag may come before or after the
+    samples around it, as long as samples of its window are still buffered.
+
+    Args:
+        anomaly_window_size_in_sec: Time length of an anomaly.
+        anomaly_resample_hz: Rate of resampling for anomaly data.
+        columns (list of str): Names of the values of a sample.
+        capacity (int, optional): Default 1024. Initial amount of samples
+            buffered. The buffer doubles whenever window+1 seconds of
+            samples don't fit in it.
+
+    Examples:
+        >>> sae = StreamingAnomalyExtractor(4, 10, columns)
+        >>> for topic, msg, t in stream:
+        ...     if topic == '/anomaly_detection_signal':
+        ...         windows = sae.add_flag(t)
+        ...     else:
+        ...         windows = sae.add_sample(t, values_of(msg))
+        ...     for anomaly_t, df in windows:
+        ...         classify(df)
+        >>> sae.flush()
+        [(anomaly_t, pandas.DataFrame), ...]
+
+    """
+
+    def __init__(
+        self,
+        anomaly_window_size_in_sec,
+        anomaly_resample_hz,
+        columns,
+        capacity=1024,
+    ):
+        self.anomaly_window_size_in_sec = anomaly_window_size_in_sec
+        self.anomaly_resample_hz = anomaly_resample_hz
+        self.columns = list(columns)
+
+        # Same row count as offline windows, whatever the onset
+        self._window_len = int(anomaly_window_size_in_sec*anomaly_resample_hz)
+        # Samples older than latest time-buffer_secs are never needed again
+        self._buffer_secs = anomaly_window_size_in_sec+1
+        self._buffer = SensorRingBuffer(capacity, len(self.columns))
+        self._latest_time = None
+        self._last_flag_time = None
+        self._pending_anomaly_times = deque()
+
+    def add_sample(self, time, values):
+        """Add a sample.
+
+        Args:
+            time (float): Time of the sample.
+            values (array-like): Values of the sample, in the order of columns.
+
+        Returns:
+            A list of (anomaly time, pandas.Dataframe) tuples, anomaly windows
+            completed by this sample.
+        """
+        buf = self._buffer
+        oldest_time = time-self._buffer_secs
+        if buf.is_full():
+            if buf.times[0] < oldest_time:
+                buf.discard_before(oldest_time)
+            else:
+                buf.reserve(2*buf.capacity)
+        buf.append(time, values)
+        self._latest_time = time
+        return self._emit(flush=False)
+
+    def add_flag(self, time):
+        """Add an anomaly flag.
+
+        Args:
+            time (float): Time of the flag.
+
+        Returns:
+            A list of (anomaly time, pandas.Dataframe) tuples, anomaly windows
+            completed by this flag, if its window has arrived already.
+        """
+        if self._last_flag_time is None\
+            or time-self._last_flag_time > ANOMALY_GAP_IN_SEC:
+            self._pending_anomaly_times.append(time)
+        self._last_flag_time = time
+        return self._emit(flush=False)
+
+    def flush(self):
+        """Emit every pending anomaly window, e.g. at the end of a trial.
+
+        Windows whose trailing half hasn't arrived are padded with the last
+        sample.
+
+        Returns:
+            A list of (anomaly time, pandas.Dataframe) tuples.
+        """
+        return self._emit(flush=True)
+
+    def _emit(self, flush):
+        ret = []
+        half_window = self.anomaly_window_size_in_sec/2.0
+        while len(self._pending_anomaly_times) != 0 and len(self._buffer) != 0:
+            anomaly_t = self._pending_anomaly_times[0]
+            if not flush and self._latest_time < anomaly_t+half_window:
+                break
+            self._pending_anomaly_times.popleft()
+            ret.append((anomaly_t, self._get_window(anomaly_t)))
+        return ret
+
+    def _get_window(self, anomaly_t):
+        import numpy as np
+        import pandas as pd
+
+        half_window = self.anomaly_window_size_in_sec/2.0
+        new_time = np.linspace(
+            anomaly_t-half_window,
+            anomaly_t+half_window,
+            self._window_len,
+        )
+        # keep 1 more sec each side for interpolation
+        resampled = self._buffer.resample(
+            new_time,
+            anomaly_t-half_window-1,
+            anomaly_t+half_window+1,
+        )
+        return pd.DataFrame(
+            resampled,
+            index=pd.Index(new_time, name='time'),
+            columns=self.columns,
+        )
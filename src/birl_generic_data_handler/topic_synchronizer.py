@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""This is a module that joins CSVs of topics recorded at different rates
+
+Topics of a rosbag are published at their own rates, e.g. /tag_multimodal at
+100Hz, a wrench topic at 200Hz and /anomaly_detection_signal only when an
+anomaly is flagged. To use them together, e.g. as one multimodal frame, each
+topic is joined \"as of\" a common clock: every tick of the clock takes the
+last sample of the topic at or before it (previous), the sample closest to
+it (nearest), or the line between the two samples around it (linear).
+Samples farther from a tick than a tolerance are not matched and leave NaN.
+
+Every topic is matched to all ticks by one numpy.searchsorted call, i.e. in
+O(M log N) for M ticks and N samples, in C, so no Python loop runs per row
+or per tick.
+
+Times are handled as float seconds since a common origin, the first tick,
+which is subtracted in integer nanoseconds first. Float seconds since epoch
+are only precise to about a quarter of a microsecond, which would show in
+the ticks and in interpolated values.
+
+"""
+import numpy as np
+
+METHODS = ('previous', 'nearest', 'linear')
+
+
+def get_time_in_secs(time, origin=None):
+    """Convert a \"time\" column to float seconds since an origin.
+
+    Args:
+        time (array-like): Numeric seconds, datetime64, or strings in the
+            format tuned_rosbag_to_csv writes.
+        origin (int, optional): Default None, the first time if it isn't
+            numeric, otherwise 0. In integer nanoseconds since epoch, which
+            numeric seconds are taken to be since too.
+
+    Returns:
+        A (secs, is_datetime, origin) tuple, secs is a float numpy array and
+        is_datetime tells if time wasn't numeric, so that secs can be turned
+        back by get_time_from_secs.
+    """
+    import pandas as pd
+    from birl_generic_data_handler.csv_handler import _parse_time
+
+    time = _parse_time(pd.Series(time))
+    if np.issubdtype(time.dtype, np.datetime64):
+        nsecs = time.astype('datetime64[ns]').astype(np.int64)
+        if origin is None:
+            origin = int(nsecs[0]) if nsecs.shape[0] != 0 else 0
+        return (nsecs-np.int64(origin))/1e9, True, origin
+    if origin is None:
+        origin = 0
+    return time.astype(float)-origin/1e9, False, origin
+
+
+def get_time_from_secs(secs, is_datetime, origin=0):
+    """Undo get_time_in_secs."""
+    secs = np.asarray(secs, dtype=float)
+    if not is_datetime:
+        return secs+origin/1e9
+    return (np.round(secs*1e9).astype(np.int64)+np.int64(origin)).astype('datetime64[ns]')
+
+
+def get_asof_index(clock, times, method='previous', tolerance=None):
+    """Find the sample of a topic each tick of a clock takes.
+
+    Args:
+        clock (array-like): Ticks in seconds.
+        times (array-like): Times of samples of the topic in seconds, sorted.
+        method (str, optional): Default 'previous'. 'previous' takes the last
+            sample at or before a tick, 'nearest' the closest one, preferring
+            the earlier one on ties.
+        tolerance (float, optional): Default None, no limit. Samples farther
+            than this many seconds from a tick are not taken.
+
+    Returns:
+        An int numpy array of indices into times, -1 for ticks that take no
+        sample.
+
+    Examples:
+        >>> get_asof_index([0.5, 1.0, 2.9], [1.0, 2.0, 3.0])
+        array([-1,  0,  1])
+        >>> get_asof_index([0.5, 1.0, 2.9], [1.0, 2.0, 3.0], 'nearest', 0.2)
+        array([-1,  0,  2])
+    """
+    clock = np.asarray(clock, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if times.shape[0] == 0:
+        return np.full(clock.shape[0], -1, dtype=np.intp)
+
+    after = np.searchsorted(times, clock, side='right')
+    before = after-1
+    if method == 'previous':
+        idx = before
+    elif method == 'nearest':
+        idx = before.copy()
+        last = times.shape[0]-1
+        use_after = (after <= last) & (
+            (before < 0)
+            | (times[np.minimum(after, last)]-clock < clock-times[np.maximum(before, 0)])
+        )
+        idx[use_after] = after[use_after]
+    else:
+        raise ValueError("method should be previous or nearest, got %s"%(method,))
+
+    valid = idx >= 0
+    if tolerance is not None:
+        valid &= np.abs(clock-times[np.maximum(idx, 0)]) <= tolerance
+    idx[~valid] = -1
+    return idx
+
+
+def get_linear_weights(clock, times, tolerance=None):
+    """Find the two samples of a topic around each tick of a clock.
+
+    Args:
+        clock (array-like): Ticks in seconds.
+        times (array-like): Times of samples of the topic in seconds, sorted.
+        tolerance (float, optional): Default None, no limit. Ticks whose
+            samples around are farther than this many seconds are not
+            interpolated.
+
+    Returns:
+        A (before, after, weight, valid) tuple of numpy arrays. The value at
+        tick i is value[before[i]]*(1-weight[i])+value[after[i]]*weight[i]
+        where valid[i] is true. Ticks outside of times aren't valid.
+    """
+    clock = np.asarray(clock, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if times.shape[0] == 0:
+        zeros = np.zeros(clock.shape[0], dtype=np.intp)
+        return zeros, zeros, zeros.astype(float), zeros.astype(bool)
+
+    last = times.shape[0]-1
+    before = np.searchsorted(times, clock, side='right')-1
+    after = before+1
+    # A tick on a sample takes it alone, so the last sample is reachable
+    on_sample = (before >= 0) & (times[np.maximum(before, 0)] == clock)
+    after[on_sample] = before[on_sample]
+    valid = (before >= 0) & (after <= last)
+    before = np.clip(before, 0, last)
+    after = np.clip(after, 0, last)
+
+    gap = times[after]-times[before]
+    weight = np.zeros(clock.shape[0])
+    np.divide(clock-times[before], gap, out=weight, where=gap > 0)
+    if tolerance is not None:
+        valid &= (clock-times[before] <= tolerance) & (times[after]-clock <= tolerance)
+    return before, after, weight, valid
+
+
+def join_topic(clock, df, method='previous', tolerance=None, origin=0):
+    """Join a topic onto a clock.
+
+    Args:
+        clock (array-like): Ticks in seconds since origin.
+        df (pandas.DataFrame): CSV of the topic, with a \"time\" column.
+        method (str, optional): Default 'previous'. One of METHODS. With
+            'linear', columns that aren't numeric are joined by 'nearest'.
+        tolerance (float, optional): Default None, no limit. In seconds.
+        origin (int, optional): Default 0. Origin of clock, see
+            get_time_in_secs.
+
+    Returns:
+        A pandas.DataFrame of the columns of df other than \"time\", one row
+        per tick. Rows of ticks that take no sample are NaN.
+    """
+    import pandas as pd
+
+    if method not in METHODS:
+        raise ValueError("method should be one of %s, got %s"%(METHODS, method))
+    clock = np.asarray(clock, dtype=float)
+    columns = [i for i in df.columns if i != 'time']
+    if len(df) == 0:
+        return pd.DataFrame(np.nan, columns=columns, index=np.arange(clock.shape[0]))
+    times = get_time_in_secs(df['time'], origin)[0]
+    if np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='mergesort')
+        times = times[order]
+        df = df.iloc[order]
+
+    if method == 'linear':
+        numeric_columns = [
+            i for i in columns
+            if pd.api.types.is_numeric_dtype(df[i]) and not pd.api.types.is_bool_dtype(df[i])
+        ]
+    else:
+        numeric_columns = []
+    other_columns = [i for i in columns if i not in numeric_columns]
+
+    ret = {}
+    if len(numeric_columns) != 0:
+        before, after, weight, valid = get_linear_weights(clock, times, tolerance)
+        values = df[numeric_columns].values.astype(float)
+        joined = values[before]*(1-weight)[:, None]+values[after]*weight[:, None]
+        joined[~valid] = np.nan
+        for column_idx, column in enumerate(numeric_columns):
+            ret[column] = joined[:, column_idx]
+    if len(other_columns) != 0:
+        idx = get_asof_index(
+            clock,
+            times,
+            'nearest' if method == 'linear' else method,
+            tolerance,
+        )
+        valid = pd.Series(idx >= 0)
+        taken = df[other_columns].iloc[np.maximum(idx, 0)].reset_index(drop=True)
+        if not valid.all():
+            taken = taken.where(valid, axis=0)
+        for column in other_columns:
+            ret[column] = taken[column].values
+    return pd.DataFrame(ret, columns=columns, index=np.arange(clock.shape[0]))
+
+
+def synchronize_topics(
+    list_of_topic,
+    clock=None,
+    hz=None,
+    method='previous',
+    tolerance=None,
+):
+    """Join CSVs of topics onto a common clock, as one DataFrame.
+
+    Args:
+        list_of_topic (list): (name, pandas.DataFrame) tuples. Each
+            DataFrame has a \"time\" column. Its other columns are named
+            name+column in the result, e.g. \"/tag_multimodal\" and \".tag\"
+            give \"/tag_multimodal.tag\".
+        clock (optional): Default None. The name of a topic in list_of_topic
+            whose times are the clock, or the ticks themselves, in the same
+            form as the \"time\" columns.
+        hz (float, optional): Default None. If clock is None, the clock ticks
+            at this rate over the time all topics overlap.
+        method (str or dict, optional): Default 'previous'. One of METHODS,
+            or a dict of topic name to one of METHODS.
+        tolerance (float or dict, optional): Default None, no limit. In
+            seconds, or a dict of topic name to it.
+
+    Returns:
+        A pandas.DataFrame with a \"time\" column of the clock, in the form
+        of the \"time\" columns, and the joined columns of all topics.
+
+    Raises:
+        ValueError: If clock and hz are both None or both given, or two
+            topics give the same column name.
+
+    Examples:
+        >>> synchronize_topics(
+        ...     [('/tag_multimodal', tag_df), ('/anomaly_detection_signal', flag_df)],
+        ...     clock='/tag_multimodal',
+        ...     method={'/tag_multimodal': 'previous', '/anomaly_detection_signal': 'previous'},
+        ...     tolerance={'/anomaly_detection_signal': 0.1},
+        ... )
+    """
+    import pandas as pd
+    from birl_generic_data_handler.csv_handler import get_resample_time_index
+
+    if (clock is None) == (hz is None):
+        raise ValueError("give either clock or hz")
+
+    names = [name for name, df in list_of_topic]
+    if clock is None:
+        list_of_secs = []
+        origin = None
+        for name, df in list_of_topic:
+            secs, is_datetime, origin = get_time_in_secs(df['time'], origin)
+            list_of_secs.append(secs)
+        clock_secs = get_resample_time_index(
+            max(secs.min() for secs in list_of_secs),
+            min(secs.max() for secs in list_of_secs),
+            hz,
+        )
+    elif not isinstance(clock, (np.ndarray, list, tuple, pd.Series, pd.Index)):
+        clock_secs, is_datetime, origin = get_time_in_secs(list_of_topic[names.index(clock)][1]['time'])
+    else:
+        clock_secs, is_datetime, origin = get_time_in_secs(clock)
+
+    ret = pd.DataFrame({'time': get_time_from_secs(clock_secs, is_datetime, origin)})
+    for name, df in list_of_topic:
+        joined = join_topic(
+            clock_secs,
+            df,
+            method[name] if isinstance(method, dict) else method,
+            tolerance.get(name) if isinstance(tolerance, dict) else tolerance,
+            origin,
+        )
+        joined.columns = [name+column for column in joined.columns]
+        duplicated_columns = set(joined.columns) & set(ret.columns)
+        if len(duplicated_columns) != 0:
+            raise ValueError("duplicated columns: %s"%(sorted(duplicated_columns),))
+        ret = pd.concat([ret, joined], axis=1)
+    return ret
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""This is a module that overlays trials on a fixed layout of figures
+
+TrialPlotter owns three figures: the 3-D endpoint position, the endpoint
+orientation and the wrench. Trials are added one at a time, and the lines
+drawn for each trial are cached by label, so adding a trial only draws its own
+lines, and adding a trial under a known label updates its lines in place with
+set_data instead of drawing them again.
+
+A headless TrialPlotter draws on Agg-backed figures without touching pyplot
+state, so it can be used from worker processes and saved with save_figures.
+
+"""
+import numpy as np
+from birl_generic_data_handler.plot_decimator import (
+    get_decimated_index,
+    get_pixel_width,
+    plot_decimated,
+)
+
+POS_COLUMNS = (
+    '.endpoint_state.pose.position.x',
+    '.endpoint_state.pose.position.y',
+    '.endpoint_state.pose.position.z',
+)
+
+# (name, index of figure, subplot position, columns, title)
+PANELS = [
+    ('pos', 0, 111, POS_COLUMNS, 'pos xyz'),
+    ('ori_x', 1, 411, ('.endpoint_state.pose.orientation.x',), 'ori x'),
+    ('ori_y', 1, 412, ('.endpoint_state.pose.orientation.y',), 'ori y'),
+    ('ori_z', 1, 413, ('.endpoint_state.pose.orientation.z',), 'ori z'),
+    ('ori_w', 1, 414, ('.endpoint_state.pose.orientation.w',), 'ori w'),
+    ('fx', 2, 231, ('.wrench_stamped.wrench.force.x',), 'fx'),
+    ('fy', 2, 232, ('.wrench_stamped.wrench.force.y',), 'fy'),
+    ('fz', 2, 233, ('.wrench_stamped.wrench.force.z',), 'fz'),
+    ('mx', 2, 234, ('.wrench_stamped.wrench.torque.x',), 'mx'),
+    ('my', 2, 235, ('.wrench_stamped.wrench.torque.y',), 'my'),
+    ('mz', 2, 236, ('.wrench_stamped.wrench.torque.z',), 'mz'),
+]
+
+FIGURE_NAMES = ['pos', 'ori', 'wrench']
+
+
+class TrialPlotter(object):
+    """To overlay trials on the position, orientation and wrench figures.
+
+    Args:
+        headless (bool, optional): Default false. If true, figures are
+            backed by the Agg canvas instead of being created by pyplot.
+
+    Examples:
+        >>> plotter = TrialPlotter()
+        >>> for f, df in df_group_by_foldername.items():
+        ...     plotter.add_trial(df, color=next(color), label=f)
+        >>> plotter.plot_legend()
+        >>> plotter.show()
+
+        In a worker process:
+
+        >>> plotter = TrialPlotter(headless=True)
+        >>> plotter.add_trial(df, color='red', label='01')
+        >>> plotter.save_figures(output_dir)
+
+    """
+
+    def __init__(self, headless=False):
+        # Registers the 3d projection
+        from mpl_toolkits.mplot3d import Axes3D
+        if headless:
+            from birl_generic_data_handler.figure_renderer import new_figure
+            self.figures = [new_figure() for i in FIGURE_NAMES]
+        else:
+            import matplotlib.pyplot as plt
+            self.figures = [plt.figure() for i in FIGURE_NAMES]
+        self.headless = headless
+
+        self.axes = {}
+        for name, fig_idx, position, columns, title in PANELS:
+            if len(columns) == 3:
+                ax = self.figures[fig_idx].add_subplot(position, projection='3d')
+            else:
+                ax = self.figures[fig_idx].add_subplot(position)
+            ax.set_title(title)
+            self.axes[name] = ax
+
+        # label -> {panel name: line}
+        self._artists = {}
+        self._labels = []
+
+    @property
+    def labels(self):
+        """Labels of trials plotted, in the order they were added."""
+        return list(self._labels)
+
+    def add_trial(self, df, color, label):
+        """Plot a trial, or update the lines of a trial plotted before.
+
+        Panels whose columns are not in df are skipped.
+
+        Args:
+            df (pandas.Dataframe): Data of a trial, indexed by time.
+            color: A matplotlib color.
+            label (str): Label of the trial in legends.
+        """
+        if label not in self._artists:
+            self._artists[label] = {}
+            self._labels.append(label)
+        lines = self._artists[label]
+        for name, fig_idx, position, columns, title in PANELS:
+            if not all(column in df for column in columns):
+                continue
+            ax = self.axes[name]
+            if len(columns) == 3:
+                list_of_arr = [df[column].values for column in columns]
+            else:
+                list_of_arr = [df.index.values, df[columns[0]].values]
+
+            if name not in lines:
+                lines[name], = plot_decimated(
+                    ax,
+                    *list_of_arr,
+                    color=color,
+                    label=label
+                )
+                continue
+
+            line = lines[name]
+            if len(list_of_arr) == 3:
+                values = np.column_stack(list_of_arr)
+            else:
+                values = list_of_arr[1]
+            index = get_decimated_index(values, get_pixel_width(ax))
+            list_of_arr = [arr[index] for arr in list_of_arr]
+            line.set_data(list_of_arr[0], list_of_arr[1])
+            line.set_color(color)
+            if len(list_of_arr) == 3:
+                line.set_3d_properties(list_of_arr[2])
+                ax.auto_scale_xyz(*list_of_arr, had_data=True)
+            else:
+                ax.relim()
+                ax.autoscale_view()
+
+    def remove_trial(self, label):
+        """Remove the lines of a trial."""
+        for line in self._artists.pop(label).values():
+            line.remove()
+        self._labels.remove(label)
+
+    def plot_legend(self):
+        """Add a legend to every panel that has lines."""
+        for name in self.axes:
+            ax = self.axes[name]
+            if len(ax.lines) != 0:
+                ax.legend()
+
+    def show(self):
+        """Show the figures with pyplot."""
+        import matplotlib.pyplot as plt
+        for fig in self.figures:
+            fig.tight_layout()
+        plt.show()
+
+    def save_figures(self, output_dir, dpi=None):
+        """Save the figures as pos.png, ori.png and wrench.png in output_dir.
+
+        Returns:
+            A list of paths of the PNGs.
+        """
+        import os
+        list_of_path = []
+        for fig_name, fig in zip(FIGURE_NAMES, self.figures):
+            path = os.path.join(output_dir, fig_name+'.png')
+            fig.tight_layout()
+            fig.savefig(path, dpi=dpi)
+            list_of_path.append(path)
+        return list_of_path
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""This is a module of plot functions for verifying extracted data
+
+Each plot function draws one figure on a given matplotlib Figure and takes only
+picklable arguments, so that it can be used by FigureJob of figure_renderer and
+rendered in a worker process.
+
+"""
+import numpy as np
+
+
+def color_bg_and_anomaly(
+    plot,
+    tag_df,
+    list_of_anomaly_start_time,
+):
+    """Color the background of a plot by the \".tag\" state of a trial.
+
+    Args:
+        plot: A matplotlib axes.
+        tag_df (pandas.Dataframe): Contains \"time\" and \".tag\" columns.
+        list_of_anomaly_start_time (list): Anomalous moments, marked by red
+            lines and pink spans.
+    """
+    from birl_generic_data_handler.run_length_encoder import run_length_encode
+
+    tag_df_length = tag_df.shape[0]
+    state_color = {0: "gray", 2: "green", 5: "green"}
+    time_arr = tag_df['time'].values
+    run_tags, run_starts, run_ends = run_length_encode(tag_df['.tag'].values)
+    # a span reaches the first timestep of the next run
+    run_ends = np.minimum(run_ends, tag_df_length-1)
+    for skill, start_t, end_t in zip(run_tags, run_starts, run_ends):
+        if start_t == end_t:
+            continue
+        if skill == -1:
+            color = 'red'
+        elif skill == -2:
+            color = 'black'
+        elif skill == -3:
+            color = 'yellow'
+        else:
+            color = state_color[skill]
+        plot.axvspan(time_arr[start_t], time_arr[end_t], facecolor=color, ymax=1, ymin=0.95)
+
+    for t in list_of_anomaly_start_time:
+        plot.axvline(t, color='red')
+        plot.axvspan(t-2, t+2, facecolor='pink', ymax=0.95, ymin=0)
+
+
+def plot_colored_trials(fig, suptitle, dim, list_of_trial):
+    """Plot one dimension of trials, one trial per row.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure to draw on.
+        suptitle (str): Title of the figure.
+        dim (str): The column to plot.
+        list_of_trial (list): (title, trial_df, list_of_anomaly_start_time,
+            list_of_anomaly_series, list_of_lfd_series) tuples. trial_df
+            contains \"time\", \".tag\" and dim columns. Anomalies are
+            plotted in red and LfDs in yellow.
+    """
+    from birl_generic_data_handler.figure_renderer import add_subplot_grid
+    from birl_generic_data_handler.plot_decimator import plot_decimated
+
+    trial_amount = len(list_of_trial)
+    # Series are decimated by the pixel width of axes, so size the figure first
+    fig.set_size_inches(16, 4*trial_amount)
+    axs = add_subplot_grid(fig, trial_amount, 1, sharex=True, sharey=True)
+    for idx, trial in enumerate(list_of_trial):
+        title, \
+        trial_df, \
+        list_of_anomaly_start_time, \
+        list_of_anomaly_series, \
+        list_of_lfd_series = trial
+
+        ax = axs[idx, 0]
+        time_arr = trial_df['time'].values
+        plot_decimated(
+            ax,
+            time_arr,
+            trial_df[dim].values,
+            keep_index=time_arr.searchsorted(list_of_anomaly_start_time).clip(0, len(time_arr)-1),
+        )
+        ax.set_title(title)
+        color_bg_and_anomaly(
+            ax,
+            trial_df,
+            list_of_anomaly_start_time,
+        )
+        for anomaly_series in list_of_anomaly_series:
+            plot_decimated(
+                ax,
+                anomaly_series.index.values,
+                anomaly_series.values,
+                color='red',
+            )
+        for lfd_series in list_of_lfd_series:
+            plot_decimated(
+                ax,
+                lfd_series.index.values,
+                lfd_series.values,
+                color='yellow',
+            )
+    fig.suptitle(suptitle)
+
+
+def plot_series_grid(fig, suptitle, list_of_row):
+    """Plot a grid of series against time elapsed since their first index.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure to draw on.
+        suptitle (str): Title of the figure.
+        list_of_row (list): Rows of the grid, each a list of (title,
+            pandas.Series) tuples. All rows have the same amount of columns.
+    """
+    from birl_generic_data_handler.figure_renderer import add_subplot_grid
+    from birl_generic_data_handler.plot_decimator import plot_decimated
+
+    row_amount = len(list_of_row)
+    col_amount = len(list_of_row[0])
+    fig.set_size_inches(16, 4*row_amount)
+    axs = add_subplot_grid(fig, row_amount, col_amount, sharex=True, sharey=True)
+    for row_idx, row in enumerate(list_of_row):
+        for col_idx, (title, series) in enumerate(row):
+            ax = axs[row_idx, col_idx]
+            time_x = series.index.values-series.index.values[0]
+            plot_decimated(
+                ax,
+                time_x,
+                series.values,
+            )
+            ax.set_title(title)
+    fig.suptitle(suptitle)
+
+
+def _read_series(csv_path, dim):
+    import pandas as pd
+    return pd.read_csv(csv_path, sep=',', index_col='time', usecols=['time', dim])[dim]
+
+
+def plot_colored_trials_from_csv(fig, suptitle, dim, list_of_trial):
+    """Like plot_colored_trials, but trials are read from CSV files.
+
+    Only the plotted column is read, so a worker holds one dimension of the
+    trials at a time.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure to draw on.
+        suptitle (str): Title of the figure.
+        dim (str): The column to plot.
+        list_of_trial (list): (title, trial_csv_path,
+            list_of_anomaly_start_time, list_of_anomaly_csv_path,
+            list_of_lfd_csv_path) tuples. Trial CSVs contain \"time\",
+            \".tag\" and dim columns, anomaly and LfD CSVs are indexed by
+            \"time\".
+    """
+    import pandas as pd
+
+    list_of_loaded_trial = []
+    for title, trial_csv_path, list_of_anomaly_start_time, \
+        list_of_anomaly_csv_path, list_of_lfd_csv_path in list_of_trial:
+        list_of_loaded_trial.append((
+            title,
+            pd.read_csv(trial_csv_path, sep=',', usecols=['time', '.tag', dim]),
+            list_of_anomaly_start_time,
+            [_read_series(path, dim) for path in list_of_anomaly_csv_path],
+            [_read_series(path, dim) for path in list_of_lfd_csv_path],
+        ))
+    plot_colored_trials(fig, suptitle, dim, list_of_loaded_trial)
+
+
+def plot_series_grid_from_csv(fig, suptitle, dim, list_of_row):
+    """Like plot_series_grid, but series are read from CSV files.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure to draw on.
+        suptitle (str): Title of the figure.
+        dim (str): The column to plot.
+        list_of_row (list): Rows of the grid, each a list of (title,
+            csv_path) tuples. CSVs are indexed by \"time\".
+    """
+    plot_series_grid(fig, suptitle, [
+        [(title, _read_series(path, dim)) for title, path in row]\
+            for row in list_of_row
+    ])
@@ -1,8 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import sys
-import rosbag
 import subprocess
+import logging
 from optparse import OptionParser
 from datetime import datetime
 import os
@@ -18,7 +18,7 @@ def message_to_csv(stream, msg, flatten=False):
             message_to_csv(stream, val, flatten)
     except:
         msg_str = str(msg)
-        if msg_str.find(",") is not -1:
+        if msg_str.find(",") != -1:
             if flatten:
                 msg_str = msg_str.strip("(")
                 msg_str = msg_str.strip(")")
@@ -39,23 +39,229 @@ def message_type_to_csv(stream, msg, parent_content_name=""):
     except:
         stream.write("," + parent_content_name)
  
-def bag_to_csv(bag, output_file_path, topic_name):
+STAMP_SOURCES = ('record', 'header', 'both')
+# Appended to names of cached CSVs, which are unchanged for 'record'
+STAMP_SUFFIXES = {
+    'record': '',
+    'header': '-header_stamp',
+    'both': '-both_stamps',
+}
+
+def format_time(time):
+    return datetime.fromtimestamp(time.to_time()).strftime('%Y/%m/%d/%H:%M:%S.%f')
+
+def _to_nsec(time):
+    return time.secs*1000000000+time.nsecs
+
+def _get_time_of_row(row):
+    # Times format_time writes are of fixed width, so they sort as strings
+    return row[:row.index(',')] if ',' in row else row.rstrip('\n')
+
+def sort_csv_by_time(csv_path):
+    """
+    Stable-sort the rows of a CSV bag_to_csv wrote by its "time" column,
+    i.e. the first one, as readers of the CSVs assume time is sorted. Header
+    stamps aren't, if the latency of recording varies more than the gap
+    between messages. The CSV is only rewritten if it isn't sorted.
+    Returns whether it was rewritten.
+    """
+    with open(csv_path, 'r') as csv_file:
+        header = csv_file.readline()
+        list_of_row = csv_file.readlines()
+    list_of_time = [_get_time_of_row(row) for row in list_of_row]
+    if all(a <= b for a, b in zip(list_of_time[:-1], list_of_time[1:])):
+        return False
+    order = sorted(range(len(list_of_row)), key=list_of_time.__getitem__)
+    with open(csv_path+'.tmp', 'w') as csv_file:
+        csv_file.write(header)
+        csv_file.writelines(list_of_row[i] for i in order)
+    os.rename(csv_path+'.tmp', csv_path)
+    return True
+
+def bag_to_csv(bag, output_file_path, topic_name, profiler=None, stamp_source='record', start_time=None, end_time=None):
+    """
+    profiler: StageProfiler, records "decode" and "format", i.e. flattening
+        and buffered writing, of messages.
+    stamp_source: what the "time" column holds. 'record', the time messages
+        were written to the bag. 'header', msg.header.stamp, i.e. sensor
+        time. 'both', msg.header.stamp, followed by a "record_time" column.
+        Rows are sorted by header stamps, which may be out of order in the
+        bag, see sort_csv_by_time.
+    start_time, end_time: record times of the messages to convert, start
+        included and end excluded, None for no limit.
+    """
+    from timeit import default_timer
+    from operator import attrgetter
+    if stamp_source not in STAMP_SOURCES:
+        raise ValueError("stamp_source should be one of %s, got %s"%(STAMP_SOURCES, stamp_source))
+    # Looked up in C, the message isn't formatted to find its stamp
+    get_header_stamp = attrgetter('header.stamp')
     streamdict= dict()
+    is_sorted = True
+    last_time_str = None
+    decode_secs = 0
+    format_secs = 0
+    n_messages = 0
 
+    decode_start = default_timer()
+    # read_messages includes end_time, so that messages on a boundary
+    # between ranges are converted once
+    end_nsec = None if end_time is None else _to_nsec(end_time)
     for topic, msg, time in bag.read_messages(topics=topic_name,
-                                              start_time=None,
-                                              end_time=None):
-        if streamdict.has_key(topic):
+                                              start_time=start_time,
+                                              end_time=end_time):
+        format_start = default_timer()
+        decode_secs += format_start-decode_start
+        if end_nsec is not None and _to_nsec(time) >= end_nsec:
+            decode_start = default_timer()
+            continue
+        # Before the CSV is opened, so a topic without header leaves no CSV
+        if stamp_source == 'record':
+            time_str = format_time(time)
+        else:
+            try:
+                stamp = get_header_stamp(msg)
+            except AttributeError:
+                raise ValueError("messages of topic %s have no header"%(topic,))
+            time_str = format_time(stamp)
+            if last_time_str is not None and time_str < last_time_str:
+                is_sorted = False
+            last_time_str = time_str
+            if stamp_source == 'both':
+                time_str += "," + format_time(time)
+        if topic in streamdict:
             stream = streamdict[topic]
         else:
             stream = open(output_file_path, 'w')
             streamdict[topic] = stream
             stream.write("time")
+            if stamp_source == 'both':
+                stream.write(",record_time")
             message_type_to_csv(stream, msg)
             stream.write('\n')
 
-        stream.write(datetime.fromtimestamp(time.to_time()).strftime('%Y/%m/%d/%H:%M:%S.%f'))
+        stream.write(time_str)
         message_to_csv(stream, msg, flatten=False)
         stream.write('\n')
-    [s.close for s in streamdict.values()]
+        n_messages += 1
+        decode_start = default_timer()
+        format_secs += decode_start-format_start
+    [s.close() for s in streamdict.values()]
+    if not is_sorted:
+        sort_start = default_timer()
+        sort_csv_by_time(output_file_path)
+        format_secs += default_timer()-sort_start
+
+    if profiler is not None:
+        profiler.add('decode', calls=1, wall_secs=decode_secs, messages=n_messages)
+        profiler.add('format', calls=1, wall_secs=format_secs, messages=n_messages)
+
+def get_chunk_time_ranges(bag, n_ranges):
+    """
+    Split the record time of bag at chunk boundaries into at most n_ranges
+    contiguous ranges of about as many chunks, read from the chunk index.
+    Returns a list of (start_time, end_time) tuples as bag_to_csv takes,
+    [(None, None)] if bag has no chunk index.
+    """
+    list_of_chunk = sorted(_get_chunk_index(bag), key=lambda c: _to_nsec(c.start_time))
+    n_ranges = min(n_ranges, len(list_of_chunk))
+    list_of_boundary = []
+    for i in range(1, n_ranges):
+        boundary = list_of_chunk[i*len(list_of_chunk)//n_ranges].start_time
+        if len(list_of_boundary) == 0 or _to_nsec(boundary) > _to_nsec(list_of_boundary[-1]):
+            list_of_boundary.append(boundary)
+    list_of_edge = [None]+list_of_boundary+[None]
+    return list(zip(list_of_edge[:-1], list_of_edge[1:]))
+
+def _get_chunk_index(bag):
+    # rosbag.Bag has no public chunk index, only the chunk infos it reads
+    # on open into bag._chunks, which a bag of another version may lack
+    return list(getattr(bag, '_chunks', None) or [])
+
+def _open_rosbag(bag_path):
+    import rosbag
+    return rosbag.Bag(bag_path)
+
+def _bag_range_to_csv(args):
+    # Run in a worker, which opens the bag on its own and records into a
+    # profiler of its own
+    from birl_generic_data_handler.stage_profiler import StageProfiler
+    open_bag, bag_path, part_path, topic_name, stamp_source, start_time, end_time = args
+    profiler = StageProfiler()
+    bag_to_csv(
+        open_bag(bag_path),
+        part_path,
+        topic_name,
+        profiler=profiler,
+        stamp_source=stamp_source,
+        start_time=start_time,
+        end_time=end_time,
+    )
+    return profiler.get_summary()['total']
+
+def chunk_parallel_bag_to_csv(bag, bag_path, output_file_path, topic_name, processes=None, profiler=None, stamp_source='record', open_bag=None):
+    """
+    Same as bag_to_csv, but chunks of bag are decompressed and decoded in
+    a process pool. The record time of bag is split by
+    get_chunk_time_ranges into a range per process, every range is
+    converted into a part CSV by a worker, and the parts are concatenated in
+    time order. Falls back to bag_to_csv if there is a single range.
+    bag: the opened bag at bag_path, whose chunk index is read.
+    processes: size of the process pool, None means the amount of CPUs.
+    profiler: records "decode" and "format" of all workers, so their
+        wall_secs add up to more than the elapsed time.
+    open_bag: open_bag(bag_path) opens the bag in a worker, rosbag.Bag by
+        default. A module-level function, so that it can be pickled.
+    """
+    import shutil
+    import multiprocessing
+    from birl_generic_data_handler.process_pool import pool_map
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    list_of_range = get_chunk_time_ranges(bag, processes)
+    if len(list_of_range) == 1:
+        if processes > 1:
+            logging.getLogger(__name__).warning(
+                "skipped splitting %s into chunks, since it has %s indexed chunks, decoding it in 1 process instead of %s",
+                bag_path, len(_get_chunk_index(bag)), processes)
+        return bag_to_csv(bag, output_file_path, topic_name, profiler=profiler, stamp_source=stamp_source)
+    if open_bag is None:
+        open_bag = _open_rosbag
+
+    list_of_part_path = ['%s.part%s'%(output_file_path, i) for i in range(len(list_of_range))]
+    try:
+        list_of_total = pool_map(_bag_range_to_csv, [
+            (open_bag, bag_path, part_path, topic_name, stamp_source, start_time, end_time)
+            for part_path, (start_time, end_time) in zip(list_of_part_path, list_of_range)
+        ], processes=processes)
+
+        # A range without messages of the topic leaves no part, the header
+        # line is kept from the first part only
+        header = None
+        with open(output_file_path+'.tmp', 'w') as output_file:
+            for part_path in list_of_part_path:
+                if not os.path.isfile(part_path):
+                    continue
+                with open(part_path, 'r') as part_file:
+                    part_header = part_file.readline()
+                    if header is None:
+                        header = part_header
+                        output_file.write(header)
+                    shutil.copyfileobj(part_file, output_file)
+        if header is None:
+            os.remove(output_file_path+'.tmp')
+        else:
+            # Parts are sorted, but header stamps may overlap between them
+            if stamp_source != 'record':
+                sort_csv_by_time(output_file_path+'.tmp')
+            os.rename(output_file_path+'.tmp', output_file_path)
+    finally:
+        for part_path in list_of_part_path:
+            if os.path.isfile(part_path):
+                os.remove(part_path)
 
+    if profiler is not None:
+        for total in list_of_total:
+            for stage_name in ['decode', 'format']:
+                profiler.add(stage_name, **total[stage_name])
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""This is a module that extracts data from rosbag without blocking asyncio
+
+Python 3 only. RosbagHandler and RosbagAnomalyExtractor take minutes on a
+folder of rosbag files, and block the event loop if called from a coroutine.
+AsyncRosbagHandler wraps one of them, and runs the work of every bag, i.e.
+decoding messages, writing and reading CSVs and updating the caches, in an
+executor. Its methods return a BagResultIterator, an async iterator that
+yields (bag path, result) tuples as bags finish, in the order they finish.
+
+The handlers, their profiler and their caches aren't thread-safe, so by
+default the bags of an AsyncRosbagHandler are processed one at a time in a
+thread of its own, which keeps the event loop free to serve other I/O and
+other AsyncRosbagHandler. Give an executor with more workers only to a
+handler without profiler, cache_manager or dataframe_cache.
+
+An extraction is cancelled by cancelling the task iterating it, or by
+calling BagResultIterator.cancel. Bags not started yet are skipped, while
+the bag being processed is finished in its thread and its result dropped.
+
+"""
+import functools
+from collections import deque
+
+
+class BagResultIterator(object):
+    """An async iterator of (bag path, result) tuples, as bags finish.
+
+    Bags are submitted to the executor on the first iteration. If a bag
+    fails, its exception is raised by the iteration of that bag, and the
+    iteration can go on with the other bags.
+
+    Args:
+        list_of_bag_paths (list of str): Bags to process.
+        func: A function of a bag path, run in executor.
+        executor (concurrent.futures.Executor, optional): Default None, the
+            default executor of the event loop.
+
+    """
+
+    def __init__(self, list_of_bag_paths, func, executor=None):
+        self._list_of_bag_paths = list(list_of_bag_paths)
+        self._func = func
+        self._executor = executor
+        self._pending = None
+        self._done = deque()
+        self._waiter = None
+        self._cancelled = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        if self._pending is None:
+            self._start(loop)
+        if self._waiter is not None and not self._waiter.done():
+            raise RuntimeError("__anext__ is already waiting for a bag.")
+
+        waiter = loop.create_future()
+        waiter.add_done_callback(self._on_waiter_done)
+        self._waiter = waiter
+        self._deliver()
+        return waiter
+
+    def _start(self, loop):
+        self._pending = set()
+        for bag_path in self._list_of_bag_paths:
+            future = loop.run_in_executor(self._executor, self._func, bag_path)
+            future.add_done_callback(functools.partial(self._on_bag_done, bag_path))
+            self._pending.add(future)
+
+    def _on_bag_done(self, bag_path, future):
+        self._pending.discard(future)
+        if not future.cancelled():
+            self._done.append((bag_path, future))
+        self._deliver()
+
+    def _deliver(self):
+        waiter = self._waiter
+        if waiter is None or waiter.done():
+            return
+        if self._done and not self._cancelled:
+            bag_path, future = self._done.popleft()
+            if future.exception() is not None:
+                waiter.set_exception(future.exception())
+            else:
+                waiter.set_result((bag_path, future.result()))
+        elif not self._pending or self._cancelled:
+            waiter.set_exception(StopAsyncIteration())
+
+    def _on_waiter_done(self, waiter):
+        # The task awaiting a bag is cancelled
+        if waiter.cancelled():
+            self.cancel()
+
+    def cancel(self):
+        """Skip bags not started yet, and stop the iteration."""
+        self._cancelled = True
+        for future in list(self._pending or []):
+            future.cancel()
+        self._done.clear()
+        self._deliver()
+
+    def aclose(self):
+        """Cancel, for contextlib.aclosing."""
+        import asyncio
+        self.cancel()
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(None)
+        return future
+
+
+class AsyncRosbagHandler(object):
+    """To extract data from rosbag in asyncio.
+
+    Args:
+        handler (RosbagHandler): A RosbagHandler, or a
+            RosbagAnomalyExtractor to call get_anomaly_csv.
+        executor (concurrent.futures.Executor, optional): Default None, a
+            thread of its own. Executor to process bags in.
+
+    Examples:
+        >>> o = AsyncRosbagHandler(RosbagAnomalyExtractor("/path_to_data_set"))
+        >>> async for bag_path, list_of_anomaly in o.get_anomaly_csv(
+        ...         "/tag_multimodal", "/anomaly_detection_signal", 4, 10):
+        ...     await upload(bag_path, list_of_anomaly)
+
+        To give up after a minute
+
+        >>> async def get_all(o):
+        ...     return [i async for i in o.get_csv_of_a_topic("/tag_multimodal")]
+        >>> await asyncio.wait_for(get_all(o), 60)
+
+    """
+
+    def __init__(self, handler, executor=None):
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=1)
+        self.handler = handler
+        self.executor = executor
+
+    def _iterate(self, func):
+        profiler = self.handler._profiler
+
+        def func_in_bag(bag_path):
+            with profiler.bag(bag_path):
+                return func(bag_path)
+        return BagResultIterator(
+            self.handler._list_of_bag_paths,
+            func_in_bag,
+            self.executor,
+        )
+
+    def get_csv_of_a_topic(self, topic_name, columns=None):
+        """See RosbagHandler.get_csv_of_a_topic.
+
+        Returns:
+            A BagResultIterator of (bag path, pandas.Dataframe) tuples.
+        """
+        return self._iterate(
+            self.handler._get_csv_of_a_topic_func(topic_name, columns)
+        )
+
+    def get_synchronized_csv(
+        self,
+        list_of_topic_name,
+        clock_topic_name=None,
+        hz=None,
+        method='previous',
+        tolerance=None,
+    ):
+        """See RosbagHandler.get_synchronized_csv.
+
+        Returns:
+            A BagResultIterator of (bag path, pandas.Dataframe) tuples.
+        """
+        return self._iterate(self.handler._get_synchronized_csv_func(
+            list_of_topic_name,
+            clock_topic_name,
+            hz,
+            method,
+            tolerance,
+        ))
+
+    def get_anomaly_csv(
+        self,
+        data_topic_name,
+        anomaly_topic_name,
+        anomaly_window_size_in_sec,
+        anomaly_resample_hz,
+    ):
+        """See RosbagAnomalyExtractor.get_anomaly_csv.
+
+        Returns:
+            A BagResultIterator of (bag path, x) tuples, where x is a list of
+            (anomaly id, pandas.Dataframe) tuples.
+        """
+        return self._iterate(self.handler._get_anomaly_csv_func(
+            data_topic_name,
+            anomaly_topic_name,
+            anomaly_window_size_in_sec,
+            anomaly_resample_hz,
+        ))
+
+    def get_confirmed_anomaly_csv(
+        self,
+        data_topic_name,
+        anomaly_topic_name,
+        search_secs=3,
+        backtrack='event_flag',
+    ):
+        """See RosbagAnomalyExtractor.get_confirmed_anomaly_csv.
+
+        Returns:
+            Same as get_anomaly_csv.
+        """
+        return self._iterate(self.handler._get_confirmed_anomaly_csv_func(
+            data_topic_name,
+            anomaly_topic_name,
+            search_secs,
+            backtrack,
+        ))
+
+    def shutdown(self, wait=True):
+        """Shut the executor down."""
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""This is a module that keeps the cache of a rosbag folder within a budget
+
+RosbagHandler and RosbagAnomalyExtractor cache their results alongside the
+rosbag files, in a folder per bag: one CSV per topic and one folder per
+extraction of anomalies. Each of these is an artifact. A CacheManager tracks,
+in an index JSON in the rosbag folder, the size, last access and hit count of
+every artifact, and evicts the least recently used artifacts once their total
+size is over a budget.
+
+The handlers report to a CacheManager if one is given to them. Artifacts
+cached before, or without, a CacheManager are picked up by scan. Handlers of
+many processes may share a rosbag folder, so every update of the index holds
+a lock, an fcntl lock of a file next to the index where fcntl is available.
+
+The cache of a rosbag folder can also be inspected and pruned from the
+command line:
+
+    python -m birl_offline_data_handler.cache_manager inspect /path_to_data_set
+    python -m birl_offline_data_handler.cache_manager prune /path_to_data_set --budget 2G
+
+"""
+import os
+import json
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+INDEX_NAME = '.rosbag_cache_index.json'
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+
+def parse_size(size):
+    """Parse a size like \"512M\" or \"2G\" into bytes."""
+    size = str(size).strip().upper().rstrip('B')
+    unit = size[-1:] if size[-1:] in _UNITS else ''
+    return int(float(size[:len(size)-len(unit)])*_UNITS[unit])
+
+
+def format_size(n_bytes):
+    """Format bytes like \"1.5G\"."""
+    for unit in ['', 'K', 'M', 'G']:
+        if n_bytes < 1024:
+            return '%.1f%s'%(n_bytes, unit) if unit else '%d'%n_bytes
+        n_bytes /= 1024.0
+    return '%.1fT'%n_bytes
+
+
+def get_size(path):
+    """Get the size of a file, or of all files in a folder, in bytes."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+class CacheManager(object):
+    """To track and bound the cache of a rosbag folder.
+
+    Args:
+        cache_root (str): The folder of the rosbag files.
+        budget_in_bytes (int, optional): Default None, no budget. If given,
+            artifacts are evicted, least recently used first, whenever a new
+            artifact makes the cache bigger than this.
+
+    Examples:
+        >>> cm = CacheManager("/path_to_data_set", budget_in_bytes=parse_size("2G"))
+        >>> o = RosbagAnomalyExtractor("/path_to_data_set", cache_manager=cm)
+        >>> o.get_anomaly_csv("/tag_multimodal", "/anomaly_detection_signal", 4, 10)
+        >>> cm.get_entries()
+        [{'path': 's01/s01-tag_multimodal.csv', 'size': 1048576, 'hits': 0, ...}, ...]
+
+    """
+
+    def __init__(self, cache_root, budget_in_bytes=None):
+        self.cache_root = os.path.abspath(cache_root)
+        self.budget_in_bytes = budget_in_bytes
+        self.index_path = os.path.join(self.cache_root, INDEX_NAME)
+        self.lock_path = self.index_path+'.lock'
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+
+    @contextmanager
+    def _locked(self):
+        # Reentrant, since store evicts while it holds the lock. A second
+        # flock of the same file by this process would wait for itself.
+        with self._thread_lock:
+            self._lock_depth += 1
+            lock_file = None
+            try:
+                if self._lock_depth == 1:
+                    try:
+                        import fcntl
+                    except ImportError:
+                        fcntl = None
+                    if fcntl is not None:
+                        lock_file = open(self.lock_path, 'a')
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                yield
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+                self._lock_depth -= 1
+
+    def _load(self):
+        if not os.path.isfile(self.index_path):
+            return {}
+        with open(self.index_path, 'r') as f:
+            return json.load(f)['entries']
+
+    def _save(self, entries):
+        tmp_path = '%s.%s.tmp'%(self.index_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': 1, 'entries': entries}, f, indent=4, sort_keys=True)
+        os.rename(tmp_path, self.index_path)
+
+    def _get_key(self, artifact_path):
+        return os.path.relpath(os.path.abspath(artifact_path), self.cache_root)
+
+    def _new_entry(self, artifact_path, now):
+        return {
+            'size': get_size(artifact_path),
+            'created': now,
+            'last_access': now,
+            'hits': 0,
+            'misses': 0,
+        }
+
+    def hit(self, artifact_path):
+        """Record that a cached artifact is used."""
+        with self._locked():
+            now = time.time()
+            entries = self._load()
+            key = self._get_key(artifact_path)
+            if key not in entries:
+                entries[key] = self._new_entry(artifact_path, now)
+            entries[key]['last_access'] = now
+            entries[key]['hits'] += 1
+            self._save(entries)
+
+    def store(self, artifact_path):
+        """Record that an artifact has just been made, then enforce the budget.
+
+        Returns:
+            A list of paths of the artifacts evicted.
+        """
+        with self._locked():
+            now = time.time()
+            entries = self._load()
+            key = self._get_key(artifact_path)
+            entry = self._new_entry(artifact_path, now)
+            if key in entries:
+                entry['hits'] = entries[key]['hits']
+                entry['misses'] = entries[key]['misses']
+            entry['misses'] += 1
+            entries[key] = entry
+            self._save(entries)
+            if self.budget_in_bytes is None:
+                return []
+            return self.evict(self.budget_in_bytes, keep=[artifact_path])
+
+    def scan(self):
+        """Sync the index with the disk.
+
+        Artifacts found on disk but not in the index are added, as last
+        accessed when they were last modified. Entries whose artifacts are
+        gone are dropped, and sizes are updated.
+        """
+        with self._locked():
+            entries = self._load()
+            found = set()
+            for bag_name in os.listdir(self.cache_root):
+                if not bag_name.endswith('.bag'):
+                    continue
+                bag_cache_dir = os.path.join(self.cache_root, bag_name[:-4])
+                if not os.path.isdir(bag_cache_dir):
+                    continue
+                for name in os.listdir(bag_cache_dir):
+                    artifact_path = os.path.join(bag_cache_dir, name)
+                    key = self._get_key(artifact_path)
+                    found.add(key)
+                    if key not in entries:
+                        mtime = os.path.getmtime(artifact_path)
+                        entries[key] = self._new_entry(artifact_path, mtime)
+                    else:
+                        entries[key]['size'] = get_size(artifact_path)
+            for key in list(entries):
+                if key not in found:
+                    del entries[key]
+            self._save(entries)
+
+    def get_entries(self):
+        """Get entries of the index, least recently used first.
+
+        Returns:
+            A list of dicts of \"path\", relative to cache_root, \"size\",
+            \"created\", \"last_access\", \"hits\" and \"misses\".
+        """
+        list_of_entry = []
+        for key, entry in self._load().items():
+            entry = dict(entry)
+            entry['path'] = key
+            list_of_entry.append(entry)
+        return sorted(list_of_entry, key=lambda x: (x['last_access'], x['path']))
+
+    def get_total_size(self):
+        return sum(entry['size'] for entry in self._load().values())
+
+    def evict(self, budget_in_bytes, keep=(), dry_run=False):
+        """Remove least recently used artifacts until the cache fits the budget.
+
+        Args:
+            budget_in_bytes (int): Size the cache must fit in.
+            keep (list of str, optional): Paths of artifacts not to remove.
+            dry_run (bool, optional): Default false. If true, only tell
+                what would be removed.
+
+        Returns:
+            A list of paths of the artifacts removed.
+        """
+        with self._locked():
+            entries = self._load()
+            keep = set(self._get_key(path) for path in keep)
+            total = sum(entry['size'] for entry in entries.values())
+            list_of_removed = []
+            for entry in self.get_entries():
+                if total <= budget_in_bytes:
+                    break
+                if entry['path'] in keep:
+                    continue
+                artifact_path = os.path.join(self.cache_root, entry['path'])
+                if not dry_run:
+                    if os.path.isdir(artifact_path):
+                        shutil.rmtree(artifact_path)
+                    elif os.path.exists(artifact_path):
+                        os.remove(artifact_path)
+                    del entries[entry['path']]
+                total -= entry['size']
+                list_of_removed.append(artifact_path)
+            if not dry_run:
+                self._save(entries)
+            return list_of_removed
+
+
+def _format_entries(list_of_entry):
+    rows = [['last access', 'hits', 'misses', 'size', 'path']]
+    for entry in list_of_entry:
+        rows.append([
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['last_access'])),
+            str(entry['hits']),
+            str(entry['misses']),
+            format_size(entry['size']),
+            entry['path'],
+        ])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    usage = "usage: %prog inspect|prune rosbag_folder [options]"
+    parser = OptionParser(usage=usage)
+
+    parser.add_option("--budget",
+        action="store", type="string", dest="budget",
+        default=None,
+        help="size the cache must fit in after prune, e.g. 500M or 2G.")
+
+    parser.add_option("-n", "--dry-run",
+        action="store_true", dest="dry_run",
+        default=False,
+        help="only print what prune would remove.")
+
+    (options, args) = parser.parse_args()
+    if len(args) != 2 or args[0] not in ('inspect', 'prune'):
+        parser.error("expect a command, inspect or prune, and a rosbag folder.")
+    command, cache_root = args
+
+    cm = CacheManager(cache_root)
+    cm.scan()
+    if command == 'inspect':
+        list_of_entry = cm.get_entries()
+        print(_format_entries(list_of_entry))
+        print("%s artifacts, %s in total."%(len(list_of_entry), format_size(cm.get_total_size())))
+    else:
+        if options.budget is None:
+            parser.error("prune needs --budget.")
+        list_of_removed = cm.evict(parse_size(options.budget), dry_run=options.dry_run)
+        for path in list_of_removed:
+            print("%s %s"%("would remove" if options.dry_run else "removed", path))
+        print("%s in total."%(format_size(cm.get_total_size()),))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""This is a module that keeps loaded CSVs in memory across calls
+
+RosbagHandler reads the cached CSV of a topic from disk every time it is
+asked for it, even if the same handler, or a RosbagAnomalyExtractor, asked
+for it a moment ago. Given a DataFrameLruCache, handlers keep the frames they
+load in memory instead, keyed by (bag, topic, columns), and the least
+recently used frames are dropped once their total size is over a budget.
+
+Every caller gets a shallow copy of a kept frame, which shares its data, so
+adding columns never changes what other callers get. Where pandas copies on
+write, i.e. pandas 3, or with mode.copy_on_write set, writing into a copy
+copies the data written first. Otherwise the numpy arrays of kept frames are
+made read-only, so writing into them, or replacing a column in place, raises
+an error, mostly ValueError. Columns not backed by a numpy array, e.g. of
+extension dtypes, can't be made read-only and are copied for every caller.
+
+"""
+from collections import OrderedDict
+
+
+def is_copy_on_write():
+    """Tell if pandas copies data shared by frames before writing into it."""
+    import pandas as pd
+
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        # The option came with pandas 1.5
+        return False
+
+
+def set_read_only(df):
+    """Make the numpy arrays backing a pandas.Dataframe read-only.
+
+    Returns:
+        A list of columns that aren't backed by a numpy array, so can't be
+        made read-only.
+    """
+    import numpy as np
+
+    manager = getattr(df, '_mgr', None)
+    if manager is None:
+        manager = df._data
+    for block in manager.blocks:
+        if isinstance(block.values, np.ndarray):
+            block.values.flags.writeable = False
+    return [
+        column for column in df.columns
+        if not isinstance(df[column].values, np.ndarray)
+    ]
+
+
+def _get_copy(entry):
+    df, n_bytes, columns_to_copy = entry
+    ret = df.copy(deep=False)
+    for column in columns_to_copy:
+        ret[column] = df[column].copy()
+    return ret
+
+
+class DataFrameLruCache(object):
+    """A least-recently-used cache of pandas.Dataframe, bounded by bytes.
+
+    Args:
+        max_bytes (int): Budget of the frames kept, by
+            pandas.DataFrame.memory_usage(deep=True). A frame bigger than
+            this is never kept.
+
+    Examples:
+        >>> cache = DataFrameLruCache(max_bytes=2*1024**3)
+        >>> o = RosbagHandler("/path_to_data_set", dataframe_cache=cache)
+        >>> o.get_csv_of_a_topic("/tag_multimodal")
+        >>> o.get_csv_of_a_topic("/tag_multimodal")  # From memory
+        >>> cache.hits, cache.misses
+        (5, 5)
+
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Get a frame and mark it most recently used, or None."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries[key] = entry
+        self.hits += 1
+        return _get_copy(entry)
+
+    def put(self, key, df):
+        """Keep a frame and drop the least recently used frames that don't
+        fit. df is kept as it is, so it shouldn't be changed afterwards.
+
+        Returns:
+            A copy of df as get returns, or df if it is too big to keep.
+        """
+        self.discard(key)
+        n_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        if n_bytes > self.max_bytes:
+            return df
+        if is_copy_on_write():
+            columns_to_copy = []
+        else:
+            columns_to_copy = set_read_only(df)
+        while self.current_bytes+n_bytes > self.max_bytes:
+            old_key, (old_df, old_n_bytes, old_columns_to_copy) = self._entries.popitem(last=False)
+            self.current_bytes -= old_n_bytes
+        self._entries[key] = (df, n_bytes, columns_to_copy)
+        self.current_bytes += n_bytes
+        return _get_copy(self._entries[key])
+
+    def discard(self, key):
+        """Drop a frame if it is kept."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def clear(self):
+        """Drop all frames."""
+        self._entries.clear()
+        self.current_bytes = 0
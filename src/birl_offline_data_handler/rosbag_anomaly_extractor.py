@@ -37,6 +37,23 @@ class RosbagAnomalyExtractor(RosbagHandler):
         use_cached_result (bool, optional): Default true. 
             If ture, cached result will be used instead 
             of reading and parsing the rosbag file again.
+        profiler (StageProfiler, optional): Default None.
+            If given, costs of reading rosbags and of
+            extracting anomalies are recorded in it, per bag.
+        cache_manager (CacheManager, optional): Default 
+            None. If given, cached results are reported 
+            to it, which may evict old ones to keep the 
+            cache within its budget.
+        dataframe_cache (DataFrameLruCache, optional): 
+            Default None. If given, CSVs of topics are kept 
+            in it and reused across calls, e.g. by 
+            get_anomaly_csv with another window size.
+        stamp_source (str, optional): Default 'record'. 
+            See RosbagHandler. With 'header', anomalies 
+            are cut by sensor time. Anomalies are cached 
+            apart per stamp source.
+        decode_processes (int, optional): Default 1. 
+            See RosbagHandler.
         
     Raises:
         InvalidRosbagPath
@@ -72,11 +89,31 @@ class RosbagAnomalyExtractor(RosbagHandler):
             ])
         ]
 
+        To keep only anomalies the state machine recovered from
+
+        >>> o.get_confirmed_anomaly_csv("/tag_multimodal", "/hmm_online_result")
+        [
+            ("/path_to_data_set/s01.bag", [
+                (anomaly_id, pandas.DataFrame),
+                ...
+            ]),
+            ...
+        ]
+
     """
 
-    def __init__(self, path_to_rosbag, use_cached_result=True):
+    def __init__(
+        self,
+        path_to_rosbag,
+        use_cached_result=True,
+        profiler=None,
+        cache_manager=None,
+        dataframe_cache=None,
+        stamp_source='record',
+        decode_processes=1,
+    ):
         super(RosbagAnomalyExtractor, self)\
-            .__init__(path_to_rosbag, use_cached_result)
+            .__init__(path_to_rosbag, use_cached_result, profiler, cache_manager, dataframe_cache, stamp_source, decode_processes)
 
     def get_anomaly_csv(
         self,
@@ -104,41 +141,136 @@ class RosbagAnomalyExtractor(RosbagHandler):
             A list of (bag path, x) tuples, where x is a list of 
             (anomaly id, pandas.Dataframe) tuples. Here a pandas.Dataframe represents a CSV of anomaly data.
         """
-        ret = []
+        return self._map_bags(self._get_anomaly_csv_func(
+            data_topic_name,
+            anomaly_topic_name,
+            anomaly_window_size_in_sec,
+            anomaly_resample_hz,
+        ))
 
-        _list_of_bag_paths = self._list_of_bag_paths 
+    def _get_anomaly_csv_func(
+        self,
+        data_topic_name,
+        anomaly_topic_name,
+        anomaly_window_size_in_sec,
+        anomaly_resample_hz,
+    ):
+        from birl_generic_data_handler import csv_handler
+        ch = csv_handler.CsvHandler(profiler=self._profiler)
 
-        for bag_path in _list_of_bag_paths:
-            ret.append((
-                bag_path, 
-                self._get_anomaly_csv_of_one_bag(
-                    bag_path,
-                    data_topic_name,
-                    anomaly_topic_name,
-                    anomaly_window_size_in_sec,
-                    anomaly_resample_hz,
-                ),
-            ))
+        def extract(data_df, anomaly_flag_df):
+            return ch.extract_anomaly_data(
+                data_df, 
+                anomaly_flag_df,
+                anomaly_window_size_in_sec,
+                anomaly_resample_hz,
+            )
 
-        return ret
+        def get_anomaly_csv_of_one_bag(bag_path):
+            return self._get_anomaly_csv_of_one_bag(
+                bag_path,
+                data_topic_name,
+                anomaly_topic_name,
+                self._get_anomaly_csv_dir_path(bag_path),
+                extract,
+                'resampled_%shz_no_%%s_from_trial_%%s.csv'%(anomaly_resample_hz,),
+            )
+        return get_anomaly_csv_of_one_bag
+
+    def get_confirmed_anomaly_csv(
+        self,
+        data_topic_name,
+        anomaly_topic_name,
+        search_secs=3,
+        backtrack='event_flag',
+    ):
+        """Get anomalies confirmed by the state machine as CSV.
+
+        An alternative to get_anomaly_csv. Instead of a window around every
+        flag, an anomaly is kept only if the \".tag\" of the data topic goes
+        to 0, i.e. the state machine goes into recovery, within search_secs
+        after it is flagged. See CsvHandler.extract_confirmed_anomaly_data.
+        Confirmed anomalies are cached apart from the windowed ones, one
+        folder per search_secs and backtrack policy.
+
+        Args:
+            data_topic_name (str): The name of data topic, i.e. "/tag_multimodal".
+            anomaly_topic_name: The name of a flag topic with an
+                \"event_flag\" field, i.e. "/hmm_online_result".
+            search_secs (optional): Default 3. Seconds to wait for recovery.
+            backtrack (str, optional): Default \"event_flag\". Either
+                \"event_flag\" or \"none\".
+
+        Returns:
+            Same as get_anomaly_csv, except that anomalies are of different
+            lengths.
+
+        Raises:
+            ValueError: If the data topic has no \"tag\" field or the flag
+                topic has no \"event_flag\" field.
+        """
+        return self._map_bags(self._get_confirmed_anomaly_csv_func(
+            data_topic_name,
+            anomaly_topic_name,
+            search_secs,
+            backtrack,
+        ))
+
+    def _get_confirmed_anomaly_csv_func(
+        self,
+        data_topic_name,
+        anomaly_topic_name,
+        search_secs=3,
+        backtrack='event_flag',
+    ):
+        from birl_generic_data_handler import csv_handler
+        ch = csv_handler.CsvHandler(profiler=self._profiler)
+
+        def extract(data_df, anomaly_flag_df):
+            return ch.extract_confirmed_anomaly_data(
+                [data_df],
+                [anomaly_flag_df],
+                search_secs=search_secs,
+                backtrack=backtrack,
+            )[0]
+
+        if search_secs == 3 and backtrack == 'event_flag':
+            dir_name = "extracted_confirmed_anomalies"
+        else:
+            dir_name = "extracted_confirmed_anomalies_in_%ss_backtrack_%s"%(search_secs, backtrack)
+
+        def get_confirmed_anomaly_csv_of_one_bag(bag_path):
+            return self._get_anomaly_csv_of_one_bag(
+                bag_path,
+                data_topic_name,
+                anomaly_topic_name,
+                self._get_anomaly_csv_dir_path(bag_path, dir_name),
+                extract,
+                'confirmed_no_%s_from_trial_%s.csv',
+            )
+        return get_confirmed_anomaly_csv_of_one_bag
 
     def _get_anomaly_csv_of_one_bag(
         self, 
         bag_path,
         data_topic_name,
         anomaly_topic_name,
-        anomaly_window_size_in_sec,
-        anomaly_resample_hz,
+        anomaly_csv_dir_path,
+        extract,
+        csv_name_format,
     ):
         import pandas as pd
 
-        anomaly_csv_dir_path = self._get_anomaly_csv_dir_path(bag_path)
+        profiler = self._profiler
         cache_flag_path = os.path.join(anomaly_csv_dir_path, "SUCCESS")
         if self._use_cache and os.path.isfile(cache_flag_path):
             # Approved to use cache and cached csv 
             # is found.
-            pass
+            profiler.cache('anomaly_extraction', hit=True)
+            if self._cache_manager is not None:
+                self._cache_manager.hit(anomaly_csv_dir_path)
         else:
+            profiler.cache('anomaly_extraction', hit=False)
             # Generate a csv for this topic and stored
             # it at csv_path.
             try:
@@ -159,25 +291,27 @@ class RosbagAnomalyExtractor(RosbagHandler):
                 anomaly_topic_name,
             )
 
-            from birl_generic_data_handler import csv_handler
-            ch = csv_handler.CsvHandler()
-            list_of_anomaly_df = ch.extract_anomaly_data(
-                data_df, 
-                anomaly_flag_df,
-                anomaly_window_size_in_sec,
-                anomaly_resample_hz,
-            )
+            if self._stamp_source == 'both':
+                # Anomalies are cut by \"time\", record time isn't resampled
+                data_df = data_df.drop('record_time', axis=1)
+                anomaly_flag_df = anomaly_flag_df.drop('record_time', axis=1)
+
+            list_of_anomaly_df = extract(data_df, anomaly_flag_df)
 
             fname = os.path.basename(bag_path)[:-4]
-            for anomaly_idx, df in \
-                enumerate(list_of_anomaly_df):
-                df.to_csv(os.path.join(
-                    anomaly_csv_dir_path,
-                    'resampled_%shz_no_%s_from_trial_%s.csv'\
-                        %(anomaly_resample_hz, anomaly_idx, fname)
-                ))
+            with profiler.stage('anomaly_csv_write') as record:
+                for anomaly_idx, df in \
+                    enumerate(list_of_anomaly_df):
+                    csv_path = os.path.join(
+                        anomaly_csv_dir_path,
+                        csv_name_format%(anomaly_idx, fname)
+                    )
+                    df.to_csv(csv_path)
+                    record['bytes_written'] += os.path.getsize(csv_path)
             tmp = open(cache_flag_path, "w")
             tmp.close() 
+            if self._cache_manager is not None:
+                self._cache_manager.store(anomaly_csv_dir_path)
 
         prog = re.compile(r'.*no_(\d+)_.*')
         list_of_anomaly_csv_paths = sorted(
@@ -188,21 +322,22 @@ class RosbagAnomalyExtractor(RosbagHandler):
             key=lambda x: int(prog.match(x).group(1))
         )
         ret = []
-        for csv_path in list_of_anomaly_csv_paths:
-            anomaly_id = os.path.basename(csv_path)[:-4]
-            ret.append((
-                anomaly_id,
-                pd.read_csv(csv_path, sep=','),
-            ))
+        with profiler.stage('anomaly_csv_read') as record:
+            for csv_path in list_of_anomaly_csv_paths:
+                anomaly_id = os.path.basename(csv_path)[:-4]
+                ret.append((
+                    anomaly_id,
+                    pd.read_csv(csv_path, sep=','),
+                ))
+                record['bytes_read'] += os.path.getsize(csv_path)
         return ret
 
-    def _get_anomaly_csv_dir_path(self, bag_path):
+    def _get_anomaly_csv_dir_path(self, bag_path, dir_name="extracted_anomalies"):
         # Strip .bag extention
         fname = os.path.basename(bag_path)[:-4]
 
         return os.path.join(
             os.path.dirname(bag_path),
             fname,
-            "extracted_anomalies",
+            dir_name+self._get_stamp_suffix(),
         )
-
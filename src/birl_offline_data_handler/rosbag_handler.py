@@ -3,7 +3,8 @@
 
 This module assumes its users are only 
 interested in extracting data from rosbag files 
-one topic at a time. The core API that provides
+one topic at a time, or several topics joined 
+onto a common clock. The core API that provides
 this service is class RosbagHandler. Read the 
 examples in its documentation for more details.
 
@@ -34,9 +35,39 @@ class RosbagHandler(object):
         use_cached_result (bool, optional): Default true. 
             If ture, cached result will be used instead 
             of reading and parsing the rosbag file again.
+        profiler (StageProfiler, optional): Default None.
+            If given, costs of bag indexing, message 
+            decoding, formatting, CSV reading and cache 
+            hits are recorded in it, per bag.
+        cache_manager (CacheManager, optional): Default 
+            None. If given, cached results are reported 
+            to it, which may evict old ones to keep the 
+            cache within its budget.
+        dataframe_cache (DataFrameLruCache, optional): 
+            Default None. If given, loaded CSVs are kept 
+            in it and later queries of the same bag, topic 
+            and columns are answered from memory. Frames 
+            got from it share their data, see 
+            DataFrameLruCache.
+        stamp_source (str, optional): Default 'record'. 
+            What the \"time\" column holds. 'record', 
+            the time messages were written to the bag. 
+            'header', msg.header.stamp, i.e. sensor time, 
+            which bag write latency doesn't shift. 'both', 
+            msg.header.stamp, followed by a \"record_time\" 
+            column. CSVs of 'header' and 'both' are cached 
+            apart from the ones of 'record'.
+        decode_processes (int, optional): Default 1. If 
+            more than 1, a bag is split at its chunks 
+            into time ranges, which are decompressed and 
+            decoded in this many processes, see 
+            chunk_parallel_bag_to_csv. None means the 
+            amount of CPUs. Helps single big bags, 
+            especially compressed ones.
 
     Raises:
         InvalidRosbagPath
+        ValueError: If stamp_source is unknown.
 
     Examples:
         To process a single rosbag file
@@ -58,8 +89,22 @@ class RosbagHandler(object):
 
     """
 
-    def __init__(self, path_to_rosbag, use_cached_result=True):
+    def __init__(
+        self,
+        path_to_rosbag,
+        use_cached_result=True,
+        profiler=None,
+        cache_manager=None,
+        dataframe_cache=None,
+        stamp_source='record',
+        decode_processes=1,
+    ):
         import glob
+        from birl_generic_data_handler.stage_profiler import get_profiler
+        from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import STAMP_SOURCES
+
+        if stamp_source not in STAMP_SOURCES:
+            raise ValueError("stamp_source should be one of %s, got %s"%(STAMP_SOURCES, stamp_source))
 
         if os.path.isdir(path_to_rosbag):
             _list_of_bag_paths = glob.glob(
@@ -75,6 +120,15 @@ class RosbagHandler(object):
         self.path_to_rosbag = path_to_rosbag
         self._list_of_bag_paths = _list_of_bag_paths
         self._use_cache = use_cached_result
+        self._profiler = get_profiler(profiler)
+        self._cache_manager = cache_manager
+        self._dataframe_cache = dataframe_cache
+        self._stamp_source = stamp_source
+        self._decode_processes = decode_processes
+
+    def _get_stamp_suffix(self):
+        from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import STAMP_SUFFIXES
+        return STAMP_SUFFIXES[self._stamp_source]
 
     def _get_csv_path(self, bag_path, topic_name):
 
@@ -84,18 +138,21 @@ class RosbagHandler(object):
         return os.path.join(
             os.path.dirname(bag_path),
             fname,
-            fname+topic_name.replace('/','-')+'.csv'
+            fname+topic_name.replace('/','-')+self._get_stamp_suffix()+'.csv'
         )
 
     def get_csv_of_a_topic(
         self, 
         topic_name, 
+        columns=None,
     ):
         """Get data of a topic as CSV.
 
         Args:
             topic_name (str): The name of the to-be-extracted 
                 topic. Don't forget the \"/\" if there is one.
+            columns (list of str, optional): Default None, 
+                all columns. Columns of the CSV to load.
  
         Returns:
             A list of (bag path, pandas.Dataframe) tuples,
@@ -104,30 +161,129 @@ class RosbagHandler(object):
         Raises:
             TopicNotFoundInRosbag
         """
+        return self._map_bags(
+            self._get_csv_of_a_topic_func(topic_name, columns)
+        )
+
+    def get_synchronized_csv(
+        self,
+        list_of_topic_name,
+        clock_topic_name=None,
+        hz=None,
+        method='previous',
+        tolerance=None,
+    ):
+        """Get data of topics joined onto a common clock as CSV.
+
+        Args:
+            list_of_topic_name (list of str): Names of the 
+                to-be-joined topics.
+            clock_topic_name (str, optional): Default None. 
+                The topic whose timestamps are the clock.
+            hz (float, optional): Default None. If 
+                clock_topic_name is None, the clock ticks 
+                at this rate over the time all topics overlap.
+            method (str or dict, optional): Default 'previous'. 
+                How a topic is joined, see 
+                birl_generic_data_handler.topic_synchronizer.
+            tolerance (float or dict, optional): Default None, 
+                no limit. In seconds.
+
+        Returns:
+            A list of (bag path, pandas.Dataframe) tuples. 
+            Columns are named topic name+column, e.g. 
+            \"/tag_multimodal.tag\".
+
+        Raises:
+            TopicNotFoundInRosbag
+
+        Examples:
+            >>> o.get_synchronized_csv(
+            ...     ["/tag_multimodal", "/anomaly_detection_signal"],
+            ...     clock_topic_name="/tag_multimodal",
+            ...     tolerance={"/anomaly_detection_signal": 0.1},
+            ... )
+        """
+        return self._map_bags(self._get_synchronized_csv_func(
+            list_of_topic_name,
+            clock_topic_name,
+            hz,
+            method,
+            tolerance,
+        ))
+
+    def _map_bags(self, func):
         ret = []
-        
+
         _list_of_bag_paths = self._list_of_bag_paths 
 
         for bag_path in _list_of_bag_paths:
-            ret.append((
-                bag_path, 
-                self._get_csv_of_a_topic_of_one_bag(
-                    bag_path,
-                    topic_name,
-                ),
-            ))
+            with self._profiler.bag(bag_path):
+                ret.append((bag_path, func(bag_path)))
 
         return ret
 
+    def _get_csv_of_a_topic_func(self, topic_name, columns=None):
+        # Get a function of bag path, to be mapped over bags
+        def get_csv_of_a_topic_of_one_bag(bag_path):
+            return self._get_csv_of_a_topic_of_one_bag(
+                bag_path,
+                topic_name,
+                columns,
+            )
+        return get_csv_of_a_topic_of_one_bag
+
+    def _get_synchronized_csv_func(
+        self,
+        list_of_topic_name,
+        clock_topic_name,
+        hz,
+        method,
+        tolerance,
+    ):
+        from birl_generic_data_handler.topic_synchronizer import synchronize_topics
+
+        def get_synchronized_csv_of_one_bag(bag_path):
+            list_of_topic = [
+                (topic_name, self._get_csv_of_a_topic_of_one_bag(bag_path, topic_name))
+                for topic_name in list_of_topic_name
+            ]
+            with self._profiler.stage('synchronize'):
+                return synchronize_topics(
+                    list_of_topic,
+                    clock=clock_topic_name,
+                    hz=hz,
+                    method=method,
+                    tolerance=tolerance,
+                )
+        return get_synchronized_csv_of_one_bag
 
-    def _get_csv_of_a_topic_of_one_bag(self, bag_path, topic_name):
+
+    def _get_csv_of_a_topic_of_one_bag(self, bag_path, topic_name, columns=None):
         import rosbag
         import pandas as pd
-        from _rosbag_handler_impl.tuned_rosbag_to_csv import bag_to_csv
+        from _rosbag_handler_impl.tuned_rosbag_to_csv import chunk_parallel_bag_to_csv
+
+        profiler = self._profiler
+        dataframe_cache = self._dataframe_cache
+        memo_key = (
+            os.path.abspath(bag_path),
+            topic_name,
+            None if columns is None else tuple(columns),
+            self._stamp_source,
+        )
+        if self._use_cache and dataframe_cache is not None:
+            df = dataframe_cache.get(memo_key)
+            profiler.cache('csv_read', hit=df is not None)
+            if df is not None:
+                return df
 
-        bag = rosbag.Bag(bag_path)
-        available_topics = \
-            bag.get_type_and_topic_info().topics.keys()
+        # Opening a bag only seeks through its index, whose size isn't
+        # known, so bytes_read of bag_index is left at 0
+        with profiler.stage('bag_index'):
+            bag = rosbag.Bag(bag_path)
+            available_topics = \
+                bag.get_type_and_topic_info().topics.keys()
         if topic_name not in available_topics:
             raise TopicNotFoundInRosbag("topic name: %s"%topic_name)
 
@@ -139,8 +295,11 @@ class RosbagHandler(object):
         if self._use_cache and os.path.isfile(csv_path):
             # Approved to use cache and cached csv 
             # is found.
-            pass
+            profiler.cache('bag_to_csv', hit=True)
+            if self._cache_manager is not None:
+                self._cache_manager.hit(csv_path)
         else:
+            profiler.cache('bag_to_csv', hit=False)
             # Generate a csv for this topic and stored
             # it at csv_path.
             try:
@@ -149,7 +308,25 @@ class RosbagHandler(object):
                 import errno
                 if exc.errno != errno.EEXIST:
                     raise 
-            bag_to_csv(bag, csv_path, topic_name)
+            with profiler.stage('bag_to_csv') as record:
+                # With 1 process, converted by bag_to_csv in this process
+                chunk_parallel_bag_to_csv(
+                    bag,
+                    bag_path,
+                    csv_path,
+                    topic_name,
+                    processes=self._decode_processes,
+                    profiler=profiler,
+                    stamp_source=self._stamp_source,
+                )
+                record['bytes_written'] += os.path.getsize(csv_path)
+            if self._cache_manager is not None:
+                self._cache_manager.store(csv_path)
 
         # Read the csv into pandas Dataframe and return it
-        return pd.read_csv(csv_path, sep=',')
+        with profiler.stage('csv_read') as record:
+            record['bytes_read'] += os.path.getsize(csv_path)
+            df = pd.read_csv(csv_path, sep=',', usecols=columns)
+        if dataframe_cache is not None:
+            df = dataframe_cache.put(memo_key, df)
+        return df
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""This is a module that generates synthetic rosbags and CSVs for benchmarks
+
+SyntheticBag stands in for rosbag.Bag. It has a data topic and a flag topic
+like recorded trials, and answers the calls RosbagHandler and bag_to_csv make
+on a bag, read_messages and get_type_and_topic_info, so the CSV pipeline can
+be run on trials of any duration, rate, field count and flag density without
+ROS or recorded bags.
+
+Messages are built as they are read, from nested classes with __slots__ like
+genpy messages, so reading a SyntheticBag also costs a decoding step, and
+flattening them takes the same path as real messages.
+
+"""
+import numpy as np
+
+
+def _get_message_class(name, slots):
+    return type(name, (object,), {'__slots__': tuple(slots)})
+
+
+def _new_message(cls, **kwargs):
+    msg = cls()
+    for key, value in kwargs.items():
+        setattr(msg, key, value)
+    return msg
+
+
+class Time(object):
+    """A stand-in for rospy.Time."""
+
+    __slots__ = ('secs', 'nsecs')
+
+    def __init__(self, secs=0, nsecs=0):
+        self.secs = secs
+        self.nsecs = nsecs
+
+    @classmethod
+    def from_nsec(cls, nsec):
+        secs, nsecs = divmod(int(nsec), 1000000000)
+        return cls(secs, nsecs)
+
+    def to_sec(self):
+        return self.secs+self.nsecs*1e-9
+
+    to_time = to_sec
+
+
+Header = _get_message_class('Header', ['seq', 'stamp', 'frame_id'])
+FlagMessage = _get_message_class('FlagMessage', ['header', 'event_flag'])
+
+
+class _ChunkInfo(object):
+    def __init__(self, start_time, end_time):
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+class _TypeAndTopicInfo(object):
+    def __init__(self, topics):
+        self.topics = topics
+
+
+class SyntheticBag(object):
+    """A synthetic trial, read like a rosbag.Bag.
+
+    The data topic carries a \".tag\" and n_fields random-walk values. At
+    every data message, an anomaly starts with probability flag_density, and
+    is flagged on the flag topic by a few messages with \".event_flag\" 0. Its
+    \".tag\" goes to 0, i.e. recovery, half a second later, for recovery_secs.
+
+    Args:
+        duration_secs (float, optional): Default 60.
+        rate_hz (float, optional): Default 100. Rate of the data topic.
+        n_fields (int, optional): Default 12. Values per data message.
+        flag_density (float, optional): Default 0.002. Probability that an
+            anomaly starts at a data message.
+        recovery_secs (float, optional): Default 1.
+        search_secs (float, optional): Default 3. Anomalies start at least
+            search_secs+recovery_secs before the end of the trial, so that
+            the data topic covers the window get_anomaly_time_ranges waits
+            for recovery in.
+        data_topic (str, optional): Default \"/tag_multimodal\".
+        flag_topic (str, optional): Default \"/anomaly_detection_signal\".
+        start_time (float, optional): Default 1500000000. Header stamp, in
+            seconds since epoch, of the first message.
+        record_latency_secs (float, optional): Default 0. Messages are
+            recorded this long after their header stamps.
+        record_jitter_secs (float, optional): Default 0. Every message is
+            recorded up to this much later on top of record_latency_secs, at
+            random, so header stamps are out of order in record time when it
+            is longer than the gap between messages.
+        chunk_secs (float, optional): Default None, no chunk index. If
+            given, the bag has a chunk index like rosbag.Bag._chunks, one
+            chunk per chunk_secs of record time.
+        seed (int, optional): Default 0.
+
+    Examples:
+        >>> bag = SyntheticBag(duration_secs=600, rate_hz=100, n_fields=24)
+        >>> bag_to_csv(bag, "/tmp/s01-tag_multimodal.csv", "/tag_multimodal")
+        >>> bag.anomaly_times
+        array([...])
+
+    """
+
+    def __init__(
+        self,
+        duration_secs=60,
+        rate_hz=100,
+        n_fields=12,
+        flag_density=0.002,
+        recovery_secs=1,
+        search_secs=3,
+        data_topic='/tag_multimodal',
+        flag_topic='/anomaly_detection_signal',
+        start_time=1500000000,
+        record_latency_secs=0,
+        record_jitter_secs=0,
+        chunk_secs=None,
+        seed=0,
+    ):
+        rng = np.random.RandomState(seed)
+        n_messages = int(duration_secs*rate_hz)
+        self.data_topic = data_topic
+        self.flag_topic = flag_topic
+        self.n_fields = n_fields
+
+        # Stamps are kept in integer nanoseconds, which float seconds since
+        # epoch can't hold
+        self.data_stamp = int(start_time*1e9)+np.round(np.arange(n_messages)*1e9/rate_hz).astype(np.int64)
+        self.data_time = self.data_stamp/1e9
+        self.data = np.cumsum(rng.normal(scale=0.01, size=(n_messages, n_fields)), axis=0)
+        # Skills 1 to 9, in turn
+        self.tag = 1+(np.arange(n_messages)*9//max(n_messages, 1))
+
+        # Anomalies are at least 2*recovery_secs+1 apart
+        is_onset = rng.uniform(size=n_messages) < flag_density
+        if n_messages != 0:
+            is_onset &= self.data_stamp <= self.data_stamp[-1]-int((search_secs+recovery_secs)*1e9)
+        list_of_onset = []
+        for stamp in self.data_stamp[is_onset]:
+            if len(list_of_onset) == 0\
+                or stamp-list_of_onset[-1] > (2*recovery_secs+1)*1e9:
+                list_of_onset.append(stamp)
+        onset_stamp = np.array(list_of_onset, dtype=np.int64)
+        self.anomaly_times = onset_stamp/1e9
+        self.flag_stamp = (onset_stamp.reshape(-1, 1)+np.arange(3)*100000000).ravel()
+        self.flag_time = self.flag_stamp/1e9
+        for t in self.anomaly_times:
+            self.tag[(self.data_time >= t+0.5) & (self.data_time < t+0.5+recovery_secs)] = 0
+
+        # Drawn last, so data of a seed doesn't depend on the jitter
+        record_latency = int(round(record_latency_secs*1e9))
+        self.data_record_stamp = self.data_stamp+record_latency
+        self.flag_record_stamp = self.flag_stamp+record_latency
+        if record_jitter_secs > 0:
+            self.data_record_stamp += np.round(rng.uniform(0, record_jitter_secs*1e9, len(self.data_stamp))).astype(np.int64)
+            self.flag_record_stamp += np.round(rng.uniform(0, record_jitter_secs*1e9, len(self.flag_stamp))).astype(np.int64)
+
+        self._chunks = []
+        if chunk_secs is not None:
+            record_stamp = np.concatenate([self.data_record_stamp, self.flag_record_stamp])
+            chunk_nsecs = int(round(chunk_secs*1e9))
+            for start in np.arange(record_stamp.min(), record_stamp.max()+1, chunk_nsecs):
+                self._chunks.append(_ChunkInfo(
+                    Time.from_nsec(start),
+                    Time.from_nsec(min(start+chunk_nsecs-1, record_stamp.max())),
+                ))
+
+        self.DataMessage = _get_message_class('DataMessage', ['header', 'tag', 'values'])
+        self.Values = _get_message_class('Values', ['f%s'%i for i in range(n_fields)])
+
+    @property
+    def n_messages(self):
+        return len(self.data_time)+len(self.flag_time)
+
+    def get_type_and_topic_info(self):
+        return _TypeAndTopicInfo({self.data_topic: None, self.flag_topic: None})
+
+    def read_messages(self, topics=None, start_time=None, end_time=None):
+        """Yield (topic, msg, time) tuples in time order, like rosbag.Bag."""
+        if topics is None:
+            topics = [self.data_topic, self.flag_topic]
+        elif isinstance(topics, str):
+            topics = [topics]
+        empty = np.empty(0, dtype=np.int64)
+        list_of_stream = [(empty, empty, None, None)]
+        if self.data_topic in topics:
+            list_of_stream.append((self.data_stamp, self.data_record_stamp, self.data_topic, self._get_data_message))
+        if self.flag_topic in topics:
+            list_of_stream.append((self.flag_stamp, self.flag_record_stamp, self.flag_topic, self._get_flag_message))
+
+        stamps = np.concatenate([i[1] for i in list_of_stream])
+        stream_id = np.concatenate([np.full(len(i[0]), idx, dtype=int) for idx, i in enumerate(list_of_stream)])
+        index = np.concatenate([np.arange(len(i[0])) for i in list_of_stream])
+        order = np.argsort(stamps, kind='mergesort')
+        if start_time is not None:
+            order = order[stamps[order] >= start_time.secs*1000000000+start_time.nsecs]
+        if end_time is not None:
+            order = order[stamps[order] <= end_time.secs*1000000000+end_time.nsecs]
+        for i in order:
+            stamp, record_stamp, topic, get_message = list_of_stream[stream_id[i]]
+            header_stamp = Time.from_nsec(stamp[index[i]])
+            yield topic, get_message(index[i], header_stamp), Time.from_nsec(stamps[i])
+
+    def _get_header(self, idx, stamp):
+        return _new_message(Header, seq=int(idx), stamp=stamp, frame_id='')
+
+    def _get_data_message(self, idx, stamp):
+        values = _new_message(self.Values)
+        for i, value in enumerate(self.data[idx]):
+            setattr(values, 'f%s'%i, float(value))
+        return _new_message(
+            self.DataMessage,
+            header=self._get_header(idx, stamp),
+            tag=int(self.tag[idx]),
+            values=values,
+        )
+
+    def _get_flag_message(self, idx, stamp):
+        return _new_message(
+            FlagMessage,
+            header=self._get_header(idx, stamp),
+            event_flag=0,
+        )
+
+
+def write_synthetic_csvs(output_dir, name, profiler=None, **kwargs):
+    """Write the CSVs RosbagHandler would cache for a synthetic trial.
+
+    Args:
+        output_dir (str): A folder, as if it held name.bag.
+        name (str): Name of the trial.
+        profiler (StageProfiler, optional): Default None. Passed to bag_to_csv.
+        **kwargs: Keyword arguments of SyntheticBag.
+
+    Returns:
+        A (SyntheticBag, data CSV path, flag CSV path) tuple.
+    """
+    import os
+    from birl_offline_data_handler._rosbag_handler_impl.tuned_rosbag_to_csv import bag_to_csv
+
+    bag = SyntheticBag(**kwargs)
+    trial_dir = os.path.join(output_dir, name)
+    if not os.path.isdir(trial_dir):
+        os.makedirs(trial_dir)
+    list_of_path = []
+    for topic in [bag.data_topic, bag.flag_topic]:
+        csv_path = os.path.join(trial_dir, name+topic.replace('/', '-')+'.csv')
+        bag_to_csv(bag, csv_path, topic, profiler=profiler)
+        list_of_path.append(csv_path)
+    return bag, list_of_path[0], list_of_path[1]